@@ -170,7 +170,7 @@ def get_top_cpu_jobs(n: Optional[int] = 5) -> str:
     """Get top N jobs by CPU usage"""
     sql = f"""
       SELECT CPU_TIME, A.* FROM 
-      TABLE(QSYS2.ACTIVE_JOB_INFO(SUBSYSTEM_LIST_FILTER => 'QUSRWRK,QSYSWRK')) A 
+      TABLE(QSYS2.ACTIVE_JOB_INFO(DETAILED_INFO => 'NONE', SUBSYSTEM_LIST_FILTER => 'QUSRWRK,QSYSWRK')) A 
       ORDER BY CPU_TIME DESC 
       FETCH FIRST ? ROWS ONLY
     """
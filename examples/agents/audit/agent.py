@@ -8,7 +8,7 @@ from agno.utils.pprint import pprint_run_response
 from agno.workflow import Workflow
 from dotenv import load_dotenv, find_dotenv
 import os
-from mapepire_python import connect
+from db2i_shared_utils.executor import SQLExecutor
 from pep249 import QueryParameters, ResultSet
 import json
 from pydantic import BaseModel, Field
@@ -51,13 +51,10 @@ def run_sql_statement(
     Returns:
         Formatted string with SQL results
     """
-    with connect(creds) as conn:
-        with conn.execute(sql, parameters=parameters) as cur:
-            if cur.has_results:
-                result = cur.fetchall()
-                return result["data"]
-            else:
-                return "SQL executed successfully. No results returned."
+    result = SQLExecutor.shared(creds).execute(sql, parameters)
+    if result.has_results:
+        return result.rows
+    return "SQL executed successfully. No results returned."
 
 
 class HealthCheckWorkflow(Workflow):
@@ -0,0 +1,360 @@
+import os
+from textwrap import dedent
+from typing import Any, Dict, List, Optional
+
+from agno.tools import tool
+from agno.tools.function import Function
+from db2i_shared_utils.anomalies import AnomalyDetector
+from db2i_shared_utils.bundle import MetricBundle
+from db2i_shared_utils.executor import SQLExecutor
+from db2i_shared_utils.sampler import MetricSampler
+from db2i_shared_utils.snapshots import DEFAULT_THRESHOLD, SnapshotStore
+from db2i_shared_utils.timeseries import AGGREGATES, RATES_SUFFIX, MetricStore
+
+# Seconds a single metric query may take inside a composite tool
+COMPONENT_TIMEOUT = float(os.getenv("METRIC_QUERY_TIMEOUT", 15))
+
+
+class MetricTools:
+    """Sampled metrics, their local history and snapshots, and the agent tools on top
+
+    Both performance assistants build one of these from their own metric
+    catalog and add `tools()` to their agent.
+
+    Args:
+        credentials: Database connection credentials
+        performance_metrics: Metric id to its name, description, interval and SQL
+    """
+
+    def __init__(self, credentials: Dict[str, Any], performance_metrics: Dict[str, Dict[str, Any]]):
+        self.credentials = credentials
+        self.performance_metrics = performance_metrics
+
+        # Polls every metric at its `interval` so tools can answer from memory. The
+        # sampler keeps its own connection so consecutive samples share one server
+        # job, which is the baseline the non-resetting statistics are counted from.
+        self.sampler = MetricSampler(
+            SQLExecutor.shared(credentials, pool_size=1, dedicated=True), performance_metrics
+        )
+
+        # Every sample is also kept on local disk with 1m/15m/1h rollups for trend
+        # questions, together with the per-interval rates of cumulative metrics
+        self.store = MetricStore(os.getenv("METRIC_STORE_DIR", "tmp/metrics"), performance_metrics)
+        self.store.attach(self.sampler)
+        self.snapshots = SnapshotStore(os.getenv("METRIC_SNAPSHOT_DIR", "tmp/snapshots"), performance_metrics)
+
+        # Bundles are described on first use, so keep one per set of components
+        self._bundles: Dict[tuple, MetricBundle] = {}
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Return the name, description and parameters of every metric"""
+        return {
+            key: {
+                "name": metric["name"],
+                "description": metric["description"],
+                "parameters": metric.get("parameters", []),
+            }
+            for key, metric in self.performance_metrics.items()
+        }
+
+    def with_rates(self, metric_id: str, text: str) -> str:
+        """Append the latest interval rates of a metric with a `rates` definition
+
+        The metrics query with `RESET_STATISTICS=>'NO'`, so their ELAPSED_*
+        columns are cumulative since the job's statistics baseline and say
+        little about current load on their own.
+        """
+        if "rates" not in self.performance_metrics.get(metric_id, {}):
+            return text
+        rows = self.sampler.rates(metric_id)
+        if not rows:
+            return (
+                f"{text}\n(ELAPSED_* values are cumulative since the statistics baseline; "
+                f"interval rates are available after the next sample in about "
+                f"{self.sampler.interval(metric_id):.0f}s.)"
+            )
+        return (
+            f"{text}\n(ELAPSED_* values are cumulative since the statistics baseline.)\n"
+            f"Rates over the last sampling interval:\n{rows}"
+        )
+
+    def get_sampled_metric(self, metric_id: str) -> str:
+        """Return the latest sample of a metric and its age
+
+        Starts the background sampler on first use and only queries the host
+        live when the latest sample is older than the metric's interval allows.
+        """
+        self.sampler.start()
+        return self.with_rates(metric_id, str(self.sampler.get(metric_id)))
+
+    def _sections(self, components: Dict[str, str], results: Dict[str, str]) -> str:
+        self.sampler.start()
+        return "\n\n".join(
+            f"{title}:\n{self.with_rates(components[title], result)}" for title, result in results.items()
+        )
+
+    def run_components(self, components: Dict[str, str], timeout: float = COMPONENT_TIMEOUT) -> str:
+        """Run the metric queries behind a composite tool concurrently
+
+        Args:
+            components: Section title to performance metric id
+            timeout: Seconds each query may take before its section is reported
+                as timed out; the other sections are still returned
+
+        Returns:
+            One titled section per component, in the order given, with the
+            interval rates of components that define them
+        """
+        results = SQLExecutor.shared(self.credentials).run_many(
+            {title: dedent(self.performance_metrics[metric_id]["sql"]) for title, metric_id in components.items()},
+            timeout=timeout,
+        )
+        return self._sections(components, results)
+
+    def run_bundle(self, components: Dict[str, str], timeout: float = COMPONENT_TIMEOUT) -> str:
+        """Run the metric queries behind a composite tool in one round trip
+
+        Args:
+            components: Section title to performance metric id
+            timeout: Seconds the bundle may take; if it fails or times out, the
+                queries run separately with this timeout each
+
+        Returns:
+            One titled section per component, in the order given, with the
+            interval rates of components that define them
+        """
+        key = tuple(components.items())
+        bundle = self._bundles.get(key)
+        if bundle is None:
+            bundle = self._bundles[key] = MetricBundle(
+                SQLExecutor.shared(self.credentials),
+                {title: self.performance_metrics[metric_id]["sql"] for title, metric_id in components.items()},
+            )
+        results = bundle.run(timeout)
+        return self._sections(components, results)
+
+    def tools(self) -> List[Function]:
+        """Return the history, anomaly, snapshot, rate and composite tools"""
+        performance_metrics = self.performance_metrics
+        sampler, store, snapshots = self.sampler, self.store, self.snapshots
+
+        @tool(
+            name="get_metric_history",
+            description=(
+                "History of a sampled performance metric from the local time-series store, "
+                f"aggregated per time bucket with one of {list(AGGREGATES)}"
+            ),
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def get_metric_history(
+            id: str,
+            window: str = "1h",
+            agg: str = "avg",
+            column: Optional[str] = None,
+            key: Optional[str] = None,
+        ) -> str:
+            """Return the recorded history of a metric over a time window
+
+            Args:
+                id: Performance metric id, or `<id>.rates` for the per-interval rates
+                    of metrics with derived rates (e.g. system_status.rates for CPU %)
+                window: How far back to look, e.g. 15m, 6h, 7d
+                agg: Aggregate per bucket: avg, min, max, sum, count or last
+                column: Only return this numeric column, e.g. ELAPSED_CPU_USED
+                key: Only return one row of a multi-row metric, e.g. a pool name
+
+            Returns:
+                One row per time bucket (1m, 15m or 1h depending on the window)
+            """
+            if id.removesuffix(RATES_SUFFIX) not in performance_metrics:
+                return f"{id} not valid metric"
+
+            sampler.start()
+            try:
+                rows = store.query(id, window, agg=agg, column=column, key=key)
+            except ValueError as e:
+                return f"Error: {e}"
+            if not rows:
+                return f"No history recorded for {id} in the last {window} yet."
+            return str(rows)
+
+        @tool(
+            name="get_anomalies",
+            description=(
+                "Find metric series that deviate from their recent, baseline or time-of-day "
+                "behaviour, with severity scores"
+            ),
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def get_anomalies(window: str = "15m") -> str:
+            """Return only the metric series that behaved unusually in a time window
+
+            Args:
+                window: How far back to look for deviations, e.g. 15m, 1h
+
+            Returns:
+                Findings with the metric, row key, column, value, expected value,
+                score in standard deviations and severity, most severe first
+            """
+            sampler.start()
+            try:
+                findings = AnomalyDetector(store).detect(window)
+            except ValueError as e:
+                return f"Error: {e}"
+            if not findings:
+                return f"No anomalies in the last {window}."
+            return str([finding.to_dict() for finding in findings])
+
+        @tool(
+            name="save_metric_snapshot",
+            description="Save the current values of a set of metrics under a name to compare against later",
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def save_metric_snapshot(name: str, ids: Optional[List[str]] = None) -> str:
+            """Save the current rows of some metrics as a named snapshot
+
+            Args:
+                name: Snapshot name, e.g. morning or before_batch
+                ids: Metric ids to include; all metrics without parameters by default
+
+            Returns:
+                The metrics saved and any that failed
+            """
+            sampler.start()
+            try:
+                snapshot = snapshots.take(name, sampler, ids)
+            except ValueError as e:
+                return f"Error: {e}"
+            saved = f"Saved snapshot {name} of {sorted(snapshot.metrics)}"
+            return f"{saved}; failed: {snapshot.errors}" if snapshot.errors else saved
+
+        @tool(
+            name="list_metric_snapshots",
+            description="List the saved metric snapshots",
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def list_metric_snapshots() -> str:
+            """List the saved metric snapshots with when they were taken and their metrics"""
+            saved = snapshots.names()
+            return str(saved) if saved else "No snapshots saved yet."
+
+        @tool(
+            name="diff_snapshots",
+            description=(
+                "Only what changed between two metric snapshots: added, removed and changed rows "
+                "with numeric deltas. Use b='now' to compare a snapshot with current values"
+            ),
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def diff_snapshots(a: str, b: str = "now", threshold: float = DEFAULT_THRESHOLD) -> str:
+            """Compare two snapshots row by row and return only the differences
+
+            Args:
+                a: Name of the older snapshot
+                b: Name of the newer snapshot, or `now` for the current values of the
+                    metrics in `a`
+                threshold: Smallest relative change of a numeric value to report, e.g. 0.05 for 5%
+
+            Returns:
+                Per metric the added and removed rows, the changed columns of changed
+                rows with before, after, delta and percent change, and the count of
+                unchanged rows
+            """
+            try:
+                before = snapshots.load(a)
+                if b == "now":
+                    sampler.start()
+                    after = snapshots.current(b, sampler, list(before.metrics))
+                else:
+                    after = snapshots.load(b)
+            except ValueError as e:
+                return f"Error: {e}"
+            return str(snapshots.diff(before, after, threshold))
+
+        @tool(
+            name="get_metric_rates",
+            description=(
+                "Per-interval deltas and rates (CPU %, faults/s, page I/O/s, state transitions/s) "
+                f"derived from consecutive samples of {[k for k, m in performance_metrics.items() if 'rates' in m]}"
+            ),
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def get_metric_rates(id: str, intervals: int = 1) -> str:
+            """Return deltas and rates between the latest samples of a metric
+
+            Args:
+                id: Performance metric id with a rate definition
+                intervals: Number of most recent sampling intervals to return
+
+            Returns:
+                One row per interval (and memory pool) with counter deltas, per-second
+                rates and interval averages
+            """
+            if "rates" not in performance_metrics.get(id, {}):
+                return f"{id} has no derived rates"
+
+            sampler.start()
+            sampler.get(id)
+            rows = sampler.rates(id, max(intervals, 1))
+            if not rows:
+                return (
+                    f"Collecting a baseline for {id}; rates are available after the next "
+                    f"sample in about {sampler.interval(id):.0f}s."
+                )
+            return str(rows)
+
+        @tool(
+            name="get_collection_services_config",
+            description="Get Collection Services configuration and category settings",
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def get_collection_services_config() -> str:
+            """Get Collection Services configuration and category settings
+
+            Returns:
+                Configuration details of Collection Services including categories and intervals
+            """
+            return self.run_components(
+                {
+                    "Collection Services Config": "collection_services",
+                    "Collection Categories": "collection_categories",
+                }
+            )
+
+        @tool(
+            name="analyze_system_performance",
+            description="Analyze system performance using multiple metrics",
+            show_result=False,
+            stop_after_tool_call=False,
+        )
+        def analyze_system_performance() -> str:
+            """Analyze system performance using multiple key metrics
+
+            Returns:
+                Comprehensive analysis of system performance using multiple data sources
+            """
+            return self.run_bundle(
+                {
+                    "System Status": "system_status",
+                    "Memory Pool Usage": "memory_pools",
+                    "System Activity": "system_activity",
+                }
+            )
+
+        return [
+            get_metric_rates,
+            get_metric_history,
+            get_anomalies,
+            save_metric_snapshot,
+            list_metric_snapshots,
+            diff_snapshots,
+            get_collection_services_config,
+            analyze_system_performance,
+        ]
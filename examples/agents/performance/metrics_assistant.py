@@ -7,7 +7,8 @@ from agno.models.openai import OpenAIChat
 from agno.tools.file import FileTools
 from agno.tools import tool
 from dotenv import load_dotenv, find_dotenv
-from mapepire_python import connect
+from db2i_shared_utils.executor import SQLExecutor
+from metric_tools import MetricTools
 from pep249 import QueryParameters
 
 # Load environment variables
@@ -28,8 +29,12 @@ performance_metrics = {
         "description": "Overall system performance statistics with CPU, memory, and I/O metrics",
         "interval": 60,
         "sql": """
-            SELECT * FROM TABLE(QSYS2.SYSTEM_STATUS(RESET_STATISTICS=>'YES',DETAILED_INFO=>'ALL')) X
-        """
+            SELECT * FROM TABLE(QSYS2.SYSTEM_STATUS(RESET_STATISTICS=>'NO',DETAILED_INFO=>'ALL')) X
+        """,
+        "rates": {
+            "elapsed": "ELAPSED_TIME",
+            "averages": ["ELAPSED_CPU_USED", "ELAPSED_CPU_SHARED", "ELAPSED_CPU_UNCAPPED_CAPACITY"],
+        }
     },
     "system_activity": {
         "name": "System Activity",
@@ -57,14 +62,26 @@ performance_metrics = {
         "interval": 100,
         "sql": """
             SELECT POOL_NAME, CURRENT_SIZE, DEFINED_SIZE, 
-                   MAXIMUM_ACTIVE_THREADS, CURRENT_THREADS, RESERVED_SIZE 
-            FROM TABLE(QSYS2.MEMORY_POOL(RESET_STATISTICS=>'YES')) X
-        """
+                   MAXIMUM_ACTIVE_THREADS, CURRENT_THREADS, RESERVED_SIZE,
+                   ELAPSED_TOTAL_FAULTS, ELAPSED_DATABASE_FAULTS, ELAPSED_NON_DATABASE_FAULTS,
+                   ELAPSED_DATABASE_PAGES, ELAPSED_NON_DATABASE_PAGES,
+                   ELAPSED_ACTIVE_TO_WAIT, ELAPSED_WAIT_TO_INELIGIBLE, ELAPSED_ACTIVE_TO_INELIGIBLE
+            FROM TABLE(QSYS2.MEMORY_POOL(RESET_STATISTICS=>'NO')) X
+        """,
+        "rates": {
+            "key": "POOL_NAME",
+            "counters": [
+                "ELAPSED_TOTAL_FAULTS", "ELAPSED_DATABASE_FAULTS", "ELAPSED_NON_DATABASE_FAULTS",
+                "ELAPSED_DATABASE_PAGES", "ELAPSED_NON_DATABASE_PAGES",
+                "ELAPSED_ACTIVE_TO_WAIT", "ELAPSED_WAIT_TO_INELIGIBLE", "ELAPSED_ACTIVE_TO_INELIGIBLE",
+            ],
+        }
     },
     "temp_storage_buckets": {
         "name": "Named Temporary Storage Buckets",
         "description": "Information about named temporary storage usage",
         "interval": 90,
+        "key": "NAME",
         "sql": """
             SELECT REPLACE(UPPER(REPLACE(GLOBAL_BUCKET_NAME, '*','')), ' ', '_') as NAME, 
                    BUCKET_CURRENT_SIZE as CURRENT_SIZE, BUCKET_PEAK_SIZE as PEAK_SIZE 
@@ -87,6 +104,7 @@ performance_metrics = {
         "name": "HTTP Server Metrics",
         "description": "Performance metrics for HTTP servers including connections and request handling",
         "interval": 60,
+        "key": "SERVER_FUNC",
         "sql": """
             SELECT SERVER_NAME CONCAT '_' CONCAT REPLACE(HTTP_FUNCTION, ' ','_') as SERVER_FUNC, 
                    SERVER_NORMAL_CONNECTIONS, SERVER_SSL_CONNECTIONS, SERVER_ACTIVE_THREADS, 
@@ -100,6 +118,7 @@ performance_metrics = {
         "name": "System Values",
         "description": "Current numeric system values that affect performance",
         "interval": 333,
+        "key": "SYSTEM_VALUE_NAME",
         "sql": """
             SELECT SYSTEM_VALUE_NAME, CURRENT_NUMERIC_VALUE 
             FROM QSYS2.SYSTEM_VALUE_INFO 
@@ -128,16 +147,6 @@ performance_metrics = {
     }
 }
 
-def get_metrics_summary():
-    summary = {}
-    for key, metric in performance_metrics.items():
-        summary[key] = {
-            "name": metric["name"],
-            "description": metric["description"]
-        }
-    return summary
-
-
 def run_sql_statement(
     sql: str,
     parameters: Optional[QueryParameters] = None,
@@ -153,48 +162,11 @@ def run_sql_statement(
     Returns:
         Formatted string with SQL results
     """
-    with connect(creds) as conn:
-        with conn.execute(sql, parameters=parameters) as cur:
-            if cur.has_results:
-                result = cur.fetchall()
-                return str(result["data"])
-            else:
-                return "SQL executed successfully. No results returned."
+    return SQLExecutor.shared(creds).run(sql, parameters)
 
-@tool(
-    name="get_collection_services_config",
-    description="Get Collection Services configuration and category settings",
-    show_result=False,
-    stop_after_tool_call=False,
-)
-def get_collection_services_config() -> str:
-    """Get Collection Services configuration and category settings
-    
-    Returns:
-        Configuration details of Collection Services including categories and intervals
-    """
-    config = run_sql_statement(dedent(performance_metrics["collection_services"]["sql"]))
-    categories = run_sql_statement(dedent(performance_metrics["collection_categories"]["sql"]))
-    return f"Collection Services Config:\n{config}\n\nCollection Categories:\n{categories}"
 
+metric_tools = MetricTools(credentials, performance_metrics)
 
-@tool(
-    name="analyze_system_performance",
-    description="Analyze system performance using multiple metrics",
-    show_result=False,
-    stop_after_tool_call=False,
-)
-def analyze_system_performance() -> str:
-    """Analyze system performance using multiple key metrics
-    
-    Returns:
-        Comprehensive analysis of system performance using multiple data sources
-    """
-    status = run_sql_statement(dedent(performance_metrics["system_status"]["sql"]))
-    memory = run_sql_statement(dedent(performance_metrics["memory_pools"]["sql"]))
-    activity = run_sql_statement(dedent(performance_metrics["system_activity"]["sql"]))
-    
-    return f"System Status:\n{status}\n\nMemory Pool Usage:\n{memory}\n\nSystem Activity:\n{activity}"
 
 @tool(
     name="get_performance_metrics",
@@ -206,7 +178,7 @@ def get_metrics(id: str = None) -> str:
     if id not in performance_metrics.keys():
         return f"{id} not valid metric"
     
-    return run_sql_statement(dedent(performance_metrics[id]["sql"]))
+    return metric_tools.get_sampled_metric(id)
     
 
 
@@ -214,10 +186,9 @@ agent = Agent(
     model=OpenAIChat(id="gpt-4o", api_key=os.getenv("OPENAI_API_KEY")),
     tools=[
         get_metrics,
-        get_collection_services_config,
-        analyze_system_performance
+        *metric_tools.tools(),
     ],
-    context={"performance_metrics": get_metrics_summary()},
+    context={"performance_metrics": metric_tools.summary()},
     instructions=dedent(
         """\
         You are an IBM i Performance Monitoring expert. Assist users in analyzing 
@@ -234,8 +205,21 @@ agent = Agent(
         - Collection Services configuration
         
         To retrieve performance data, use the performance metric IDs: {performance_metrics}
-        and execute `get_metrics(id)`.
+        and execute `get_metrics(id)`. For CPU % and fault or paging rates over the
+        last sampling intervals, use `get_metric_rates(id)` instead of comparing
+        cumulative counters yourself. ELAPSED_* columns of system status and memory
+        pools are cumulative since the statistics baseline, not current load; judge
+        current CPU, faulting and paging by the interval rates attached to those results.
+        For trends over time ("how has CPU changed since this morning?"), use
+        `get_metric_history(id, window, agg)`, which answers from the locally
+        recorded samples.
         
+        Start a health check with `get_anomalies(window)`, which returns only the
+        series that deviate from their baselines, and drill into those metrics.
+        To answer "what changed since ...?", save named snapshots with
+        `save_metric_snapshot(name)` and compare them with `diff_snapshots(a, b)`
+        (b='now' compares with current values) instead of fetching full metrics again.
+
         When analyzing performance:
         - Look for high CPU utilization (>80%)
         - Identify memory pools with high thread counts
@@ -2,7 +2,7 @@ import argparse
 import asyncio
 import os
 from textwrap import dedent
-from typing import Any, Dict, Optional
+from typing import Optional
 
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
@@ -11,8 +11,11 @@ from agno.tools.reasoning import ReasoningTools
 from agno.db.sqlite import SqliteDb
 from db2i_shared_utils.cli import CLIConfig, InteractiveCLI, get_model
 from dotenv import load_dotenv, find_dotenv
-from mapepire_python import connect
-from pep249 import QueryParameters
+from db2i_shared_utils.executor import SQLExecutor
+from db2i_shared_utils.correlation import MIN_INTERVALS, JobNetworkCorrelator
+from db2i_shared_utils.exporter import DEFAULT_PORT, MetricsExporter
+from db2i_shared_utils.jobs import JobSnapshotService
+from metric_tools import MetricTools
 from phoenix.otel import register
 from agno.tools.file import FileTools
 
@@ -38,8 +41,12 @@ performance_metrics = {
         "description": "Overall system performance statistics with CPU, memory, and I/O metrics",
         "interval": 60,
         "sql": """
-            SELECT * FROM TABLE(QSYS2.SYSTEM_STATUS(RESET_STATISTICS=>'YES',DETAILED_INFO=>'ALL')) X
+            SELECT * FROM TABLE(QSYS2.SYSTEM_STATUS(RESET_STATISTICS=>'NO',DETAILED_INFO=>'ALL')) X
         """,
+        "rates": {
+            "elapsed": "ELAPSED_TIME",
+            "averages": ["ELAPSED_CPU_USED", "ELAPSED_CPU_SHARED", "ELAPSED_CPU_UNCAPPED_CAPACITY"],
+        },
     },
     "system_activity": {
         "name": "System Activity",
@@ -67,14 +74,26 @@ performance_metrics = {
         "interval": 100,
         "sql": """
             SELECT POOL_NAME, CURRENT_SIZE, DEFINED_SIZE, 
-                   MAXIMUM_ACTIVE_THREADS, CURRENT_THREADS, RESERVED_SIZE 
-            FROM TABLE(QSYS2.MEMORY_POOL(RESET_STATISTICS=>'YES')) X
+                   MAXIMUM_ACTIVE_THREADS, CURRENT_THREADS, RESERVED_SIZE,
+                   ELAPSED_TOTAL_FAULTS, ELAPSED_DATABASE_FAULTS, ELAPSED_NON_DATABASE_FAULTS,
+                   ELAPSED_DATABASE_PAGES, ELAPSED_NON_DATABASE_PAGES,
+                   ELAPSED_ACTIVE_TO_WAIT, ELAPSED_WAIT_TO_INELIGIBLE, ELAPSED_ACTIVE_TO_INELIGIBLE
+            FROM TABLE(QSYS2.MEMORY_POOL(RESET_STATISTICS=>'NO')) X
         """,
+        "rates": {
+            "key": "POOL_NAME",
+            "counters": [
+                "ELAPSED_TOTAL_FAULTS", "ELAPSED_DATABASE_FAULTS", "ELAPSED_NON_DATABASE_FAULTS",
+                "ELAPSED_DATABASE_PAGES", "ELAPSED_NON_DATABASE_PAGES",
+                "ELAPSED_ACTIVE_TO_WAIT", "ELAPSED_WAIT_TO_INELIGIBLE", "ELAPSED_ACTIVE_TO_INELIGIBLE",
+            ],
+        },
     },
     "temp_storage_buckets": {
         "name": "Named Temporary Storage Buckets",
         "description": "Information about named temporary storage usage",
         "interval": 90,
+        "key": "NAME",
         "sql": """
             SELECT REPLACE(UPPER(REPLACE(GLOBAL_BUCKET_NAME, '*','')), ' ', '_') as NAME, 
                    BUCKET_CURRENT_SIZE as CURRENT_SIZE, BUCKET_PEAK_SIZE as PEAK_SIZE 
@@ -97,6 +116,7 @@ performance_metrics = {
         "name": "HTTP Server Metrics",
         "description": "Performance metrics for HTTP servers including connections and request handling",
         "interval": 60,
+        "key": "SERVER_FUNC",
         "sql": """
             SELECT SERVER_NAME CONCAT '_' CONCAT REPLACE(HTTP_FUNCTION, ' ','_') as SERVER_FUNC, 
                    SERVER_NORMAL_CONNECTIONS, SERVER_SSL_CONNECTIONS, SERVER_ACTIVE_THREADS, 
@@ -110,6 +130,7 @@ performance_metrics = {
         "name": "System Values",
         "description": "Current numeric system values that affect performance",
         "interval": 333,
+        "key": "SYSTEM_VALUE_NAME",
         "sql": """
             SELECT SYSTEM_VALUE_NAME, CURRENT_NUMERIC_VALUE 
             FROM QSYS2.SYSTEM_VALUE_INFO 
@@ -140,15 +161,36 @@ performance_metrics = {
         "name": "Active Job Information",
         "description": "Details about currently active jobs on the system",
         "interval": 60,
+        "parameters": ["num_jobs"],
         "sql": """
             select CPU_TIME, A.* FROM 
-            table(QSYS2.ACTIVE_JOB_INFO(SUBSYSTEM_LIST_FILTER => 'QUSRWRK,QSYSWRK')) A 
+            table(QSYS2.ACTIVE_JOB_INFO(DETAILED_INFO => 'NONE', SUBSYSTEM_LIST_FILTER => 'QUSRWRK,QSYSWRK')) A 
             ORDER BY CPU_TIME DESC 
             LIMIT ?
         """,
     },
 }
 
+metric_tools = MetricTools(credentials, performance_metrics)
+
+
+# ACTIVE_JOB_INFO is expensive: take at most one snapshot per window and
+# answer top-N questions from it
+JOB_SUBSYSTEMS = ["QUSRWRK", "QSYSWRK"]
+job_snapshots = JobSnapshotService.shared(
+    SQLExecutor.shared(credentials),
+    window=float(os.getenv("ACTIVE_JOB_SNAPSHOT_WINDOW", 30)),
+)
+
+# Samples per-job CPU and network activity in the background once the
+# correlation tool is first used, sharing the top CPU jobs' snapshots
+job_network = JobNetworkCorrelator(
+    SQLExecutor.shared(credentials),
+    job_snapshots,
+    interval=float(os.getenv("CORRELATION_INTERVAL", 60)),
+    subsystems=JOB_SUBSYSTEMS,
+)
+
 
 @tool(
     name="get_system_status",
@@ -158,7 +200,7 @@ performance_metrics = {
 )
 def get_system_status() -> str:
     """Overall system performance statistics with CPU, memory, and I/O metrics"""
-    return run_sql_statement(dedent(performance_metrics["system_status"]["sql"]))
+    return metric_tools.get_sampled_metric("system_status")
 
 
 @tool(
@@ -169,7 +211,7 @@ def get_system_status() -> str:
 )
 def get_system_activity() -> str:
     """Current system activity information including active jobs and resource utilization"""
-    return run_sql_statement(dedent(performance_metrics["system_activity"]["sql"]))
+    return metric_tools.get_sampled_metric("system_activity")
 
 
 @tool(
@@ -180,7 +222,7 @@ def get_system_activity() -> str:
 )
 def get_remote_connections() -> str:
     """Number of established remote connections to the system"""
-    return run_sql_statement(dedent(performance_metrics["remote_connections"]["sql"]))
+    return metric_tools.get_sampled_metric("remote_connections")
 
 
 @tool(
@@ -191,7 +233,7 @@ def get_remote_connections() -> str:
 )
 def get_memory_pools() -> str:
     """Information about memory pool sizes and thread utilization"""
-    return run_sql_statement(dedent(performance_metrics["memory_pools"]["sql"]))
+    return metric_tools.get_sampled_metric("memory_pools")
 
 
 @tool(
@@ -202,7 +244,7 @@ def get_memory_pools() -> str:
 )
 def get_temp_storage_buckets() -> str:
     """Information about named temporary storage usage"""
-    return run_sql_statement(dedent(performance_metrics["temp_storage_buckets"]["sql"]))
+    return metric_tools.get_sampled_metric("temp_storage_buckets")
 
 
 @tool(
@@ -213,7 +255,7 @@ def get_temp_storage_buckets() -> str:
 )
 def get_unnamed_temp_storage() -> str:
     """Total usage of unnamed temporary storage buckets"""
-    return run_sql_statement(dedent(performance_metrics["unnamed_temp_storage"]["sql"]))
+    return metric_tools.get_sampled_metric("unnamed_temp_storage")
 
 
 @tool(
@@ -224,7 +266,7 @@ def get_unnamed_temp_storage() -> str:
 )
 def get_http_server() -> str:
     """Performance metrics for HTTP servers including connections and request handling"""
-    return run_sql_statement(dedent(performance_metrics["http_server"]["sql"]))
+    return metric_tools.get_sampled_metric("http_server")
 
 
 @tool(
@@ -235,7 +277,7 @@ def get_http_server() -> str:
 )
 def get_system_values() -> str:
     """Current numeric system values that affect performance"""
-    return run_sql_statement(dedent(performance_metrics["system_values"]["sql"]))
+    return metric_tools.get_sampled_metric("system_values")
 
 
 @tool(
@@ -253,86 +295,43 @@ def get_top_cpu_jobs(num_jobs: int = 5) -> str:
     Returns:
         Information about the top CPU consuming jobs
     """
-    return run_sql_statement(
-        dedent(performance_metrics["active_job_info"]["sql"]), parameters=[num_jobs]
-    )
-
-
-def get_metrics_summary():
-    summary = {}
-    for key, metric in performance_metrics.items():
-        summary[key] = {
-            "name": metric["name"],
-            "description": metric["description"],
-            "parameters": metric.get("parameters", []),
-        }
-    return summary
-
-
-def run_sql_statement(
-    sql: str,
-    parameters: Optional[QueryParameters] = None,
-    creds: Dict[str, Any] = credentials,
-) -> str:
-    """Execute SQL statement and return formatted results
-
-    Args:
-        sql: SQL statement to execute
-        parameters: Optional parameters for prepared statements
-        creds: Database connection credentials
-
-    Returns:
-        Formatted string with SQL results
-    """
-    with connect(creds) as conn:
-        with conn.execute(sql, parameters=parameters) as cur:
-            if cur.has_results:
-                result = cur.fetchall()
-                return str(result["data"])
-            else:
-                return "SQL executed successfully. No results returned."
+    try:
+        jobs = job_snapshots.top(num_jobs, by="CPU_TIME", subsystems=JOB_SUBSYSTEMS)
+    except Exception as e:
+        return f"Error: {e}"
+    return str(jobs)
 
 
 @tool(
-    name="get_collection_services_config",
-    description="Get Collection Services configuration and category settings",
+    name="get_cpu_network_correlation",
+    description=(
+        "Jobs in QUSRWRK and QSYSWRK whose CPU use follows their network connections "
+        "and traffic over time"
+    ),
     show_result=False,
     stop_after_tool_call=False,
 )
-def get_collection_services_config() -> str:
-    """Get Collection Services configuration and category settings
+def get_cpu_network_correlation(top: int = 10, max_lag: int = 3) -> str:
+    """Correlate per-job CPU with network connections and traffic over the sampled history
 
-    Returns:
-        Configuration details of Collection Services including categories and intervals
-    """
-    config = run_sql_statement(
-        dedent(performance_metrics["collection_services"]["sql"])
-    )
-    categories = run_sql_statement(
-        dedent(performance_metrics["collection_categories"]["sql"])
-    )
-    return (
-        f"Collection Services Config:\n{config}\n\nCollection Categories:\n{categories}"
-    )
-
-
-@tool(
-    name="analyze_system_performance",
-    description="Analyze system performance using multiple metrics",
-    show_result=False,
-    stop_after_tool_call=False,
-)
-def analyze_system_performance() -> str:
-    """Analyze system performance using multiple key metrics
+    Args:
+        top: (int) number of jobs to return
+        max_lag: (int) largest lag, in sampling intervals, to test for traffic leading CPU
 
     Returns:
-        Comprehensive analysis of system performance using multiple data sources
+        Jobs ranked by the share of CPU that tracks their network activity, with
+        their CPU rate, connections, bytes per second, correlations and lead
     """
-    status = run_sql_statement(dedent(performance_metrics["system_status"]["sql"]))
-    memory = run_sql_statement(dedent(performance_metrics["memory_pools"]["sql"]))
-    activity = run_sql_statement(dedent(performance_metrics["system_activity"]["sql"]))
-
-    return f"System Status:\n{status}\n\nMemory Pool Usage:\n{memory}\n\nSystem Activity:\n{activity}"
+    job_network.start()
+    result = job_network.correlate(top, max_lag)
+    if result["INTERVALS"] < MIN_INTERVALS:
+        return (
+            f"Collecting samples every {job_network.interval:.0f}s: {result['INTERVALS']} of "
+            f"{MIN_INTERVALS} intervals so far. Ask again later."
+        )
+    if not result["JOBS"]:
+        return f"No job's CPU follows its network activity over the last {result['INTERVALS']} intervals."
+    return str(result)
 
 
 performance_agent = Agent(
@@ -348,15 +347,15 @@ performance_agent = Agent(
         get_unnamed_temp_storage,
         get_http_server,
         get_system_values,
-        get_collection_services_config,
-        analyze_system_performance,
         get_top_cpu_jobs,
+        get_cpu_network_correlation,
+        *metric_tools.tools(),
         ReasoningTools(add_instructions=True),
         FileTools()
     ],
     db=SqliteDb(db_file="tmp/data.db"
     ),
-    context={"performance_metrics": get_metrics_summary()},
+    context={"performance_metrics": metric_tools.summary()},
     instructions=dedent(
         """\
         You are a helpful IBM i Performance Monitoring CLI assistant. Have natural conversations 
@@ -378,6 +377,18 @@ performance_agent = Agent(
         - User requests performance analysis or comparison
         - User asks about top consuming jobs
         - User wants Collection Services information
+        - User asks how CPU, faulting or paging changed recently (use `get_metric_rates`
+          rather than comparing cumulative counters)
+        - ELAPSED_* columns of system status and memory pools are cumulative since the
+          statistics baseline, not current load; judge current CPU, faulting and paging
+          by the interval rates attached to those results
+        - User asks whether anything looks wrong (use `get_anomalies` first and only drill
+          into the series it reports)
+        - User asks about trends over time (use `get_metric_history`, which answers from
+          locally recorded samples)
+        - User asks which network-heavy jobs drive CPU (use `get_cpu_network_correlation`)
+        - User asks what changed since an earlier point (use `diff_snapshots` against a
+          snapshot saved with `save_metric_snapshot`; it returns only the differences)
         
         ## Performance Analysis Guidelines:
         When analyzing data you've gathered:
@@ -442,12 +453,41 @@ if __name__ == "__main__":
     parser.add_argument(
         "--stream", action="store_true", help="Enable streaming", default=False
     )
+    parser.add_argument(
+        "--exporter-port",
+        type=int,
+        default=None,
+        help=f"Also serve the sampled metrics for Prometheus on this port (e.g. {DEFAULT_PORT})",
+    )
+    parser.add_argument(
+        "--exporter-host", default="127.0.0.1", help="Interface the metrics exporter listens on"
+    )
+    parser.add_argument(
+        "--exporter-only",
+        action="store_true",
+        default=False,
+        help="Only run the metrics exporter, without the assistant",
+    )
 
     args = parser.parse_args()
-    asyncio.run(
-        run_db2i_cli(
-            debug_mode=args.debug,
-            model_id=args.model_id,
-            stream=args.stream,
+    if args.exporter_port is not None or args.exporter_only:
+        exporter = MetricsExporter(
+            metric_tools.sampler, host=args.exporter_host, port=args.exporter_port or DEFAULT_PORT
+        )
+        print(f"Serving metrics on http://{args.exporter_host}:{exporter.port}/metrics")
+
+    if args.exporter_only:
+        try:
+            exporter.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        if args.exporter_port is not None:
+            exporter.start()
+        asyncio.run(
+            run_db2i_cli(
+                debug_mode=args.debug,
+                model_id=args.model_id,
+                stream=args.stream,
+            )
         )
-    )
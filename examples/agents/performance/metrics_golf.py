@@ -1,10 +1,10 @@
 import os
-from textwrap import dedent
 from agno.agent import Agent
 from agno.models.ollama import Ollama
 from agno.tools import tool
+from db2i_shared_utils.bundle import MetricBundle
+from db2i_shared_utils.executor import SQLExecutor
 from dotenv import load_dotenv, find_dotenv
-from mapepire_python import connect
 
 load_dotenv(find_dotenv())
 
@@ -50,6 +50,16 @@ temp_storage_sql = """
     FROM QSYS2.SystmpSTG
 """
 
+key_metrics = MetricBundle(
+    SQLExecutor.shared(creds),
+    {
+        "system": system_metrics_sql,
+        "memory": memory_metrics_sql,
+        "jobs": job_metrics_sql,
+        "temp": temp_storage_sql,
+    },
+)
+
 @tool(
     name="get_key_metrics",
     description="Get key IBM i performance metrics in a concise format",
@@ -62,25 +72,8 @@ def get_key_metrics():
     Returns:
         str: Summary of CPU, memory, job, and temporary storage metrics
     """
-    result = {}
-    
-    # Execute each query and capture results
-    with connect(creds) as conn:
-        with conn.execute(dedent(system_metrics_sql)) as cur:
-            if cur.has_results:
-                result["system"] = cur.fetchall()["data"]
-        
-        with conn.execute(dedent(memory_metrics_sql)) as cur:
-            if cur.has_results:
-                result["memory"] = cur.fetchall()["data"]
-        
-        with conn.execute(dedent(job_metrics_sql)) as cur:
-            if cur.has_results:
-                result["jobs"] = cur.fetchall()["data"]
-        
-        with conn.execute(dedent(temp_storage_sql)) as cur:
-            if cur.has_results:
-                result["temp"] = cur.fetchall()["data"]
+    # All four queries run as one statement: one round trip per refresh
+    result = key_metrics.execute()
     
     # Format the output in a concise way
     output = []
@@ -88,28 +81,37 @@ def get_key_metrics():
     # System metrics
     if "system" in result and result["system"]:
         sys_data = result["system"][0]
-        output.append(f"SYSTEM METRICS ({sys_data[0]})")
-        output.append(f"CPU: {sys_data[1]}% | Active Jobs: {sys_data[2]} | Performance: {sys_data[5]}/{sys_data[6]}")
+        output.append(f"SYSTEM METRICS ({sys_data['TIMESTAMP']})")
+        output.append(
+            f"CPU: {sys_data['CPU_PCT']}% | Active Jobs: {sys_data['ACTIVE_JOBS']} | "
+            f"Performance: {sys_data['CURRENT_INTERACTIVE_PERFORMANCE']}/{sys_data['MAXIMUM_INTERACTIVE_PERFORMANCE']}"
+        )
         output.append("")
     
     # Memory pools
     if "memory" in result and result["memory"]:
         output.append("MEMORY POOLS")
         for pool in result["memory"]:
-            output.append(f"Pool {pool[0]} ({pool[1]}): {pool[2]}MB/{pool[3]}MB | Threads: {pool[5]}/{pool[4]}")
+            output.append(
+                f"Pool {pool['SYSTEM_POOL_ID']} ({pool['POOL_NAME']}): {pool['SIZE_MB']}MB/{pool['DEFINED_MB']}MB | "
+                f"Threads: {pool['CURRENT_THREADS']}/{pool['MAXIMUM_ACTIVE_THREADS']}"
+            )
         output.append("")
     
     # Top subsystems
     if "jobs" in result and result["jobs"]:
         output.append("TOP SUBSYSTEMS BY ACTIVE JOBS")
         for subsys in result["jobs"]:
-            output.append(f"{subsys[1]}: {subsys[2]}/{subsys[3]} active jobs")
+            output.append(
+                f"{subsys['SUBSYSTEM_DESCRIPTION_NAME']}: "
+                f"{subsys['CURRENT_ACTIVE_JOBS']}/{subsys['MAXIMUM_ACTIVE_JOBS']} active jobs"
+            )
         output.append("")
     
     # Temp storage
     if "temp" in result and result["temp"]:
         temp_data = result["temp"][0]
-        output.append(f"TEMP STORAGE: Current {temp_data[0]}MB | Peak {temp_data[1]}MB")
+        output.append(f"TEMP STORAGE: Current {temp_data['CURRENT_MB']}MB | Peak {temp_data['PEAK_MB']}MB")
     
     return "\n".join(output)
 
@@ -7,7 +7,7 @@ from agno.agent import Agent
 from agno.tools import tool
 from db2i_shared_utils.cli import get_model
 from dotenv import load_dotenv, find_dotenv
-from mapepire_python import connect
+from db2i_shared_utils.executor import SQLExecutor
 from pep249 import QueryParameters, ResultSet
 from agno.tools.reasoning import ReasoningTools
 from dotenv import load_dotenv, find_dotenv
@@ -220,13 +220,10 @@ def run_sql_statement(
     Returns:
         Formatted string with SQL results
     """
-    with connect(creds) as conn:
-        with conn.execute(sql, parameters=parameters) as cur:
-            if cur.has_results:
-                result = cur.fetchall()
-                return result["data"]
-            else:
-                return "SQL executed successfully. No results returned."
+    result = SQLExecutor.shared(creds).execute(sql, parameters)
+    if result.has_results:
+        return result.rows
+    return "SQL executed successfully. No results returned."
 
 
 profile_security_agent = Agent(
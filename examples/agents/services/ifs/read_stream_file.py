@@ -1,14 +1,14 @@
+import atexit
 import os
-import re
 from textwrap import dedent
-from typing import Any, Dict, Optional, List
+from typing import List, Optional, Tuple
 
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools import tool
 from dotenv import load_dotenv, find_dotenv
-from mapepire_python import connect
-from pep249 import QueryParameters
+from db2i_shared_utils.executor import SQLExecutor
+from db2i_shared_utils.ifs import IFSReader
 
 load_dotenv(find_dotenv())
 
@@ -19,86 +19,19 @@ credentials = {
     "port": os.getenv("DB_PORT"),
 }
 
-# SQL for reading a file
-read_file_sql = dedent(
-    """
-    select line_number, line
-      from table (
-          qsys2.ifs_read(
-            path_name => ?, 
-            end_of_line => 'ANY',
-            maximum_line_length => default, 
-            ignore_errors => 'NO')
-        )
-    """
-)
-
-# SQL for reading specific lines of a file
-read_file_range_sql = dedent(
-    """
-    select line_number, line
-      from table (
-          qsys2.ifs_read(
-            path_name => ?, 
-            end_of_line => 'ANY',
-            maximum_line_length => default, 
-            ignore_errors => 'NO')
-        )
-      where line_number between ? and ?
-    """
-)
-
-# SQL for searching file content
-search_file_sql = dedent(
-    """
-    select line_number, line
-      from table (
-          qsys2.ifs_read(
-            path_name => ?, 
-            end_of_line => 'ANY',
-            maximum_line_length => default, 
-            ignore_errors => 'NO')
-        )
-      where upper(line) like upper(?)
-    """
-)
-
-# SQL to check if a file exists
-check_file_exists_sql = dedent(
-    """
-    select count(*) as file_count
-        from table(qsys2.IFS_OBJECT_STATISTICS( 
-            start_path_name => ?,
-            subtree_directories => 'NO'))
-    """
-)
-
-def run_sql_statement(
-    sql: str,
-    parameters: Optional[QueryParameters] = None,
-    creds: Dict[str, Any] = credentials,
-) -> str:
-    with connect(creds) as conn:
-        with conn.execute(sql, parameters=parameters) as cur:
-            if cur.has_results:
-                result = cur.fetchall()
-                return str(result["data"])
-            else:
-                return "No data found"
+# Existence, size and change time come from one IFS_OBJECT_STATISTICS query;
+# file content is streamed in chunks and cached locally until the file changes.
+# The cache is private to the current user and emptied when the agent exits,
+# since the files read can include configuration with credentials.
+reader = IFSReader(SQLExecutor.shared(credentials), os.getenv("IFS_CACHE_DIR"))
+atexit.register(reader.clear)
 
 
-def check_if_file_exists(file_path: str) -> bool:
-    """Internal helper function to check if a file exists
-    
-    Args:
-        file_path (str): Full path to the file in the IFS
-        
-    Returns:
-        bool: True if the file exists, False otherwise
-    """
-    result = run_sql_statement(sql=check_file_exists_sql, parameters=[file_path])
-    match = re.search(r"FILE_COUNT': (\d+)", result)
-    return match is not None and int(match.group(1)) > 0
+def format_lines(lines: List[Tuple[int, str]], empty_message: str = "No data found") -> str:
+    """Format numbered lines the way the SQL results used to be returned"""
+    if not lines:
+        return empty_message
+    return str([{"LINE_NUMBER": number, "LINE": line} for number, line in lines])
 
 
 @tool(
@@ -116,9 +49,9 @@ def check_file_exists(file_path: str) -> str:
     Returns:
         str: Confirmation if the file exists or not
     """
-    exists = check_if_file_exists(file_path)
-    if exists:
-        return f"File {file_path} exists."
+    info = reader.stat(file_path)
+    if info.exists:
+        return f"File {file_path} exists ({info.object_type}, {info.size} bytes, changed {info.changed})."
     else:
         return f"File {file_path} does not exist."
 
@@ -138,10 +71,11 @@ def read_file(file_path: str) -> str:
     Returns:
         str: The contents of the file with line numbers
     """
-    if not check_if_file_exists(file_path):
-        return f"File {file_path} does not exist."
-        
-    return run_sql_statement(sql=read_file_sql, parameters=[file_path])
+    try:
+        with reader.open(file_path) as f:
+            return format_lines(f.lines())
+    except (FileNotFoundError, ValueError) as e:
+        return str(e)
 
 
 @tool(
@@ -161,10 +95,11 @@ def read_file_lines(file_path: str, start_line: int, end_line: int) -> str:
     Returns:
         str: The specified lines of the file with line numbers
     """
-    if not check_if_file_exists(file_path):
-        return f"File {file_path} does not exist."
-        
-    return run_sql_statement(sql=read_file_range_sql, parameters=[file_path, start_line, end_line])
+    try:
+        with reader.open(file_path) as f:
+            return format_lines(f.lines(start_line, end_line))
+    except (FileNotFoundError, ValueError) as e:
+        return str(e)
 
 
 @tool(
@@ -183,20 +118,119 @@ def search_file(file_path: str, search_text: str) -> str:
     Returns:
         str: Lines containing the search text with line numbers
     """
-    if not check_if_file_exists(file_path):
-        return f"File {file_path} does not exist."
-        
     # Add wildcards if not already present
     if '%' not in search_text:
         search_pattern = f'%{search_text}%'
     else:
         search_pattern = search_text
+
+    try:
+        with reader.open(file_path) as f:
+            return format_lines(f.search(search_pattern))
+    except (FileNotFoundError, ValueError) as e:
+        return str(e)
+
+@tool(
+    name="search_file_patterns",
+    description=(
+        "Search a file in the IBM i IFS for several literal or regex patterns at once "
+        "and return the matching lines with surrounding context"
+    ),
+    show_result=False,
+    stop_after_tool_call=False,
+)
+def search_file_patterns(
+    file_path: str,
+    patterns: List[str],
+    regex: bool = False,
+    context_lines: int = 2,
+    max_matches: int = 200,
+) -> str:
+    """Search a file for several patterns in one pass and show each match in context.
+    
+    Args:
+        file_path (str): Full path to the file in the IFS
+        patterns (List[str]): Texts to search for, case-insensitive, e.g. ["CPF", "MCH", "error"]
+        regex (bool): Treat the patterns as regular expressions
+        context_lines (int): Lines to show before and after each matching line
+        max_matches (int): Most matching lines to return
         
-    return run_sql_statement(sql=search_file_sql, parameters=[file_path, search_pattern])
+    Returns:
+        str: Blocks of numbered lines; matching lines are marked with > and the
+        patterns they matched
+    """
+    try:
+        with reader.open(file_path) as f:
+            hits = f.find(patterns, regex=regex, limit=max_matches)
+            if not hits:
+                return f"No lines in {file_path} match {patterns}."
+            matched = {hit.line_number: hit.patterns for hit in hits}
+            blocks = []
+            for start, end in f.context(list(matched), context_lines, context_lines):
+                block = [f"lines {start}-{end}:"]
+                for number, line in f.lines(start, end):
+                    if number in matched:
+                        block.append(f"> {number}: {line}  {matched[number]}")
+                    else:
+                        block.append(f"  {number}: {line}")
+                blocks.append("\n".join(block))
+    except (FileNotFoundError, ValueError) as e:
+        return str(e)
+
+    summary = f"{len(hits)} matching lines of {f.line_count}"
+    if len(hits) == max_matches:
+        summary += f" (stopped at {max_matches})"
+    return summary + "\n\n" + "\n\n".join(blocks)
+
+
+@tool(
+    name="tail_file",
+    description=(
+        "Return only the lines added to a growing IFS file, such as a log, since the last "
+        "call, with a token to continue from; can wait a few seconds for new lines"
+    ),
+    show_result=False,
+    stop_after_tool_call=False,
+)
+def tail_file(
+    file_path: str,
+    since_token: Optional[str] = None,
+    follow_seconds: float = 0,
+    max_lines: int = 200,
+) -> str:
+    """Return the new lines of a file since a continuation token.
+    
+    Args:
+        file_path (str): Full path to the file in the IFS
+        since_token (str): Token from the previous tail_file call; without one the
+            tail continues from the previous call for this file, or starts with
+            the last lines of the file
+        follow_seconds (float): Keep collecting new lines for up to this many seconds
+        max_lines (int): Most lines to return
+        
+    Returns:
+        str: The new lines with line numbers and the token for the next call
+    """
+    try:
+        if follow_seconds > 0:
+            result = reader.follow(file_path, since_token, window=follow_seconds, max_lines=max_lines)
+        else:
+            result = reader.tail(file_path, since_token, max_lines=max_lines)
+    except (FileNotFoundError, ValueError) as e:
+        return str(e)
+
+    notes = []
+    if result.reset:
+        notes.append("The file was truncated or replaced; reading restarted from line 1.")
+    if result.more:
+        notes.append(f"More than {max_lines} new lines; call again with the token to continue.")
+    lines = format_lines(result.lines, empty_message="No new lines.")
+    return "\n".join(notes + [lines, f"Continuation token: {result.token}"])
+
 
 agent = Agent(
     model=OpenAIChat(id="gpt-4o", api_key=os.getenv("OPENAI_API_KEY")),
-    tools=[check_file_exists, read_file, read_file_lines, search_file],
+    tools=[check_file_exists, read_file, read_file_lines, search_file, search_file_patterns, tail_file],
     instructions=dedent(
         """\
         You are an IBM i IFS file reader assistant. Help users view and analyze contents of 
@@ -211,6 +245,12 @@ agent = Agent(
         When reading files:
         - For large files, suggest reading specific line ranges instead of the entire file
         - When searching, remind users they can use % as wildcards in their search patterns
+        - To look for several messages or IDs at once, or with context around each hit,
+          use `search_file_patterns`; repeated searches of an unchanged file are served
+          from the local cache
+        - To watch a log file, use `tail_file` and pass the continuation token it returns
+          to the next call, so only new lines are read; set `follow_seconds` to wait for
+          lines that are about to be written
         - If a file doesn't exist, clearly inform the user
         - Provide insights about the file content when possible
         """
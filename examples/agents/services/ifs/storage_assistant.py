@@ -6,7 +6,7 @@ from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools import tool
 from dotenv import load_dotenv, find_dotenv
-from mapepire_python import connect
+from db2i_shared_utils.executor import SQLExecutor
 from pep249 import QueryParameters
 from agno.storage.sqlite import SqliteStorage
 
@@ -83,13 +83,7 @@ def run_sql_statement(
     parameters: Optional[QueryParameters] = None,
     creds: Dict[str, Any] = credentials,
 ) -> str:
-    with connect(creds) as conn:
-        with conn.execute(sql, parameters=parameters) as cur:
-            if cur.has_results:
-                result = cur.fetchall()
-                return str(result["data"])
-            else:
-                return "No data found matching the criteria"
+    return SQLExecutor.shared(creds).run(sql, parameters, empty_message="No data found matching the criteria")
 
 
 @tool(
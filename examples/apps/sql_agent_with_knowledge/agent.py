@@ -32,6 +32,7 @@ from dotenv import dotenv_values
 from mcp import StdioServerParameters
 
 from cli import CLIConfig, InteractiveCLI
+from ingest import CachedEmbedder
 
 env = dotenv_values()
 
@@ -71,8 +72,8 @@ agent_knowledge = CombinedKnowledgeBase(
         uri="tmp/lancedb",
         table_name="sql_agent_knowledge",
         search_type=SearchType.hybrid,
-        # Use OpenAI embeddings
-        embedder=OllamaEmbedder(),
+        # Use Ollama embeddings, cached on disk by chunk content
+        embedder=CachedEmbedder(embedder=OllamaEmbedder()),
     ),
     # 5 references are added to the prompt
     num_documents=5,
@@ -0,0 +1,321 @@
+"""Incremental knowledge ingestion for the SQL agent.
+
+The stock `AgentKnowledge.load()` re-reads, re-chunks and re-embeds every file
+in the knowledge directory on each run. On CPU-only boxes running Ollama
+embeddings that is the slowest step of the whole setup, so this module keeps
+two pieces of state under `tmp/`:
+
+- a manifest mapping each knowledge file to its content hash and the ids of
+  the chunks it produced, so unchanged files are skipped entirely and stale
+  chunks of changed/removed files can be deleted from LanceDb
+- a persistent embedding cache keyed by the embedder model and chunk text, so
+  a chunk is only ever embedded once per model
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from agno.document import Document
+from agno.embedder.base import Embedder
+from agno.embedder.ollama import OllamaEmbedder
+from agno.knowledge.agent import AgentKnowledge
+from agno.knowledge.combined import CombinedKnowledgeBase
+from agno.utils.log import log_debug, logger
+
+
+def file_hash(path: Path) -> str:
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(document: Document) -> str:
+    """Return the id LanceDb stores for a document chunk.
+
+    agno's `LanceDb.insert` ignores `Document.id` and stores the md5 of the
+    chunk content, with NUL characters replaced, as the row id. Stale chunks
+    are deleted by that id, so this must match `agno.vectordb.lancedb.LanceDb`
+    of the pinned agno version; check it when upgrading agno.
+    """
+    cleaned_content = document.content.replace("\x00", "\ufffd")
+    return hashlib.md5(cleaned_content.encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent text -> embedding cache backed by a local SQLite file."""
+
+    def __init__(self, path: str = "tmp/embedding_cache.db"):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, items: List[Tuple[str, List[float]]]) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, json.dumps(vector)) for key, vector in items],
+            )
+            self._conn.commit()
+
+
+@dataclass
+class CachedEmbedder(Embedder):
+    """Embedder wrapper that answers from an `EmbeddingCache` before calling out.
+
+    Pass it as the `embedder` of the vector db so that every embedding request,
+    including the ones LanceDb issues itself during `insert`, goes through the
+    cache.
+    """
+
+    embedder: Embedder = None
+    cache_path: str = "tmp/embedding_cache.db"
+    cache: Optional[EmbeddingCache] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.embedder is None:
+            raise ValueError("CachedEmbedder requires an embedder to wrap")
+        self.dimensions = self.embedder.dimensions
+        if self.cache is None:
+            self.cache = EmbeddingCache(self.cache_path)
+
+    @property
+    def model_key(self) -> str:
+        model_id = getattr(self.embedder, "id", type(self.embedder).__name__)
+        return f"{type(self.embedder).__name__}:{model_id}:{self.dimensions}"
+
+    def cached(self, text: str) -> Optional[List[float]]:
+        return self.cache.get(EmbeddingCache.key(self.model_key, text))
+
+    def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the wrapped embedder, in one request for Ollama.
+
+        Ollama's `/api/embed` takes a list of inputs; other embedders are
+        called once per text.
+        """
+        if not isinstance(self.embedder, OllamaEmbedder):
+            return [self.embedder.get_embedding(text) for text in texts]
+
+        kwargs = {} if self.embedder.options is None else {"options": self.embedder.options}
+        try:
+            response = self.embedder.client.embed(input=texts, model=self.embedder.id, **kwargs)
+            embeddings = list(response["embeddings"])
+        except Exception as e:
+            logger.warning(e)
+            return [[] for _ in texts]
+        if len(embeddings) != len(texts):
+            logger.warning(f"Expected {len(texts)} embeddings, but got {len(embeddings)}")
+            return [[] for _ in texts]
+        # Same dimension check as OllamaEmbedder.get_embedding
+        return [list(vector) if len(vector) == self.dimensions else [] for vector in embeddings]
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts, sending all cache misses in one request."""
+        keys = [EmbeddingCache.key(self.model_key, text) for text in texts]
+        found = {key: self.cache.get(key) for key in keys}
+        missing = {key: text for key, text in zip(keys, texts) if found[key] is None}
+        if missing:
+            vectors = self._embed_many(list(missing.values()))
+            self.cache.put_many([(key, vector) for key, vector in zip(missing, vectors) if vector])
+            found.update(zip(missing, vectors))
+        return [found[key] for key in keys]
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        vector = self.cached(text)
+        if vector is not None:
+            return vector, None
+        vector, usage = self.embedder.get_embedding_and_usage(text)
+        if vector:
+            self.cache.put_many([(EmbeddingCache.key(self.model_key, text), vector)])
+        return vector, usage
+
+
+class KnowledgeIngestor:
+    """Load a knowledge base into its vector db, re-embedding only what changed.
+
+    Args:
+        knowledge: The knowledge base to ingest. A `CombinedKnowledgeBase` is
+            expanded into its sources.
+        manifest_path: Where to persist file hashes and chunk ids between runs.
+        batch_size: Number of chunks per worker task. The uncached chunks of a
+            task are embedded in one request where the embedder supports it.
+        max_workers: Number of concurrent embedding workers.
+    """
+
+    def __init__(
+        self,
+        knowledge: AgentKnowledge,
+        manifest_path: str = "tmp/knowledge_manifest.json",
+        batch_size: int = 16,
+        max_workers: int = 4,
+    ):
+        if knowledge.vector_db is None:
+            raise ValueError("Knowledge base has no vector db to ingest into")
+        if batch_size <= 0 or max_workers <= 0:
+            raise ValueError("batch_size and max_workers must be positive")
+
+        self.knowledge = knowledge
+        self.vector_db = knowledge.vector_db
+        if not isinstance(self.vector_db.embedder, CachedEmbedder):
+            self.vector_db.embedder = CachedEmbedder(embedder=self.vector_db.embedder)
+        self.manifest_path = Path(manifest_path)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    @property
+    def sources(self) -> List[AgentKnowledge]:
+        if isinstance(self.knowledge, CombinedKnowledgeBase):
+            return list(self.knowledge.sources)
+        return [self.knowledge]
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_manifest(self, manifest: Dict[str, Dict]) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    def _read_file(self, path: Path) -> List[Document]:
+        """Read one file through whichever sources accept it."""
+        documents = []
+        for source in self.sources:
+            single_file = source.model_copy(update={"path": path})
+            for document_list in single_file.document_lists:
+                documents.extend(document_list)
+        return documents
+
+    def _list_files(self) -> Dict[str, Path]:
+        files = {}
+        for source in self.sources:
+            root = Path(getattr(source, "path", ""))
+            candidates = [root] if root.is_file() else root.glob("**/*")
+            for path in candidates:
+                if path.is_file():
+                    files[str(path)] = path
+        return files
+
+    def _embed(self, documents: List[Document]) -> None:
+        """Embed documents in batches on a worker pool.
+
+        Results land in the embedding cache, so the `insert` that follows
+        only reads them back.
+        """
+        embedder: CachedEmbedder = self.vector_db.embedder
+        batches = [
+            documents[i : i + self.batch_size]
+            for i in range(0, len(documents), self.batch_size)
+        ]
+
+        def embed_batch(batch: List[Document]) -> None:
+            vectors = embedder.embed_batch([d.content for d in batch])
+            for document, vector in zip(batch, vectors):
+                document.embedding = vector
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(embed_batch, batches))
+
+    @staticmethod
+    def _referenced(manifest: Dict[str, Dict], exclude: Optional[str] = None) -> Set[str]:
+        """Return the chunk ids recorded for every file but `exclude`."""
+        return {i for key, entry in manifest.items() if key != exclude for i in entry["chunk_ids"]}
+
+    def _delete_chunks(self, ids: List[str]) -> None:
+        if not ids or getattr(self.vector_db, "table", None) is None:
+            return
+        quoted = ", ".join(f"'{i}'" for i in ids)
+        self.vector_db.table.delete(f"id IN ({quoted})")
+
+    def ingest(self, recreate: bool = False) -> Dict[str, int]:
+        """Bring the vector db in line with the files on disk.
+
+        Args:
+            recreate: Drop the vector db table and the manifest first. The
+                embedding cache is kept, so a full rebuild is still cheap.
+
+        Returns:
+            Counts of added, updated, removed and unchanged files and the
+            number of chunks inserted.
+        """
+        if recreate:
+            self.vector_db.drop()
+            manifest = {}
+        else:
+            manifest = self._load_manifest()
+        self.vector_db.create()
+
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks": 0}
+        files = self._list_files()
+
+        for removed in sorted(set(manifest) - set(files)):
+            log_debug(f"Removing chunks for deleted file {removed}")
+            ids = manifest.pop(removed)["chunk_ids"]
+            # Identical chunks of other files share the same row.
+            self._delete_chunks(sorted(set(ids) - self._referenced(manifest)))
+            stats["removed"] += 1
+
+        for key, path in sorted(files.items()):
+            digest = file_hash(path)
+            previous = manifest.get(key)
+            if previous and previous["sha256"] == digest:
+                stats["unchanged"] += 1
+                continue
+
+            documents = self._read_file(path)
+            new_ids = [chunk_id(d) for d in documents]
+            shared = self._referenced(manifest, exclude=key)
+            if previous:
+                known_ids = set(previous["chunk_ids"])
+                self._delete_chunks(sorted(known_ids - set(new_ids) - shared))
+            else:
+                known_ids = set()
+
+            fresh, seen = [], known_ids | shared
+            for document, document_id in zip(documents, new_ids):
+                if document_id in seen or (not previous and self.vector_db.doc_exists(document)):
+                    continue
+                seen.add(document_id)
+                fresh.append(document)
+
+            if fresh:
+                self._embed(fresh)
+                self.vector_db.insert(documents=fresh)
+                stats["chunks"] += len(fresh)
+
+            manifest[key] = {"sha256": digest, "chunk_ids": new_ids}
+            stats["updated" if previous else "added"] += 1
+            logger.info(f"Ingested {path.name}: {len(fresh)} new chunk(s)")
+
+        self._save_manifest(manifest)
+        return stats
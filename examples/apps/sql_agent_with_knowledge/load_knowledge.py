@@ -1,5 +1,6 @@
 from agents import agent_knowledge
 from agno.utils.log import logger
+from ingest import KnowledgeIngestor
 from mapepire_python import Connection, connect
 from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
@@ -25,7 +26,13 @@ server_params = StdioServerParameters(
 )
 
 
-async def run(destination="knowledge/sample", recreate=False, load_to_agent=True):
+async def run(
+    destination="knowledge/sample",
+    recreate=False,
+    load_to_agent=True,
+    batch_size=16,
+    workers=4,
+):
     # Check if destination directory exists and has files
     if os.path.exists(destination) and os.listdir(destination):
         if not recreate:
@@ -34,7 +41,7 @@ async def run(destination="knowledge/sample", recreate=False, load_to_agent=True
             # If we don't want to recreate but want to load existing knowledge, load it and return
             if load_to_agent:
                 logger.info("Loading existing knowledge into agent...")
-                load_knowledge_to_agent(destination)
+                load_knowledge_to_agent(destination, batch_size=batch_size, workers=workers)
             return
         else:
             logger.info(f"Recreating knowledge base in '{destination}'...")
@@ -48,7 +55,9 @@ async def run(destination="knowledge/sample", recreate=False, load_to_agent=True
     # Load the knowledge into agent if requested
     if load_to_agent:
         logger.info("Loading knowledge into agent...")
-        load_knowledge_to_agent(destination, recreate)
+        load_knowledge_to_agent(
+            destination, recreate=recreate, batch_size=batch_size, workers=workers
+        )
 
 
 async def fetch_table_descriptions(destination):
@@ -90,12 +99,19 @@ async def fetch_table_descriptions(destination):
                                         )
 
 
-def load_knowledge_to_agent(destination, recreate = False):
-    """Load knowledge base into agent"""
+def load_knowledge_to_agent(destination, recreate=False, batch_size=16, workers=4):
+    """Load knowledge base into agent
+
+    Only files whose content changed since the last run are re-chunked and
+    re-embedded; everything else is skipped via the ingest manifest.
+    """
     try:
         # Use agent_knowledge from agents.py to load knowledge
-        agent_knowledge.load(recreate=recreate)
-        logger.info(f"Successfully loaded knowledge from '{destination}' into agent")
+        ingestor = KnowledgeIngestor(
+            agent_knowledge, batch_size=batch_size, max_workers=workers
+        )
+        stats = ingestor.ingest(recreate=recreate)
+        logger.info(f"Successfully loaded knowledge from '{destination}' into agent: {stats}")
     except Exception as e:
         logger.error(f"Failed to load knowledge into agent: {str(e)}")
 
@@ -109,8 +125,20 @@ if __name__ == "__main__":
                       help="Overwrite existing files if destination directory already exists (default: False)")
     parser.add_argument("--no-load", action="store_true", 
                       help="Skip loading knowledge into agent (default: False, knowledge is loaded)")
+    parser.add_argument("--batch-size", type=int, default=16,
+                      help="Number of chunks embedded per request (default: 16)")
+    parser.add_argument("--workers", type=int, default=4,
+                      help="Number of concurrent embedding workers (default: 4)")
     
     args = parser.parse_args()
     
     # Run with provided arguments (note: no-load inverts the load_to_agent parameter)
-    asyncio.run(run(destination=args.destination, recreate=args.recreate, load_to_agent=not args.no_load))
+    asyncio.run(
+        run(
+            destination=args.destination,
+            recreate=args.recreate,
+            load_to_agent=not args.no_load,
+            batch_size=args.batch_size,
+            workers=args.workers,
+        )
+    )
@@ -0,0 +1,187 @@
+import os
+import sys
+import tempfile
+import unittest
+from dataclasses import dataclass
+from pathlib import Path
+
+# Add the app directory to the Python path so `ingest` imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agno.document import Document
+from agno.embedder.base import Embedder
+from agno.embedder.ollama import OllamaEmbedder
+
+from ingest import CachedEmbedder, KnowledgeIngestor, chunk_id
+
+
+@dataclass
+class CountingEmbedder(Embedder):
+    dimensions: int = 1
+    calls: int = 0
+
+    def get_embedding(self, text):
+        self.calls += 1
+        return [float(len(text))]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+class FakeOllamaClient:
+    def __init__(self):
+        self.inputs = []
+
+    def embed(self, input, model, **kwargs):
+        self.inputs.append(input)
+        return {"embeddings": [[float(len(text))] for text in input]}
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def delete(self, where):
+        ids = where[len("id IN (") : -1].split(", ")
+        for i in ids:
+            self.rows.pop(i.strip("'"), None)
+
+
+class FakeVectorDb:
+    """Stores rows by the same id LanceDb derives from the content."""
+
+    def __init__(self, cache_path):
+        self.embedder = CachedEmbedder(embedder=CountingEmbedder(), cache_path=cache_path)
+        self.rows = {}
+        self.table = FakeTable(self.rows)
+
+    def create(self):
+        pass
+
+    def drop(self):
+        self.rows.clear()
+
+    def doc_exists(self, document):
+        return chunk_id(document) in self.rows
+
+    def insert(self, documents):
+        for document in documents:
+            self.rows[chunk_id(document)] = document.content
+
+
+class LineKnowledge:
+    """Knowledge source that chunks each file into one document per line."""
+
+    def __init__(self, path, vector_db):
+        self.path = path
+        self.vector_db = vector_db
+
+    def model_copy(self, update):
+        return LineKnowledge(update["path"], self.vector_db)
+
+    @property
+    def document_lists(self):
+        lines = Path(self.path).read_text().splitlines()
+        yield [Document(content=line) for line in lines if line]
+
+
+class TestChunkId(unittest.TestCase):
+
+    def test_matches_content(self):
+        self.assertEqual(chunk_id(Document(content="a")), chunk_id(Document(content="a", id="other")))
+        self.assertNotEqual(chunk_id(Document(content="a")), chunk_id(Document(content="b")))
+        self.assertEqual(chunk_id(Document(content="a\x00")), chunk_id(Document(content="a\ufffd")))
+
+
+class TestCachedEmbedder(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.client = FakeOllamaClient()
+        self.embedder = CachedEmbedder(
+            embedder=OllamaEmbedder(dimensions=1, ollama_client=self.client),
+            cache_path=str(Path(directory.name) / "embeddings.db"),
+        )
+
+    def test_ollama_misses_embedded_in_one_request(self):
+        self.assertEqual(self.embedder.embed_batch(["a", "bb"]), [[1.0], [2.0]])
+        self.assertEqual(self.embedder.embed_batch(["a", "ccc", "ccc"]), [[1.0], [3.0], [3.0]])
+        self.assertEqual(self.client.inputs, [["a", "bb"], ["ccc"]])
+
+    def test_wrong_dimension_not_cached(self):
+        self.embedder.dimensions = 2
+        self.assertEqual(self.embedder.embed_batch(["a"]), [[]])
+        self.embedder.embed_batch(["a"])
+        self.assertEqual(len(self.client.inputs), 2)
+
+
+class TestKnowledgeIngestor(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.docs = self.root / "docs"
+        self.docs.mkdir()
+        self.vector_db = FakeVectorDb(str(self.root / "embeddings.db"))
+        self.knowledge = LineKnowledge(self.docs, self.vector_db)
+        self.ingestor = self.new_ingestor()
+
+    def new_ingestor(self):
+        return KnowledgeIngestor(
+            self.knowledge, manifest_path=str(self.root / "manifest.json"), batch_size=2, max_workers=2
+        )
+
+    def write(self, name, *lines):
+        (self.docs / name).write_text("\n".join(lines))
+
+    def stored(self):
+        return sorted(self.vector_db.rows.values())
+
+    def test_manifest_diff(self):
+        self.write("a.md", "alpha", "beta")
+        self.write("b.md", "gamma")
+        self.assertEqual(self.ingestor.ingest(), {"added": 2, "updated": 0, "removed": 0, "unchanged": 0, "chunks": 3})
+
+        self.write("a.md", "alpha", "delta")
+        (self.docs / "b.md").unlink()
+        stats = self.new_ingestor().ingest()
+        self.assertEqual(stats, {"added": 0, "updated": 1, "removed": 1, "unchanged": 0, "chunks": 1})
+        self.assertEqual(self.stored(), ["alpha", "delta"])
+
+        self.assertEqual(self.new_ingestor().ingest()["unchanged"], 1)
+
+    def test_shared_chunk_kept_while_referenced(self):
+        self.write("a.md", "shared", "only a")
+        self.write("b.md", "shared", "only b")
+        self.assertEqual(self.ingestor.ingest()["chunks"], 3)
+
+        # The chunk is still used by b.md
+        self.write("a.md", "only a, edited")
+        self.ingestor.ingest()
+        self.assertEqual(self.stored(), ["only a, edited", "only b", "shared"])
+
+        # A file picking the chunk back up does not insert it twice
+        self.write("a.md", "shared", "only a, edited")
+        self.assertEqual(self.ingestor.ingest()["chunks"], 0)
+
+        (self.docs / "b.md").unlink()
+        self.ingestor.ingest()
+        self.assertIn("shared", self.stored())
+
+        (self.docs / "a.md").unlink()
+        self.ingestor.ingest()
+        self.assertEqual(self.stored(), [])
+
+    def test_recreate_reembeds_from_cache(self):
+        self.write("a.md", "alpha")
+        self.ingestor.ingest()
+        calls = self.vector_db.embedder.embedder.calls
+        self.assertEqual(self.ingestor.ingest(recreate=True)["added"], 1)
+        self.assertEqual(self.stored(), ["alpha"])
+        self.assertEqual(self.vector_db.embedder.embedder.calls, calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+import unittest
+from collections import OrderedDict
+from unittest.mock import patch
+
+# Add the project directory to the Python path so `tools` imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agno.tools.function import FunctionCall
+from agno.tools.toolkit import Toolkit
+
+from tools import db2i_tools
+from tools.db2i_tools import Db2iTools
+
+SERVER = {"host": "example", "user": "user", "password": "secret", "port": 8076}
+
+
+class FakeDatabase:
+    def __init__(self, **kwargs):
+        self.calls = []
+
+    def get_usable_table_names(self):
+        self.calls.append("sync")
+        return ["EMPLOYEE"]
+
+    async def aget_usable_table_names(self):
+        self.calls.append("async")
+        return ["EMPLOYEE"]
+
+    def run_no_throw(self, query, include_columns=False, fetch="all"):
+        self.calls.append("sync")
+        return [{"ID": 1}]
+
+
+def legacy_init(self, name="toolkit", **kwargs):
+    # agno 1.x keeps sync and async tools in one dict
+    self.name = name
+    self.functions = OrderedDict()
+
+
+def legacy_register(self, function, name=None):
+    self.functions[name or function.__name__] = function
+
+
+class TestDb2iTools(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(db2i_tools, "Db2iDatabase", FakeDatabase)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_runs_synchronously(self):
+        tools = Db2iTools(schema="SAMPLE", server_config=SERVER)
+        call = FunctionCall(function=tools.functions["list_tables"], arguments={})
+        call.execute()
+        self.assertEqual(call.result, '["EMPLOYEE"]')
+        self.assertEqual(tools.db2i_database.calls, ["sync"])
+
+        call = FunctionCall(function=tools.functions["run_sql_query"], arguments={"query": "SELECT 1 FROM T"})
+        call.execute()
+        self.assertEqual(call.result, "[{'ID': 1}]")
+
+    def test_async_variant_when_supported(self):
+        tools = Db2iTools(schema="SAMPLE", server_config=SERVER)
+        if not hasattr(tools, "async_functions"):
+            self.skipTest("agno keeps no separate async tools")
+        entrypoint = tools.async_functions["list_tables"].entrypoint
+        self.assertEqual(asyncio.run(entrypoint()), '["EMPLOYEE"]')
+        self.assertEqual(tools.db2i_database.calls, ["async"])
+
+    def test_single_function_dict_keeps_sync_tools(self):
+        with patch.object(Toolkit, "__init__", legacy_init), patch.object(Toolkit, "register", legacy_register):
+            tools = Db2iTools(schema="SAMPLE", server_config=SERVER)
+        self.assertEqual(list(tools.functions), ["list_tables", "describe_table", "run_sql_query"])
+        self.assertEqual(tools.functions["list_tables"](), '["EMPLOYEE"]')
+        self.assertEqual(tools.db2i_database.calls, ["sync"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,21 @@ class Configuration:
         },
     )
 
+    prefetch_schema: bool = field(
+        default=True,
+        metadata={
+            "description": "Whether to describe the tables that match the question before the first model call, "
+            "instead of letting the agent list and describe them one tool call at a time."
+        },
+    )
+
+    prefetch_max_tables: int = field(
+        default=5,
+        metadata={
+            "description": "The maximum number of matching tables to describe up front."
+        },
+    )
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -7,9 +7,9 @@ from datetime import datetime, timezone
 from textwrap import dedent
 from typing import Dict, List, Literal, cast
 
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.graph import StateGraph
+from langgraph.graph import MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode
 
 from langchain_anthropic import ChatAnthropic
@@ -196,7 +196,65 @@ db = Db2iDatabase(schema=SCHEMA, server_config=config, ignore_tables=["EMPLOYEES
 toolkit = Db2iDatabaseToolkit(db=db, llm=llm)
 tools = toolkit.get_tools()
 
-graph = create_react_agent(llm, tools=tools, prompt=system_message, interrupt_before=["tools"])
+agent = create_react_agent(llm, tools=tools, prompt=system_message, interrupt_before=["tools"])
+
+
+async def prefetch_schema(
+    state: MessagesState, config: RunnableConfig
+) -> Dict[str, List[AnyMessage]]:
+    """Describe the tables that match the question before the agent starts.
+
+    The system prompt has the model list the tables and then describe the
+    relevant ones, one model call per step. Table names are matched against
+    the question over the cached catalog instead, the matches are described
+    in parallel, and the results are added as if the agent had called
+    `sql_db_list_tables` and `sql_db_schema` itself, so it can go straight
+    to writing the query.
+
+    Does nothing when prefetching is disabled, the latest message is not a
+    question, or no table matches.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    last_message = state["messages"][-1] if state["messages"] else None
+    if not configuration.prefetch_schema or not isinstance(last_message, HumanMessage):
+        return {"messages": []}
+
+    try:
+        table_names = await db.aget_usable_table_names()
+        tables, table_info = await db.aget_relevant_table_info(
+            last_message.text(), max_tables=configuration.prefetch_max_tables
+        )
+    except Exception:
+        # The agent can still discover the schema through its tools.
+        return {"messages": []}
+    if not tables:
+        return {"messages": []}
+
+    list_call_id = f"prefetch_list_{last_message.id}"
+    schema_call_id = f"prefetch_schema_{last_message.id}"
+    tool_calls = AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "sql_db_list_tables", "args": {"tool_input": ""}, "id": list_call_id},
+            {"name": "sql_db_schema", "args": {"table_names": ", ".join(tables)}, "id": schema_call_id},
+        ],
+    )
+    return {
+        "messages": [
+            tool_calls,
+            ToolMessage(content=", ".join(table_names), tool_call_id=list_call_id),
+            ToolMessage(content=table_info, tool_call_id=schema_call_id),
+        ]
+    }
+
+
+builder = StateGraph(MessagesState, config_schema=Configuration)
+builder.add_node(prefetch_schema)
+builder.add_node("agent", agent)
+builder.add_edge("__start__", "prefetch_schema")
+builder.add_edge("prefetch_schema", "agent")
+
+graph = builder.compile()
 graph.name = "ReAct Agent"
 
 
@@ -0,0 +1,227 @@
+"""
+Batch evaluation and latency benchmark for the Db2i text-to-SQL chain.
+
+Runs every question of a question file through the same write_query ->
+execute_query -> generate_answer pipeline as `main.py --chain`, several at a
+time, and reports per-stage latency percentiles, token counts, execution
+success and, for questions with gold SQL, result-match accuracy.
+
+Each generated query runs exactly once: the rows it returned are kept for
+grading and rendered for the answer stage the way `QuerySQLDatabaseTool`
+renders them. Only the gold SQL is run separately, and the complete results
+are compared as multisets.
+
+The question file has one question per line, either as plain text or as a
+JSON object:
+
+    {"question": "How many employees are in each department?", "gold_sql": "SELECT ..."}
+
+Usage:
+    python main.py --batch questions.jsonl [--concurrency 4] [--report report.json]
+"""
+
+import json
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+STAGES = ("write_query", "execute_query", "generate_answer")
+
+
+class TokenCounter(BaseCallbackHandler):
+    """Sum the token usage reported by every LLM call it is attached to."""
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    with self._lock:
+                        self.input_tokens += usage.get("input_tokens", 0)
+                        self.output_tokens += usage.get("output_tokens", 0)
+
+
+def load_questions(path: str) -> List[Dict[str, Optional[str]]]:
+    """Read questions, with optional gold SQL, from a question file."""
+    questions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                questions.append(
+                    {"question": item["question"], "gold_sql": item.get("gold_sql")}
+                )
+            else:
+                questions.append({"question": line, "gold_sql": None})
+    return questions
+
+
+def result_key(rows: List[Dict[str, Any]]) -> Counter:
+    """Return an order- and column-name-insensitive key for a result set."""
+    return Counter(tuple(str(value).strip() for value in row.values()) for row in rows)
+
+
+def execute_query(state, db) -> Dict[str, Any]:
+    """Run the generated query once, keeping its rows for grading.
+
+    The result text is what `QuerySQLDatabaseTool` would have returned, so
+    the answer stage sees the same input as in `main.py --chain`.
+    """
+    try:
+        rows = db.engine.execute(state["query"])
+    except Exception as e:
+        return {"result": f"Error: {e}", "rows": None}
+    return {"result": db._format_result(rows, include_columns=False), "rows": rows}
+
+
+def results_match(db, rows: List[Dict[str, Any]], gold_sql: str) -> bool:
+    """Check whether the rows a generated query returned match the gold SQL."""
+    try:
+        expected = db.engine.execute(gold_sql)
+    except Exception:
+        return False
+    return result_key(rows) == result_key(expected)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_question(
+    item, table_info, db, llm, write_query: Callable, generate_answer: Callable
+) -> Dict[str, Any]:
+    """Run one question through the chain, timing each stage."""
+    counter = TokenCounter()
+    config = {"callbacks": [counter]}
+    state = {"question": item["question"], "query": "", "result": "", "answer": "", "rows": None}
+    record: Dict[str, Any] = {
+        "question": item["question"],
+        "gold_sql": item["gold_sql"],
+        "latency": {},
+        "error": None,
+    }
+
+    try:
+        for stage in STAGES:
+            start = time.perf_counter()
+            if stage == "write_query":
+                state.update(write_query(state, table_info, llm, config=config, verbose=False))
+            elif stage == "execute_query":
+                state.update(execute_query(state, db))
+            else:
+                state.update(generate_answer(state, llm, config=config, verbose=False))
+            record["latency"][stage] = time.perf_counter() - start
+    except Exception as e:
+        record["error"] = str(e)
+
+    record["query"] = state["query"]
+    record["answer"] = state["answer"]
+    record["executed"] = state["rows"] is not None
+    record["match"] = None
+    if item["gold_sql"]:
+        record["match"] = record["executed"] and results_match(db, state["rows"], item["gold_sql"])
+    record["latency"]["total"] = sum(record["latency"].values())
+    record["input_tokens"] = counter.input_tokens
+    record["output_tokens"] = counter.output_tokens
+    return record
+
+
+def summarize(records: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Aggregate per-question records into the benchmark report."""
+    latency = {}
+    for stage in (*STAGES, "total"):
+        values = [r["latency"][stage] for r in records if stage in r["latency"]]
+        if values:
+            latency[stage] = {
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "mean": statistics.fmean(values),
+            }
+
+    graded = [r for r in records if r["match"] is not None]
+    return {
+        "questions": len(records),
+        "wall_seconds": wall_seconds,
+        "throughput_qps": len(records) / wall_seconds if wall_seconds else 0.0,
+        "latency": latency,
+        "input_tokens": sum(r["input_tokens"] for r in records),
+        "output_tokens": sum(r["output_tokens"] for r in records),
+        "execution_success": sum(r["executed"] for r in records) / len(records) if records else 0.0,
+        "graded": len(graded),
+        "accuracy": sum(r["match"] for r in graded) / len(graded) if graded else None,
+    }
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    """Print the benchmark summary."""
+    print("\n📊 BENCHMARK RESULTS")
+    print("=" * 50)
+    print(f"❓ Questions: {summary['questions']} in {summary['wall_seconds']:.1f}s "
+          f"({summary['throughput_qps']:.2f} questions/s)")
+    print(f"{'stage':<16}{'p50':>9}{'p90':>9}{'p99':>9}{'mean':>9}")
+    for stage, stats in summary["latency"].items():
+        print(f"{stage:<16}" + "".join(f"{stats[k]:>8.2f}s" for k in ("p50", "p90", "p99", "mean")))
+    print(f"🔢 Tokens: {summary['input_tokens']} in / {summary['output_tokens']} out")
+    print(f"✅ Execution success: {summary['execution_success']:.1%}")
+    if summary["accuracy"] is not None:
+        print(f"🎯 Result-match accuracy: {summary['accuracy']:.1%} of {summary['graded']} graded")
+    print("=" * 50)
+
+
+def run_batch(args, db, llm, write_query: Callable, generate_answer: Callable) -> Dict[str, Any]:
+    """Run the chain over a question file and report speed and correctness.
+
+    `write_query` and `generate_answer` are the chain steps from `main.py`,
+    passed in so the script is not imported a second time.
+    """
+    questions = load_questions(args.batch)
+    print(f"📋 Loaded {len(questions)} questions from {args.batch}")
+
+    # One schema context for the whole run, built once on the shared engine.
+    print("📊 Retrieving table information...")
+    tables = [t.strip() for t in args.tables.split(",")] if args.tables else None
+    table_info = db.get_table_info(tables)
+    print("✅ Table information retrieved")
+
+    records: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {
+            pool.submit(run_question, item, table_info, db, llm, write_query, generate_answer): i
+            for i, item in enumerate(questions)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            records[futures[future]] = record
+            status = "error" if record["error"] else f"{record['latency']['total']:.2f}s"
+            print(f"[{done}/{len(questions)}] {status} {record['question']}", file=sys.stderr)
+    summary = summarize(records, time.perf_counter() - start)
+
+    print_report(summary)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"summary": summary, "questions": records}, f, indent=2, default=str)
+        print(f"📝 Report written to {args.report}")
+    return summary
@@ -53,6 +53,14 @@ class QuerySQLDatabaseTool(BaseDb2iDatabaseTool, BaseTool):  # type: ignore[over
         """Execute the query, return the results or an error message."""
         return self.db.run_no_throw(query)
 
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        """Execute the query on the async pool, return the results or an error message."""
+        return await self.db.arun_no_throw(query)
+
 
 @deprecated(
     since="0.3.12",
@@ -94,6 +102,16 @@ class InfoSQLDatabaseTool(BaseDb2iDatabaseTool, BaseTool):  # type: ignore[overr
             [t.strip() for t in table_names.split(",")]
         )
 
+    async def _arun(
+        self,
+        table_names: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        """Get the schema for tables in a comma-separated list, fetching them concurrently."""
+        return await self.db.aget_table_info_no_throw(
+            [t.strip() for t in table_names.split(",")]
+        )
+
 
 class _ListSQLDatabaseToolInput(BaseModel):
     tool_input: str = Field("", description="An empty string")
@@ -114,18 +132,32 @@ class ListSQLDatabaseTool(BaseDb2iDatabaseTool, BaseTool):  # type: ignore[overr
         """Get a comma-separated list of table names."""
         return ", ".join(self.db.get_usable_table_names())
 
+    async def _arun(
+        self,
+        tool_input: str = "",
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        """Get a comma-separated list of table names."""
+        return ", ".join(await self.db.aget_usable_table_names())
+
 
 class _QuerySQLCheckerToolInput(BaseModel):
     query: str = Field(..., description="A detailed and SQL query to be checked.")
 
 
 class QuerySQLCheckerTool(BaseDb2iDatabaseTool, BaseTool):  # type: ignore[override, override]
-    """Use an LLM to check if a query is correct.
-    Adapted from https://www.patterns.app/blog/2023/01/18/crunchbot-sql-analyst-gpt/"""
+    """Check if a query is correct.
+
+    The statement is first prepared on Db2 for i without being executed, which
+    reports syntax and object-resolution errors directly. The LLM is only asked
+    when the database cannot give a verdict, or on every call when
+    `validate_with_database` is off.
+    LLM check adapted from https://www.patterns.app/blog/2023/01/18/crunchbot-sql-analyst-gpt/"""
 
     template: str = QUERY_CHECKER
     llm: BaseLanguageModel
     llm_chain: Any = Field(init=False)
+    validate_with_database: bool = True
     name: str = "sql_db_query_checker"
     description: str = """
     Use this tool to double check if your query is correct before executing it.
@@ -162,7 +194,11 @@ class QuerySQLCheckerTool(BaseDb2iDatabaseTool, BaseTool):  # type: ignore[overr
         query: str,
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> str:
-        """Use the LLM to check the query."""
+        """Check the query on the database, falling back to the LLM."""
+        if self.validate_with_database:
+            valid, message = self.db.validate_query(query)
+            if valid is not None:
+                return self._format_verdict(query, valid, message)
         return self.llm_chain.predict(
             query=query,
             dialect=self.db.dialect,
@@ -174,8 +210,19 @@ class QuerySQLCheckerTool(BaseDb2iDatabaseTool, BaseTool):  # type: ignore[overr
         query: str,
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> str:
+        if self.validate_with_database:
+            valid, message = await self.db.avalidate_query(query)
+            if valid is not None:
+                return self._format_verdict(query, valid, message)
         return await self.llm_chain.apredict(
             query=query,
             dialect=self.db.dialect,
             callbacks=run_manager.get_child() if run_manager else None,
         )
+
+    @staticmethod
+    def _format_verdict(query: str, valid: bool, message: str) -> str:
+        # A valid query is reproduced as-is, matching the LLM checker's output.
+        if valid:
+            return query
+        return f"Error: {message}\nRewrite the query and check it again."
@@ -7,6 +7,7 @@ that takes a question parameter as an argument.
 
 Usage:
     python main.py --question "How many employees are in each department?" [--model llama3.1]
+    python main.py --batch questions.jsonl [--concurrency 4] [--report report.json]
 """
 
 import os
@@ -65,9 +66,10 @@ def get_llm(model_name="llama3.1"):
         return ChatOllama(model=model_name)
 
 
-def write_query(state, test_tables, llm):
+def write_query(state, test_tables, llm, config=None, verbose=True):
     """Generate a SQL query based on the user question and database schema."""
-    print("🔍 Generating SQL query based on user question...")
+    if verbose:
+        print("🔍 Generating SQL query based on user question...")
     
     # Create prompt for SQL query generation
     prompt = ChatPromptTemplate.from_messages(
@@ -91,24 +93,28 @@ def write_query(state, test_tables, llm):
     structured_llm = llm.with_structured_output(QueryOutput)
     chain = prompt | structured_llm
     
-    result = chain.invoke({"question": state["question"]})
+    result = chain.invoke({"question": state["question"]}, config=config)
     
-    print(f"✨ Generated SQL query: {result['query']}")
+    if verbose:
+        print(f"✨ Generated SQL query: {result['query']}")
     return {"query": result["query"]}
 
 
-def execute_query(state, db):
+def execute_query(state, db, verbose=True):
     """Execute SQL query."""
-    print("🔄 Executing SQL query against database...")
+    if verbose:
+        print("🔄 Executing SQL query against database...")
     execute_query_tool = QuerySQLDatabaseTool(db=db)
     result = execute_query_tool.invoke(state["query"])
-    print("✅ Query execution complete")
+    if verbose:
+        print("✅ Query execution complete")
     return {"result": result}
 
 
-def generate_answer(state, llm):
+def generate_answer(state, llm, config=None, verbose=True):
     """Answer question using retrieved information as context."""
-    print("🤔 Generating natural language answer from query results...")
+    if verbose:
+        print("🤔 Generating natural language answer from query results...")
     prompt = (
         "Given the following user question, corresponding SQL query, "
         "and SQL result, answer the user question.\n\n"
@@ -116,8 +122,9 @@ def generate_answer(state, llm):
         f'SQL Query: {state["query"]}\n'
         f'SQL Result: {state["result"]}'
     )
-    response = llm.invoke(prompt)
-    print("💬 Answer generation complete")
+    response = llm.invoke(prompt, config=config)
+    if verbose:
+        print("💬 Answer generation complete")
     return {"answer": response.content}
 
 def get_system_message():
@@ -239,15 +246,22 @@ def main():
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("--chain", action="store_true", help="Run the LangChain workflow")
     group.add_argument("--agent", action="store_true", help="Run the LangChain agent")
-    parser.add_argument("--question", type=str, required=True, help="The question to ask the agent")
+    group.add_argument("--batch", type=str, metavar="FILE", help="Benchmark the workflow over a question file")
+    parser.add_argument("--question", type=str, help="The question to ask the agent")
     parser.add_argument("--model", type=str, default="llama3.1", help="The Ollama model to use (default: llama3.1)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions run at once in --batch mode (default: 4)")
+    parser.add_argument("--tables", type=str, help="Comma-separated tables for the --batch schema context (default: all)")
+    parser.add_argument("--report", type=str, help="Write the --batch results as JSON to this file")
     args = parser.parse_args()
+    if not args.batch and not args.question:
+        parser.error("--question is required with --chain or --agent")
     
     print("\n🚀 Starting Db2i Agent with LangChain")
     print("=" * 50)
     
-    print(f"📝 Question: {args.question}")
-    print("-" * 50)
+    if args.question:
+        print(f"📝 Question: {args.question}")
+        print("-" * 50)
 
     # Load environment variables
     print("⚙️  Loading environment variables...")
@@ -267,6 +281,10 @@ def main():
         run_chain(args, db, llm)
     elif args.agent:
         run_agent(args, db, llm)
+    elif args.batch:
+        from benchmark import run_batch
+
+        run_batch(args, db, llm, write_query, generate_answer)
     else:
         print("Invalid arguments. Please specify --chain or --agent")
 
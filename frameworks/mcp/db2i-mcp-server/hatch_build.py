@@ -0,0 +1,30 @@
+"""Vendor the shared Db2i engine into the server's sdist and wheel.
+
+The engine lives in the repository's `shared` package, which is not published.
+Builds from the repository copy its modules into `db2i_mcp_server._engine`;
+a wheel built from the sdist takes the copy the sdist already carries.
+"""
+
+from pathlib import Path
+
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+
+ENGINE_MODULES = ("database.py", "columnar.py")
+SHARED_SOURCE = Path("../../../shared/src/db2i_shared_utils")
+ENGINE_PACKAGE = Path("db2i_mcp_server/_engine")
+
+
+class VendorSharedEngineHook(BuildHookInterface):
+    PLUGIN_NAME = "vendor-shared-engine"
+
+    def initialize(self, version, build_data):
+        if version == "editable":
+            # Development installs alias the live shared package instead
+            return
+        source = Path(self.root) / SHARED_SOURCE
+        if not source.is_dir():
+            # Building from the sdist, whose package already has the copy
+            return
+        target = Path("src") / ENGINE_PACKAGE if self.target_name == "sdist" else ENGINE_PACKAGE
+        for module in ENGINE_MODULES:
+            build_data["force_include"][str(source / module)] = str(target / module)
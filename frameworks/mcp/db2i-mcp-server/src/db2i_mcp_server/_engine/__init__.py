@@ -0,0 +1,16 @@
+"""The Db2i engine the server runs on.
+
+Built sdists and wheels carry a copy of `database.py` and `columnar.py` from
+the repository's shared package in this directory (see `hatch_build.py`), so
+the published server does not install or shadow `db2i_shared_utils`.
+Development installs have no copy and alias the shared modules instead.
+"""
+
+import sys
+from importlib.util import find_spec
+
+if find_spec(f"{__name__}.database") is None:
+    from db2i_shared_utils import columnar, database
+
+    sys.modules[f"{__name__}.columnar"] = columnar
+    sys.modules[f"{__name__}.database"] = database
@@ -1,7 +1,6 @@
 from datetime import datetime
 import os
 import argparse
-from textwrap import dedent
 from typing import Any, Dict, List, Literal, Optional, Union
 
 from dotenv import load_dotenv
@@ -13,8 +12,7 @@ from pydantic import AnyUrl
 import mcp.server.stdio
 from pathlib import Path
 
-from mapepire_python.data_types import DaemonServer
-from mapepire_python import connect, Connection
+from ._engine.database import Db2iDatabase as SharedDb2iDatabase
 
 import logging
 
@@ -139,218 +137,51 @@ def configure_logging():
     return logger
 
 
-def truncate_word(content: Any, *, length: int, suffix: str = "...") -> str:
-    """
-    Truncate a string to a certain number of words, based on the max string
-    length.
-    """
-
-    if not isinstance(content, str) or length <= 0:
-        return content
+def log_query(event: Dict[str, Any]) -> None:
+    """Engine hook that writes every statement to the server log."""
+    logger = logging.getLogger("db2i_mcp_server")
+    sql = event["sql"]
+    summary = f"{sql[:200]}{'...' if len(sql) > 200 else ''}"
+    if event["error"]:
+        logger.error(f"{event['error']} | SQL: {summary}")
+    else:
+        logger.debug(
+            f"SQL ({event['mode']}, {event['rows']} rows, "
+            f"{event['seconds'] * 1000:.1f} ms): {summary}"
+        )
 
-    if len(content) <= length:
-        return content
 
-    return content[: length - len(suffix)].rsplit(" ", 1)[0] + suffix
+class Db2iDatabase(SharedDb2iDatabase):
+    """Read-only, file-logged view of the shared Db2i database for MCP clients.
 
+    Pooling, caching and fetching come from the shared engine in `_engine`; this
+    adapter only rejects data-changing statements, tolerates unknown
+    `include_tables` and logs every statement through the engine's hooks.
+    """
 
-class Db2iDatabase:
-    
-    def __init__(
-        self,
-        schema: str,
-        server_config: Union[DaemonServer, Dict[str, str]],
-        ignore_tables: Optional[List[str]] = None,
-        include_tables: Optional[List[str]] = None,
-        custom_table_info: Optional[Dict[Any, Any]] = None,
-        sampler_rows_in_table_info: int = 3,
-        max_string_length: int = 300,
-    ):
-
-        self.connection: Optional[Connection] = None
-        self.is_connected = False
-
-        if include_tables and ignore_tables:
-            raise ValueError("Cannot specify both include_tables and ignore_tables")
-
-        self._schema = schema
-        self._server_config = server_config
-        self._include_tables = include_tables
-        self._ignore_tables = ignore_tables
-        self._all_tables: Optional[set[str]] = None  # Will be populated in get_usable_table_names
-
-        self._sample_rows_in_table_info = sampler_rows_in_table_info
-        self._customed_table_info = custom_table_info
-        self._max_string_length = max_string_length
-        
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
         self.logger = configure_logging()
-        
-    def _get_server_config(self) -> Dict[str, str]:
-        server_config_dict = {}
-        if isinstance(self._server_config, DaemonServer):
-            # Extract attributes from DaemonServer instance
-            for attr in ["host", "port", "user", "password"]:
-                if hasattr(self._server_config, attr):
-                    server_config_dict[attr] = getattr(self._server_config, attr)
-        else:
-            server_config_dict = dict(self._server_config)
-        
-        return server_config_dict
+        # One module-level hook per shared engine, however many adapters wrap it
+        self._engine.add_hook(log_query)
 
-    def _connect(self) -> Connection:
-        """Set up any connections required by the handler
-
-        Should return connection
-
-        """
-        server_config_dict = self._get_server_config()
-        
-        if not all(
-            key in server_config_dict for key in ["host", "port", "user", "password"]
-        ):
-            raise ValueError(
-                "Required parameters (host, user, password, port) must be provided."
-            )
-
-        try:
-            if isinstance(self._server_config, DaemonServer):
-                # Use the instance directly
-                connect_args = self._server_config
-            else:
-                # Create a new instance
-                connect_args = DaemonServer(
-                    host=str(server_config_dict["host"]),
-                    port=int(server_config_dict["port"]) if isinstance(server_config_dict["port"], str) else server_config_dict["port"],
-                    user=str(server_config_dict["user"]),
-                    password=str(server_config_dict["password"]),
-                    ignoreUnauthorized=True,
-                )
-
-            self.connection = connect(connect_args)
-            self.is_connected = True
-            self.connection.execute(f"SET CURRENT SCHEMA = '{self._schema}'")
-            return self.connection
-        except Exception as e:
-            host = server_config_dict.get('host', 'unknown')
-            self.logger.error(f"Error while connect to {host}, {e}")
-            raise
-
-    def _get_all_table_names(self, schema: str) -> List[str]:
-        sql = f"""
-            SELECT TABLE_NAME as name, TABLE_TYPE
-            FROM QSYS2.SYSTABLES
-            WHERE TABLE_SCHEMA = ? AND TABLE_TYPE = 'T'
-            ORDER BY TABLE_NAME        
-        """
-
-        options = [schema]
-        result = self._execute(sql, options=options, fetch="all")
-        
-        # Handle the possible types of result
-        if not result:
-            return []
-            
-        names = []
-        for row in result:
-            if isinstance(row, dict) and "NAME" in row:
-                names.append(row["NAME"])
-        
-        return names
-
-    def _execute(
-        self,
-        sql: str,
-        options: Optional[QueryParameters] = None,
-        fetch: Union[Literal["all", "one"], int] = "all",
-    ) -> ResultRow | ResultSet | list:
-        """Execute SQL query and return data
-
-        Args:
-            sql (str): SQL query to execute
-            options (Optional[QueryParameters], optional): Query parameters. Defaults to None.
-            fetch (Union[Literal["all", "one"], int], optional): Fetch mode. Defaults to "all".
-
-        Raises:
-            ValueError: When SQL is invalid or not a SELECT statement
-
-        Returns:
-            ResultRow | ResultSet | list: Query results
-        """
-        # Log query details (truncate long queries)
-        self.logger.debug(f"SQL: {sql[:200]}{'...' if len(sql) > 200 else ''} | Params: {options} | Fetch: {fetch}")
-
-        # Remove trailing semicolon
-        if sql.endswith(";"):
-            sql = sql[:-1]
-
-        # Only allow SELECT statements
+    def _read_only_sql(self, sql: str) -> str:
+        """Strip a trailing semicolon and reject data-changing statements."""
+        sql = sql.rstrip().rstrip(";")
         if sql.strip().upper().startswith(("INSERT", "UPDATE", "DELETE", "CREATE", "ALTER", "DROP")):
             self.logger.warning(f"Rejected non-SELECT query: {sql[:50]}...")
             raise ValueError("Only SELECT statements are allowed")
+        return sql
 
-        conn = None
-        safe_config = {}
-        try:
-            # Get server config
-            server_config_dict = self._get_server_config()
-            
-            # mask password in logs    
-            safe_config = {k: (v if k != "password" else "***REDACTED***") for k, v in server_config_dict.items()}
-            conn = self._connect()
-            # Connect and execute
-            host = safe_config.get('host', 'unknown') if isinstance(safe_config, dict) else 'unknown'
-            self.logger.info(f"Connected to DB ({host})")
-            with conn.execute(sql, options) as cursor:
-                if not cursor.has_results:
-                    self.logger.debug("Query returned no results")
-                    return []
-                
-                # Handle different fetch modes
-                if fetch == "all":
-                    result = cursor.fetchall()
-                    # Properly handle result structure
-                    if isinstance(result, dict) and 'data' in result:
-                        data = result.get('data', [])
-                        row_count = len(data)
-                        self.logger.debug(f"Fetched all rows: {row_count}")
-                        return data
-                    elif isinstance(result, list):
-                        self.logger.debug(f"Fetched all rows: {len(result)}")
-                        return result
-                    return []
-                    
-                elif fetch == "one":
-                    result = cursor.fetchone()
-                    self.logger.debug(f"Fetched one row: {'Found' if result else 'None'}")
-                    return result if result is not None else []
-                    
-                elif isinstance(fetch, int):
-                    result = []
-                    for i in range(fetch):
-                        row = cursor.fetchone()
-                        if not row:
-                            break
-                        result.append(row)
-                    self.logger.debug(f"Fetched {len(result)}/{fetch} rows")
-                    return result
-                    
-                else:
-                    raise ValueError(f"Invalid fetch value: {fetch}")
-
-                
-        except Exception as e:
-            error_type = type(e).__name__
-            self.logger.error(f"{error_type}: {str(e)}")
-            if "connection" in error_type.lower() and safe_config:
-                self.logger.debug(f"Connection details: {safe_config}")
-            raise
-        
-        finally:
-            if conn:
-                conn.close()
-            
-        # This line should never be reached
-        return []
+    def _validated(self, table_names: List[str]) -> set:
+        all_tables = set(table_names)
+        if not self._tables_validated:
+            missing_tables = self._include_tables - all_tables
+            if missing_tables:
+                self.logger.warning(f"Tables not found in schema: {missing_tables}")
+                self._include_tables &= all_tables
+            self._tables_validated = True
+        return all_tables
 
     def run(
         self,
@@ -359,248 +190,33 @@ class Db2iDatabase:
         include_columns: bool = False,
         fetch: Union[Literal["all", "one"], int] = "all",
     ) -> str | ResultRow | ResultSet | list:
-        """Execute a SQL command and return a string representing the results.
-
-        If the statement returns rows, a string of the results is returned.
-        If the statement returns no rows, an empty string is returned.
-        """
-        result = self._execute(sql, options=options, fetch=fetch)
-
-        if fetch == "cursor":
-            return result
-
-        res = []
-        for r in result:
-            if isinstance(r, dict):
-                res.append({
-                    column: truncate_word(value, length=self._max_string_length)
-                    for column, value in r.items()
-                })
-            else:
-                # Handle non-dictionary results
-                if self.logger:
-                    self.logger.warning(f"Unexpected result type in run: {type(r)}")
-                res.append(r)
-
-        if not include_columns:
-            # Handle different row types
-            transformed_res = []
-            for row in res:
-                if isinstance(row, dict):
-                    transformed_res.append(tuple(row.values()))
-                else:
-                    # Handle non-dict rows
-                    transformed_res.append(row)
-            res = transformed_res
-
-        if not res:
-            return ""
-        else:
-            return str(res)
-
-    def get_table_info(self, table_names: Optional[List[str]] = None):
-
-        all_table_names = self.get_usable_table_names()
-        if table_names is not None:
-            missing_tables = set(table_names).difference(all_table_names)
-            if missing_tables:
-                raise ValueError(
-                    f"Tables {missing_tables} are not present in the schema"
-                )
-
-            all_table_names = table_names
-
-        tables = []
-        for table in all_table_names:
-            if self._customed_table_info and table in self._customed_table_info:
-                tables.append(self._customed_table_info[table])
-
-            table_definition = self._get_table_definition(table)
-            table_info = f"{table_definition.rstrip()}"
-
-            if self._sample_rows_in_table_info:
-                table_info += f"\n{self._get_sample_rows(table)}"
-            tables.append(table_info)
-
-        final_str = "\n\n".join(tables)
-        return final_str
-
-    def _get_sample_rows(self, table: str):
+        sql = self._read_only_sql(sql)
+        return super().run(sql, options=options, include_columns=include_columns, fetch=fetch)
 
-        sql = f"SELECT * FROM {self._schema}.{table} FETCH FIRST {self._sample_rows_in_table_info} ROWS ONLY"
-
-        columns_str = ""
-        sample_rows_str = ""
-        try:
-            result = []
-            # Use our connection method which already handles both types correctly
-            conn = self._connect()
-            with conn:
-                with conn.execute(sql) as cursor:
-                    if cursor.has_results:
-                        res = cursor.fetchall()
-                        # Handle different result structures
-                        if isinstance(res, dict) and 'data' in res:
-                            result = res.get('data', [])
-                        elif isinstance(res, list):
-                            result = res
-
-            rows = []
-            if result and isinstance(result, list) and len(result) > 0:
-                # Process rows if they're dictionaries
-                first_row = result[0]
-                if isinstance(first_row, dict):
-                    # Get column names as a tab-separated string
-                    columns_str = "\t".join(first_row.keys())
-
-                    # Convert each row to a tab-separated string of values
-                    for row in result:
-                        if isinstance(row, dict):
-                            # Convert all values to strings and join with tabs
-                            row_values = []
-                            for val in row.values():
-                                if val is None:
-                                    row_values.append("NULL")
-                                else:
-                                    str_val = str(val)
-                                    if len(str_val) > 100:
-                                        str_val = str_val[:97] + "..."
-                                    row_values.append(str_val)
-
-                            rows.append("\t".join(row_values))
-
-            # Join all rows with newlines (even if empty)
-            sample_rows_str = "\n".join(rows)
-
-        except Exception as e:
-            self.logger.error(f"Error getting sample rows: {str(e)}")
-            columns_str = ""
-            sample_rows_str = ""
-
-        return (
-            f"{self._sample_rows_in_table_info} sample rows from {table}:\n"
-            f"{columns_str}\n"
-            f"{sample_rows_str}"
-        )
-
-    def _get_table_definition(self, table: str) -> str:
-        sql = dedent(
-            f"""
-            CALL QSYS2.GENERATE_SQL(
-                DATABASE_OBJECT_NAME => ?,
-                DATABASE_OBJECT_LIBRARY_NAME => ?,
-                DATABASE_OBJECT_TYPE => 'TABLE',
-                CREATE_OR_REPLACE_OPTION => '1',
-                PRIVILEGES_OPTION => '0',
-                STATEMENT_FORMATTING_OPTION => '0',
-                SOURCE_STREAM_FILE_END_OF_LINE => 'LF',
-                SOURCE_STREAM_FILE_CCSID => 1208
-            )
-        """
-        )
-        result = self._execute(sql, options=[table, self._schema])
-        if not result:
-            return ""
-            
-        # Handle the result which could be a list of dictionaries
-        if isinstance(result, list):
-            # Build the result string safely
-            result_strings = []
-            for res in result:
-                if isinstance(res, dict):
-                    # Use dictionary get() method for dictionaries
-                    src_data = res.get("SRCDTA", "")
-                    result_strings.append(str(src_data))
-            return "\n".join(result_strings)
-        return ""
-
-    def get_table_info_no_throw(self, table_names: Optional[List[str]] = None) -> str:
-        """Get information about specified tables.
-
-        Follows best practices as specified in: Rajkumar et al, 2022
-        (https://arxiv.org/abs/2204.00498)
-
-        If `sample_rows_in_table_info`, the specified number of sample rows will be
-        appended to each table description. This can increase performance as
-        demonstrated in the paper.
-        """
-        try:
-            return self.get_table_info(table_names)
-        except ValueError as e:
-            """Format the error message"""
-            return f"Error: {e}"
+    async def arun(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        include_columns: bool = False,
+        fetch: Union[Literal["all", "one"], int] = "all",
+    ) -> str:
+        sql = self._read_only_sql(sql)
+        return await super().arun(sql, options=options, include_columns=include_columns, fetch=fetch)
 
     def get_usable_table_names(self):
         """Get the list of usable table names based on include_tables and ignore_tables"""
-
-        
         try:
-            # Return cached tables if already loaded
-            if self._all_tables is not None:
-                return sorted(self._all_tables)
-            else:
-                self.logger.info(f"Loading tables from schema: {self._schema}")
-                self._all_tables = set(self._get_all_table_names(self._schema))
-                self.logger.debug(f"Found {len(self._all_tables)} tables in schema")
-
-                # Apply table filters
-                result_tables = self._all_tables
-                
-                # Check for conflicting options
-                if self._include_tables and self._ignore_tables:
-                    self.logger.warning("Both include_tables and ignore_tables specified; using include_tables")
-                    
-                # Filter by included tables
-                if self._include_tables:
-                    include_set = set(self._include_tables)
-                    missing_tables = include_set - self._all_tables
-                    if missing_tables:
-                        self.logger.warning(f"Tables not found in schema: {missing_tables}")
-                    result_tables = self._all_tables.intersection(include_set)
-                    self.logger.debug(f"Filtered to {len(result_tables)} included tables")
-                    
-                # Filter by ignored tables
-                elif self._ignore_tables:
-                    ignore_set = set(self._ignore_tables)
-                    result_tables = self._all_tables - ignore_set
-                    self.logger.debug(f"Filtered to {len(result_tables)} tables (after ignoring {len(ignore_set)})")
-                
-                return sorted(result_tables)
-            
+            return super().get_usable_table_names()
         except Exception as e:
             self.logger.error(f"Error getting tables: {type(e).__name__}: {str(e)}")
             return []
 
-    def run_no_throw(
-        self,
-        sql: str,
-        include_columns: bool = False,
-        fetch: Literal["all", "one"] = "all",
-        parameters: Optional[Dict[str, Any]] = None,
-    ) -> ResultRow | str | ResultSet | list:
-        """Execute a SQL command and return a string representing the results.
-
-        If the statement returns rows, a string of the results is returned.
-        If the statement returns no rows, an empty string is returned.
-
-        If the statement throws an error, the error message is returned.
-        """
+    async def aget_usable_table_names(self) -> List[str]:
         try:
-            # Convert parameters to the right QueryParameters type if needed
-            query_params: Optional[QueryParameters] = None
-            if parameters:
-                if isinstance(parameters, list):
-                    query_params = parameters
-                elif isinstance(parameters, dict):
-                    # Convert dict to list (simple approach)
-                    query_params = list(parameters.values())
-                
-            return self.run(
-                sql, options=query_params, fetch=fetch, include_columns=include_columns
-            )
+            return await super().aget_usable_table_names()
         except Exception as e:
-            """Format the error message"""
-            return f"Error: {e}"
+            self.logger.error(f"Error getting tables: {type(e).__name__}: {str(e)}")
+            return []
 
 
 async def main():
@@ -828,7 +444,7 @@ async def main():
 
         try:
             if name == "list-usable-tables":
-                usable_tables = db.get_usable_table_names()
+                usable_tables = await db.aget_usable_table_names()
                 return [
                     types.TextContent(
                         type="text", text=f"Usable tables: {usable_tables}"
@@ -840,7 +456,7 @@ async def main():
                     raise ValueError("Missing table_name argument")
 
                 table_name = str(arguments["table_name"]).upper()
-                table_info = db.get_table_info_no_throw([table_name])
+                table_info = await db.aget_table_info_no_throw([table_name])
                 return [types.TextContent(type="text", text=table_info)]
 
             elif name == "run-sql-query":
@@ -848,7 +464,7 @@ async def main():
                     raise ValueError("Missing sql argument")
 
                 sql = str(arguments["sql"])
-                result = db.run_no_throw(sql)
+                result = await db.arun_no_throw(sql)
                 return [types.TextContent(type="text", text=f"Query result: {result}")]
 
             elif name == "add-note":
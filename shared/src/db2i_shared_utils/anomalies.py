@@ -0,0 +1,311 @@
+"""Anomaly detection over the metric history in a `MetricStore`.
+
+Every (metric, row key, column) series is scored against three baselines,
+vectorized with NumPy across all series of a metric at once:
+
+- EWMA: an exponentially weighted mean and variance that follow the series,
+  so a point is compared with the recent past.
+- z-score: the mean and standard deviation of the baseline period before the
+  window being checked.
+- seasonal: the median and MAD of the same hour of the day on previous days,
+  once the store holds a few days of history.
+
+The series are laid out on a regular grid of buckets, with gaps left empty,
+so a season is always the same number of buckets long.
+
+A series is reported when a point inside the window deviates by more than
+`threshold` spreads under any of them; its score is the largest deviation.
+The counter, average and elapsed-time columns of metrics with a `rates`
+definition are cumulative and are only checked through the derived `.rates`
+metric; their other columns are checked as recorded.
+"""
+
+import warnings
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from db2i_shared_utils.timeseries import TIERS, MetricStore, parse_duration
+
+DEFAULT_THRESHOLD = 3.0
+
+# Score at or above which a finding gets each severity, highest first.
+SEVERITIES = ((6.0, "critical"), (4.0, "high"), (DEFAULT_THRESHOLD, "medium"))
+
+# Points a baseline needs before it is trusted.
+MIN_POINTS = 10
+
+# Smallest spread, relative to the expected value, a deviation is measured in.
+# Keeps flat series (pool sizes, system values) from flagging tiny changes.
+MIN_SPREAD = 0.05
+
+EWMA_ALPHA = 0.1
+
+# Prior days of the same hour needed for a seasonal baseline.
+MIN_SEASONS = 3
+
+# Derived columns that duplicate other columns of the same series.
+_SKIP_SUFFIXES = ("_DELTA",)
+_SKIP_COLUMNS = {"INTERVAL_SECONDS"}
+
+Labels = List[Tuple[str, str]]
+
+
+@dataclass
+class Anomaly:
+    """The most deviating point of one series inside the checked window."""
+
+    metric_id: str
+    key: str
+    column: str
+    time: str
+    value: float
+    expected: float
+    score: float
+    method: str
+    severity: str
+
+    @property
+    def direction(self) -> str:
+        return "above" if self.value > self.expected else "below"
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result["direction"] = self.direction
+        if not self.key:
+            del result["key"]
+        return result
+
+
+def severity(score: float) -> Optional[str]:
+    """Return the severity of an absolute score, or None below the threshold."""
+    for floor, name in SEVERITIES:
+        if score >= floor:
+            return name
+    return None
+
+
+def to_matrix(
+    times: np.ndarray,
+    keys: np.ndarray,
+    values: Dict[str, np.ndarray],
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    width: Optional[float] = None,
+) -> Tuple[np.ndarray, Labels, np.ndarray]:
+    """Pivot store output into a (series, buckets) matrix.
+
+    Args:
+        times: Bucket time of each point.
+        keys: Row key of each point.
+        values: Column name to one value per point.
+        start, end, width: Lay the buckets out every `width` seconds from the
+            bucket holding `start` to the one holding `end`, so missing buckets
+            become NaN columns. By default only the times present are used.
+
+    Returns:
+        The bucket times, one (key, column) label per series and the matrix,
+        with NaN where a series has no value for a bucket.
+    """
+    if width is None:
+        grid, slots = np.unique(times, return_inverse=True)
+    else:
+        first = np.floor(start / width) * width
+        grid = first + width * np.arange(int((np.floor(end / width) * width - first) // width) + 1)
+        slots = np.rint((times - first) / width).astype(int)
+    unique_keys, codes = np.unique(keys, return_inverse=True)
+    labels: Labels = []
+    blocks = []
+    for column, series in values.items():
+        block = np.full((len(unique_keys), len(grid)), np.nan)
+        block[codes, slots] = series
+        blocks.append(block)
+        labels.extend((str(key), column) for key in unique_keys)
+    matrix = np.vstack(blocks) if blocks else np.empty((0, len(grid)))
+    return grid, labels, matrix
+
+
+def _scale(spread: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    return np.maximum(np.nan_to_num(spread), np.maximum(MIN_SPREAD * np.abs(expected), 1e-9))
+
+
+def ewma_scores(matrix: np.ndarray, alpha: float = EWMA_ALPHA) -> Tuple[np.ndarray, np.ndarray]:
+    """Score every point against the EWMA of the points before it.
+
+    Returns:
+        Scores and expected values, shaped like `matrix`; NaN until a series
+        has `MIN_POINTS` points.
+    """
+    n_series, n_buckets = matrix.shape
+    mean = np.full(n_series, np.nan)
+    var = np.zeros(n_series)
+    count = np.zeros(n_series)
+    expected = np.full(matrix.shape, np.nan)
+    spread = np.full(matrix.shape, np.nan)
+    for t in range(n_buckets):
+        x = matrix[:, t]
+        trusted = count >= MIN_POINTS
+        expected[trusted, t] = mean[trusted]
+        spread[trusted, t] = np.sqrt(var[trusted])
+
+        present = ~np.isnan(x)
+        first = present & np.isnan(mean)
+        mean[first] = x[first]
+        update = present & ~first
+        diff = x[update] - mean[update]
+        mean[update] += alpha * diff
+        var[update] = (1 - alpha) * (var[update] + alpha * diff**2)
+        count[present] += 1
+
+    return (matrix - expected) / _scale(spread, expected), expected
+
+
+def zscore_scores(matrix: np.ndarray, baseline: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Score every point against the mean and deviation of the `baseline` buckets."""
+    history = matrix[:, baseline]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(history, axis=1)
+        std = np.nanstd(history, axis=1)
+    mean[(~np.isnan(history)).sum(axis=1) < MIN_POINTS] = np.nan
+    expected = np.broadcast_to(mean[:, None], matrix.shape)
+    return (matrix - expected) / _scale(std[:, None], expected), expected
+
+
+def seasonal_scores(matrix: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Score every point against the same bucket `period` buckets back, and earlier.
+
+    The expected value is the median of the earlier seasons and the spread
+    their scaled median absolute deviation.
+    """
+    n_series, n_buckets = matrix.shape
+    seasons = n_buckets // period
+    expected = np.full(matrix.shape, np.nan)
+    spread = np.full(matrix.shape, np.nan)
+    if seasons >= MIN_SEASONS:
+        for t in range(MIN_SEASONS * period, n_buckets):
+            earlier = matrix[:, t - period :: -period]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                median = np.nanmedian(earlier, axis=1)
+                mad = np.nanmedian(np.abs(earlier - median[:, None]), axis=1)
+            enough = (~np.isnan(earlier)).sum(axis=1) >= MIN_SEASONS
+            expected[enough, t] = median[enough]
+            spread[enough, t] = 1.4826 * mad[enough]
+    return (matrix - expected) / _scale(spread, expected), expected
+
+
+class AnomalyDetector:
+    """Find deviating series in the history recorded by a `MetricStore`.
+
+    Args:
+        store: The store to read history from.
+        metric_ids: Metrics to check. Defaults to everything in the store.
+        baseline: History before the window used for the EWMA and z-score
+            baselines, e.g. `6h`.
+        resolution: Rollup tier the EWMA and z-score baselines run on.
+        seasonal_days: Days of hourly history used for the seasonal baseline.
+        threshold: Smallest absolute score reported.
+    """
+
+    def __init__(
+        self,
+        store: MetricStore,
+        metric_ids: Optional[Sequence[str]] = None,
+        baseline: Union[str, float] = "6h",
+        resolution: str = "1m",
+        seasonal_days: int = 7,
+        threshold: float = DEFAULT_THRESHOLD,
+    ):
+        if resolution not in TIERS:
+            raise ValueError(f"resolution must be one of {list(TIERS)}")
+        self.store = store
+        self.metric_ids = metric_ids
+        self.baseline = parse_duration(baseline)
+        self.resolution = resolution
+        self.seasonal_days = seasonal_days
+        self.threshold = threshold
+
+    def _checked_metrics(self) -> List[str]:
+        return list(self.metric_ids or self.store.metric_ids())
+
+    def _cumulative(self, metric_id: str) -> Set[str]:
+        """Return the columns of a metric that only grow, per its `rates` definition."""
+        rates = self.store.metrics.get(metric_id, {}).get("rates") or {}
+        return {*rates.get("counters", ()), *rates.get("averages", ()), *filter(None, [rates.get("elapsed")])}
+
+    def detect(
+        self,
+        window: Union[str, float] = "15m",
+        now: Optional[float] = None,
+        limit: Optional[int] = 20,
+    ) -> List[Anomaly]:
+        """Return the anomalous series of the last `window`, highest score first."""
+        window = parse_duration(window)
+        now = now or datetime.now(timezone.utc).timestamp()
+        findings: List[Anomaly] = []
+        for metric_id in self._checked_metrics():
+            findings.extend(self._detect_metric(metric_id, window, now))
+        findings.sort(key=lambda a: a.score, reverse=True)
+        return findings[:limit] if limit else findings
+
+    def _load(self, metric_id: str, window: float, resolution: str, now: float):
+        times, keys, values = self.store.series(
+            metric_id, window, agg="avg", resolution=resolution, now=now
+        )
+        skipped = _SKIP_COLUMNS | self._cumulative(metric_id)
+        values = {
+            c: v for c, v in values.items()
+            if c not in skipped and not c.endswith(_SKIP_SUFFIXES)
+        }
+        return to_matrix(times, keys, values, now - window, now, TIERS[resolution])
+
+    def _detect_metric(self, metric_id: str, window: float, now: float) -> List[Anomaly]:
+        width = TIERS[self.resolution]
+        start = now - window
+        grid, labels, matrix = self._load(metric_id, self.baseline + window, self.resolution, now)
+        if not labels:
+            return []
+
+        in_window = grid >= np.floor(start / width) * width
+        # method -> (bucket times, bucket width, labels, values, scores, expected)
+        candidates = {
+            "ewma": (grid, width, labels, matrix, *ewma_scores(matrix)),
+            "zscore": (grid, width, labels, matrix, *zscore_scores(matrix, ~in_window)),
+        }
+        if self.seasonal_days >= MIN_SEASONS:
+            hours, hour_labels, hourly = self._load(
+                metric_id, (self.seasonal_days + 1) * 86400, "1h", now
+            )
+            if hour_labels:
+                candidates["seasonal"] = (
+                    hours, TIERS["1h"], hour_labels, hourly, *seasonal_scores(hourly, 24)
+                )
+
+        best: Dict[Tuple[str, str], Anomaly] = {}
+        for method, (times, slot, series_labels, values, scores, expected) in candidates.items():
+            slots = np.nonzero(times >= np.floor(start / slot) * slot)[0]
+            if not len(slots):
+                continue
+            window_scores = np.nan_to_num(np.abs(scores[:, slots]))
+            worst = window_scores.argmax(axis=1)
+            for s in np.nonzero(window_scores.max(axis=1) >= self.threshold)[0]:
+                t = slots[worst[s]]
+                score = float(window_scores[s, worst[s]])
+                label = series_labels[s]
+                if label in best and best[label].score >= score:
+                    continue
+                best[label] = Anomaly(
+                    metric_id=metric_id,
+                    key=label[0],
+                    column=label[1],
+                    time=datetime.fromtimestamp(times[t], tz=timezone.utc).isoformat(),
+                    value=round(float(values[s, t]), 4),
+                    expected=round(float(expected[s, t]), 4),
+                    score=round(score, 2),
+                    method=method,
+                    severity=severity(score) or "low",
+                )
+        return list(best.values())
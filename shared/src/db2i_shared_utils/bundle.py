@@ -0,0 +1,147 @@
+"""Single-round-trip bundles of metric queries.
+
+A dashboard refresh or composite tool runs several independent metric
+queries. Over a high-latency link every statement costs at least one round
+trip, even when they run concurrently on pooled connections. `MetricBundle`
+compiles the statements into one query that returns one row per metric, whose
+DOCUMENT column holds the metric's rows as a JSON array built on the server
+with JSON_ARRAYAGG and JSON_OBJECT:
+
+    SELECT 'memory' AS METRIC, (
+        SELECT JSON_ARRAYAGG(JSON_OBJECT(KEY 'POOL_NAME' VALUE B."POOL_NAME", ...)
+                             ORDER BY B.BUNDLE_ROW)
+        FROM (SELECT T.*, ROW_NUMBER() OVER () AS BUNDLE_ROW FROM (<sql>) T) B
+    ) AS DOCUMENT
+    FROM SYSIBM.SYSDUMMY1
+    UNION ALL ...
+
+JSON_OBJECT needs the column names, so the first use of a bundle describes
+each statement once and the compiled SQL is reused afterwards. The documents
+are decoded client side into the same row dicts `SQLExecutor.execute` returns.
+"""
+
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from textwrap import dedent
+from typing import Any, Dict, List, Mapping, Optional
+
+from db2i_shared_utils.executor import DEFAULT_COMPONENT_TIMEOUT, SQLExecutor
+
+logger = logging.getLogger(__name__)
+
+_TRAILING = re.compile(r"[\s;]+$")
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _document_sql(sql: str, columns: List[str]) -> str:
+    pairs = ", ".join(f"KEY {_literal(c)} VALUE B.{_identifier(c)}" for c in columns)
+    return (
+        f"SELECT JSON_ARRAYAGG(JSON_OBJECT({pairs}) ORDER BY B.BUNDLE_ROW) "
+        f"FROM (SELECT T.*, ROW_NUMBER() OVER () AS BUNDLE_ROW FROM ({sql}) T) B"
+    )
+
+
+def compile_bundle(statements: Mapping[str, str], columns: Mapping[str, List[str]]) -> str:
+    """Compile statements into one query returning METRIC and DOCUMENT per statement.
+
+    Args:
+        statements: Metric name to a parameterless SELECT statement.
+        columns: Metric name to the result column names of its statement.
+    """
+    parts = [
+        f"SELECT {_literal(name)} AS METRIC, ({_document_sql(sql, columns[name])}) AS DOCUMENT "
+        f"FROM SYSIBM.SYSDUMMY1"
+        for name, sql in statements.items()
+    ]
+    return "\nUNION ALL\n".join(parts)
+
+
+class MetricBundle:
+    """Run a fixed set of metric queries as one statement.
+
+    Args:
+        executor: Executor the bundle runs on.
+        statements: Metric name to a parameterless SELECT statement. ORDER BY
+            and FETCH FIRST are kept; a trailing semicolon is dropped.
+    """
+
+    def __init__(self, executor: SQLExecutor, statements: Mapping[str, str]):
+        if not statements:
+            raise ValueError("A bundle needs at least one statement")
+        self.executor = executor
+        self.statements = {
+            name: _TRAILING.sub("", dedent(sql).strip()) for name, sql in statements.items()
+        }
+        self._sql: Optional[str] = None
+        # Set once the bundle timed out; its statements then always run separately.
+        self.separate = False
+
+    @property
+    def sql(self) -> str:
+        """The compiled statement; describes the statements on first use."""
+        if self._sql is None:
+            columns = {}
+            for name, sql in self.statements.items():
+                described = self.executor.execute(
+                    f"SELECT * FROM ({sql}) T FETCH FIRST 1 ROWS ONLY", limit=1
+                )
+                if not described.has_results:
+                    raise ValueError(f"Bundle statement {name} does not return rows")
+                columns[name] = [column.name for column in described.columns]
+            self._sql = compile_bundle(self.statements, columns)
+        return self._sql
+
+    def execute(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Run the bundle and return the rows of every metric, in the order given."""
+        result = self.executor.execute(self.sql)
+        documents = {row["METRIC"]: row["DOCUMENT"] for row in result.rows}
+        return {name: self._decode(documents.get(name)) for name in self.statements}
+
+    @staticmethod
+    def _decode(document: Optional[str]) -> List[Dict[str, Any]]:
+        if document is None:
+            return []
+        return json.loads(document) if isinstance(document, str) else list(document)
+
+    def run(self, timeout: Optional[float] = DEFAULT_COMPONENT_TIMEOUT) -> Dict[str, str]:
+        """Run the bundle and format each metric like `SQLExecutor.run_many`.
+
+        If the bundle fails as a whole, for example because one of the
+        services is not authorized, or takes longer than `timeout`, the
+        statements are run separately with `run_many` so one slow or failing
+        metric only costs its own section. A bundle that timed out is not
+        tried again, since one slow statement holds up all of them.
+
+        Args:
+            timeout: Seconds the bundle, including describing its statements
+                on first use, may take, and then each separate statement; or
+                None to wait for the bundle.
+        """
+        component_timeout = DEFAULT_COMPONENT_TIMEOUT if timeout is None else timeout
+        if self.separate:
+            return self.executor.run_many(self.statements, timeout=component_timeout)
+
+        workers = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db2i-bundle")
+        future = workers.submit(self.execute)
+        workers.shutdown(wait=False)
+        try:
+            results = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning(f"Bundle timed out after {timeout:g}s, running its statements separately")
+            self.separate = True
+            return self.executor.run_many(self.statements, timeout=component_timeout)
+        except Exception as e:
+            logger.warning(f"Bundle failed, running its statements separately: {e}")
+            return self.executor.run_many(self.statements, timeout=component_timeout)
+        return {name: str(rows) for name, rows in results.items()}
+
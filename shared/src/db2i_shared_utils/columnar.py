@@ -0,0 +1,218 @@
+"""Columnar (Arrow/pandas) result mode for Db2i queries.
+
+Queries run with terse results, so mapepire returns each block as a list of
+value arrays instead of one dict per row. Blocks are transposed straight into
+per-column lists and typed from the result set metadata, which keeps DECIMAL
+columns exact and turns DATE/TIME/TIMESTAMP strings into Arrow temporal types.
+TIME and TIMESTAMP accept both the ISO form and the Db2 `HH.MM.SS` /
+`YYYY-MM-DD-HH.MM.SS.ffffff` forms; timestamps with more than six fractional
+digits (TIMESTAMP(7) to TIMESTAMP(12)) keep nanoseconds.
+
+`pyarrow` (and `pandas` for DataFrames) are optional dependencies, installed
+by the package's `arrow` extra, and are only imported when a columnar result
+is requested.
+"""
+
+import re
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+from pep249 import QueryParameters
+
+DECIMAL_TYPES = {"DECIMAL", "NUMERIC"}
+INTEGER_TYPES = {"SMALLINT", "INTEGER", "BIGINT"}
+FLOAT_TYPES = {"REAL", "FLOAT", "DOUBLE", "DECFLOAT"}
+BINARY_TYPES = {"BINARY", "VARBINARY", "BLOB"}
+
+# Db2 for i allows DECIMAL(63, s); without precision in the metadata the
+# widest Arrow decimal that still maps to a native pandas/NumPy path is used.
+DEFAULT_DECIMAL_PRECISION = 31
+
+_TIME = re.compile(r"^(\d{2})[.:](\d{2})[.:](\d{2})$")
+_TIMESTAMP = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})[ T-](\d{2})[.:](\d{2})[.:](\d{2})(?:[.,](\d{1,12}))?$"
+)
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "`pyarrow` not installed. Please install the arrow extra using "
+            "`pip install 'db2-shared-utils[arrow]'`"
+        )
+    return pyarrow
+
+
+def fetch_columns(
+    job: Any,
+    sql: str,
+    options: Optional[QueryParameters] = None,
+    limit: Optional[int] = None,
+    block_size: int = 500,
+) -> Tuple[List[Dict[str, Any]], List[List[Any]]]:
+    """Run a query on a mapepire SQL job and collect its result column-wise.
+
+    Args:
+        job: The `SQLJob` of an open mapepire connection.
+        sql: The query to run.
+        options: Optional statement parameters.
+        limit: Stop after this many rows.
+        block_size: Rows requested per round trip.
+
+    Returns:
+        The column metadata and one list of values per column.
+    """
+    if block_size <= 0:
+        raise ValueError("block_size must be greater than 0")
+
+    query_options = {"isTerseResults": True}
+    if options:
+        query_options["parameters"] = list(options)
+
+    with job.query(sql, opts=query_options) as query:
+        size = block_size if limit is None else min(block_size, limit)
+        block = query.run(rows_to_fetch=size)
+        metadata = (block.get("metadata") or {}).get("columns") or []
+        columns: List[List[Any]] = [[] for _ in metadata]
+        fetched = 0
+
+        while True:
+            rows = block.get("data") or []
+            if limit is not None:
+                rows = rows[: limit - fetched]
+            for values, column in zip(zip(*rows), columns):
+                column.extend(values)
+            fetched += len(rows)
+            if block.get("is_done") or not rows or (limit is not None and fetched >= limit):
+                break
+            size = block_size if limit is None else min(block_size, limit - fetched)
+            block = query.fetch_more(rows_to_fetch=size)
+
+    return metadata, columns
+
+
+def _decimal_type(pa, column: Dict[str, Any], values: List[Any]):
+    precision = column.get("precision") or DEFAULT_DECIMAL_PRECISION
+    scale = column.get("scale")
+    if scale is None:
+        scale = 0
+        for value in values:
+            if value is not None:
+                exponent = Decimal(str(value)).as_tuple().exponent
+                scale = max(scale, -exponent if isinstance(exponent, int) else 0)
+    precision = max(precision, scale + 1)
+    if precision > 38:
+        return pa.decimal256(precision, scale)
+    return pa.decimal128(precision, scale)
+
+
+def _to_decimal(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def _parse_time(value: Any) -> time:
+    match = _TIME.match(str(value).strip())
+    if match is None:
+        raise ValueError(f"Invalid TIME value: {value!r}")
+    return time(*(int(part) for part in match.groups()))
+
+
+def _parse_timestamp(value: Any) -> Tuple[datetime, str]:
+    """Split a timestamp into a microsecond datetime and its fractional digits."""
+    match = _TIMESTAMP.match(str(value).strip())
+    if match is None:
+        raise ValueError(f"Invalid TIMESTAMP value: {value!r}")
+    *parts, fraction = match.groups()
+    fraction = fraction or ""
+    microseconds = int(fraction[:6].ljust(6, "0"))
+    return datetime(*(int(part) for part in parts), microseconds), fraction
+
+
+def _epoch_nanoseconds(moment: datetime, fraction: str) -> int:
+    nanoseconds = int(fraction[6:9].ljust(3, "0"))
+    return (moment - _EPOCH) // timedelta(microseconds=1) * 1000 + nanoseconds
+
+
+def _timestamp_array(pa, column: Dict[str, Any], values: List[Any]):
+    parsed = [None if v is None else _parse_timestamp(v) for v in values]
+    scale = column.get("scale")
+    if scale is None:
+        scale = max((len(p[1]) for p in parsed if p is not None), default=0)
+    if scale > 6:
+        try:
+            nanoseconds = [None if p is None else _epoch_nanoseconds(*p) for p in parsed]
+            return pa.array(nanoseconds, type=pa.timestamp("ns"))
+        except (OverflowError, pa.ArrowInvalid):
+            # Outside 1677-2262: keep microseconds rather than overflow.
+            pass
+    return pa.array([None if p is None else p[0] for p in parsed], type=pa.timestamp("us"))
+
+
+def _column_array(pa, column: Dict[str, Any], values: List[Any]):
+    db_type = str(column.get("type", "")).upper()
+
+    if db_type in DECIMAL_TYPES:
+        decimal_type = _decimal_type(pa, column, values)
+        return pa.array([_to_decimal(v) for v in values], type=decimal_type)
+    if db_type in INTEGER_TYPES:
+        return pa.array(values, type=pa.int64())
+    if db_type in FLOAT_TYPES:
+        return pa.array([None if v is None else float(v) for v in values], type=pa.float64())
+    if db_type == "BOOLEAN":
+        return pa.array(values, type=pa.bool_())
+    if db_type in BINARY_TYPES:
+        return pa.array(values)
+
+    strings = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    try:
+        if db_type == "DATE":
+            return strings.cast(pa.date32())
+        if db_type == "TIME":
+            return pa.array([None if v is None else _parse_time(v) for v in values], type=pa.time64("us"))
+        if db_type == "TIMESTAMP":
+            return _timestamp_array(pa, column, values)
+    except (ValueError, pa.ArrowNotImplementedError):
+        # Unparseable or out-of-range values (e.g. TIME '24.00.00') stay as strings.
+        return strings
+    return strings
+
+
+def to_arrow(metadata: List[Dict[str, Any]], columns: List[List[Any]]):
+    """Build a `pyarrow.Table` from `fetch_columns` output."""
+    pa = _import_pyarrow()
+    names = [column.get("label") or column.get("name") for column in metadata]
+    arrays = [_column_array(pa, column, values) for column, values in zip(metadata, columns)]
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def to_pandas(table: Any, exact_decimals: bool = False):
+    """Convert an Arrow result table to a NumPy-backed pandas DataFrame.
+
+    DECIMAL columns become float64 unless `exact_decimals` is set, in which
+    case they are kept as `decimal.Decimal` objects.
+    """
+    pa = _import_pyarrow()
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "`pandas` not installed. Please install the arrow extra using "
+            "`pip install 'db2-shared-utils[arrow]'`"
+        )
+
+    if not exact_decimals:
+        fields = [
+            pa.field(f.name, pa.float64()) if pa.types.is_decimal(f.type) else f
+            for f in table.schema
+        ]
+        table = table.cast(pa.schema(fields))
+    return table.to_pandas()
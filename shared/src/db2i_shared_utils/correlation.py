@@ -0,0 +1,297 @@
+"""CPU versus network correlation per job over time.
+
+`examples/cpu_network_correlation.sql` joins ACTIVE_JOB_INFO and
+NETSTAT_JOB_INFO at a single instant, which cannot show whether a job's CPU
+follows its network activity. `JobNetworkCorrelator` samples both on a
+schedule instead:
+
+- CPU time per job comes from a `JobSnapshotService`, so the samples share
+  the throttled ACTIVE_JOB_INFO snapshots of the other tools. CPU rates are
+  timed by when each snapshot was taken, and an interval whose snapshot was
+  reused from the previous sample has no CPU rate.
+- connections and bytes per job come from NETSTAT_JOB_INFO joined with
+  NETSTAT_INFO on the connection's addresses and ports
+
+`correlate()` aligns the samples by job into (interval, job) matrices and,
+vectorized with NumPy across all jobs, turns the cumulative CPU and byte
+counters into per-second rates, computes the Pearson correlation of CPU with
+connections and with traffic, and the lagged cross-correlation of CPU with
+traffic to show whether network activity leads CPU.
+"""
+
+import logging
+import threading
+import time
+import warnings
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db2i_shared_utils.executor import SQLExecutor
+from db2i_shared_utils.jobs import JobSnapshotService
+
+logger = logging.getLogger(__name__)
+
+NETWORK_BY_JOB_SQL = """
+SELECT J.JOB_NAME,
+       COUNT(*) AS CONNECTIONS,
+       SUM(N.BYTES_SENT_REMOTELY) AS BYTES_SENT,
+       SUM(N.BYTES_RECEIVED_LOCALLY) AS BYTES_RECEIVED
+FROM QSYS2.NETSTAT_JOB_INFO J
+LEFT JOIN QSYS2.NETSTAT_INFO N
+  ON N.LOCAL_ADDRESS = J.LOCAL_ADDRESS AND N.LOCAL_PORT = J.LOCAL_PORT
+ AND N.REMOTE_ADDRESS = J.REMOTE_ADDRESS AND N.REMOTE_PORT = J.REMOTE_PORT
+GROUP BY J.JOB_NAME
+"""
+
+DEFAULT_INTERVAL = 60.0
+
+# Intervals a job needs before its correlations are reported.
+MIN_INTERVALS = 5
+
+# Fields recorded per job and sample, in matrix order.
+FIELDS = ("CPU_TIME", "CONNECTIONS", "BYTES_SENT", "BYTES_RECEIVED")
+
+
+@dataclass
+class JobSample:
+    """CPU and network counters of every networked job at one point in time.
+
+    `cpu_taken_at` is when the CPU_TIME values were read, which can be up to
+    a snapshot window before `taken_at`; it defaults to `taken_at`.
+    """
+
+    taken_at: float
+    jobs: Dict[str, Tuple[float, ...]]
+    cpu_taken_at: Optional[float] = None
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def pearson(x: np.ndarray, y: np.ndarray, min_count: int = MIN_INTERVALS) -> Tuple[np.ndarray, np.ndarray]:
+    """Column-wise Pearson correlation of two (time, series) arrays, ignoring NaN.
+
+    Returns:
+        The correlation and the number of paired values per column. The
+        correlation is NaN for columns with fewer than `min_count` pairs or
+        no variation.
+    """
+    mask = ~np.isnan(x) & ~np.isnan(y)
+    count = mask.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x = np.where(mask, x, 0.0).sum(axis=0) / count
+        mean_y = np.where(mask, y, 0.0).sum(axis=0) / count
+        dx = np.where(mask, x - mean_x, 0.0)
+        dy = np.where(mask, y - mean_y, 0.0)
+        var_x = (dx**2).sum(axis=0)
+        var_y = (dy**2).sum(axis=0)
+        r = (dx * dy).sum(axis=0) / np.sqrt(var_x * var_y)
+    r[(count < min_count) | (var_x <= 0) | (var_y <= 0)] = np.nan
+    return r, count
+
+
+def lagged_correlation(
+    x: np.ndarray, y: np.ndarray, max_lag: int, min_count: int = MIN_INTERVALS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Correlate `x[t]` with `y[t - lag]` for lags in `-max_lag..max_lag`.
+
+    A positive lag means `y` moves first.
+
+    Returns:
+        The lag with the strongest absolute correlation per column, and that
+        correlation (NaN where no lag has enough pairs).
+    """
+    lags = np.arange(-max_lag, max_lag + 1)
+    by_lag = np.full((len(lags), x.shape[1]), np.nan)
+    for i, lag in enumerate(lags):
+        if lag > 0:
+            by_lag[i] = pearson(x[lag:], y[:-lag], min_count)[0]
+        elif lag < 0:
+            by_lag[i] = pearson(x[:lag], y[-lag:], min_count)[0]
+        else:
+            by_lag[i] = pearson(x, y, min_count)[0]
+    strongest = np.nan_to_num(np.abs(by_lag), nan=-1.0).argmax(axis=0)
+    columns = np.arange(x.shape[1])
+    return lags[strongest], by_lag[strongest, columns]
+
+
+def _rates(counters: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+    """Per-second increase of cumulative counters; NaN where a counter went back."""
+    deltas = np.diff(counters, axis=0)
+    deltas[deltas < 0] = np.nan
+    return deltas / seconds[:, None]
+
+
+def _value(number: float, digits: int = 4) -> Optional[float]:
+    return None if np.isnan(number) else round(float(number), digits)
+
+
+class JobNetworkCorrelator:
+    """Sample per-job CPU and network activity and correlate them.
+
+    Args:
+        executor: Executor the network query runs on.
+        job_snapshots: Service the CPU snapshots come from.
+        interval: Seconds between samples when running in the background.
+        history: Samples kept.
+        subsystems: Only sample jobs in these subsystems. Pass the filter of
+            the other ACTIVE_JOB_INFO tools to share their snapshots; None
+            reads every active job on the system on each sample.
+    """
+
+    def __init__(
+        self,
+        executor: SQLExecutor,
+        job_snapshots: JobSnapshotService,
+        interval: float = DEFAULT_INTERVAL,
+        history: int = 120,
+        subsystems: Optional[Any] = None,
+    ):
+        self.executor = executor
+        self.job_snapshots = job_snapshots
+        self.interval = interval
+        self.subsystems = subsystems
+        self._samples: Deque[JobSample] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> JobSample:
+        """Take one sample of the jobs that have network connections."""
+        network = self.executor.execute(NETWORK_BY_JOB_SQL).rows
+        snapshot = self.job_snapshots.snapshot(subsystems=self.subsystems)
+        cpu = {row.get("JOB_NAME"): _number(row.get("CPU_TIME")) for row in snapshot.rows}
+        jobs = {}
+        for row in network:
+            name = row.get("JOB_NAME")
+            if name in cpu:
+                jobs[name] = (cpu[name],) + tuple(_number(row.get(f)) for f in FIELDS[1:])
+        sample = JobSample(time.time(), jobs, snapshot.taken_at)
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    def samples(self) -> List[JobSample]:
+        """Return the recorded samples, oldest first."""
+        with self._lock:
+            return list(self._samples)
+
+    def start(self) -> None:
+        """Sample every `interval` seconds on a background thread. Idempotent."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="job-network-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling. Recorded samples are kept."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Sampling jobs and connections failed: {e}")
+            self._stop.wait(self.interval)
+
+    def matrices(self) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """Align the samples by job.
+
+        Returns:
+            Sample times, job names and a (sample, job, field) array of the
+            `FIELDS` counters, NaN where a job was not seen.
+        """
+        return self._align(self.samples())
+
+    @staticmethod
+    def _align(samples: List[JobSample]) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        names = sorted({name for sample in samples for name in sample.jobs})
+        index = {name: j for j, name in enumerate(names)}
+        values = np.full((len(samples), len(names), len(FIELDS)), np.nan)
+        for i, sample in enumerate(samples):
+            for name, counters in sample.jobs.items():
+                values[i, index[name]] = counters
+        times = np.array([sample.taken_at for sample in samples], dtype=float)
+        return times, names, values
+
+    def correlate(self, top: int = 10, max_lag: int = 3) -> Dict[str, Any]:
+        """Correlate CPU with connections and traffic per job.
+
+        Args:
+            top: Jobs to return, ranked by how much of the CPU they use
+                that follows their network activity.
+            max_lag: Largest lag, in sampling intervals, to test.
+
+        Returns:
+            INTERVALS sampled, the system-wide correlation of total CPU with
+            total traffic, and per-job rows with the CPU rate (ms per second),
+            average connections and bytes per second, R_CPU_CONNECTIONS,
+            R_CPU_TRAFFIC, the lag at which traffic correlates best with CPU
+            and that correlation, and DRIVE_SCORE, the job's share of CPU
+            weighted by its strongest positive correlation.
+        """
+        samples = self.samples()
+        times, names, values = self._align(samples)
+        intervals = max(len(times) - 1, 0)
+        result: Dict[str, Any] = {"INTERVALS": intervals, "JOBS": []}
+        if intervals < MIN_INTERVALS or not names:
+            return result
+
+        seconds = np.diff(times)
+        cpu_times = np.array([s.taken_at if s.cpu_taken_at is None else s.cpu_taken_at for s in samples])
+        cpu_seconds = np.diff(cpu_times)
+        # A reused snapshot repeats the previous CPU times: no rate for that interval
+        cpu = _rates(values[:, :, 0], np.where(cpu_seconds > 0, cpu_seconds, np.nan))
+        traffic = _rates(values[:, :, 2], seconds) + _rates(values[:, :, 3], seconds)
+        connections = values[1:, :, 1]
+
+        r_connections = pearson(cpu, connections)[0]
+        r_traffic, count = pearson(cpu, traffic)
+        best_lag, r_lag = lagged_correlation(cpu, traffic, max_lag)
+
+        with np.errstate(invalid="ignore"):
+            total_cpu = np.nansum(cpu, axis=1, keepdims=True)
+            total_traffic = np.nansum(traffic, axis=1, keepdims=True)
+        result["R_SYSTEM_CPU_TRAFFIC"] = _value(pearson(total_cpu, total_traffic)[0][0])
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean_cpu = np.nanmean(cpu, axis=0)
+            mean_connections = np.nanmean(connections, axis=0)
+            mean_traffic = np.nanmean(traffic, axis=0)
+        cpu_share = mean_cpu / np.nansum(mean_cpu) if np.nansum(mean_cpu) > 0 else np.zeros(len(names))
+        strongest = np.nanmax(
+            np.vstack([r_connections, r_traffic, r_lag, np.zeros(len(names))]), axis=0
+        )
+        drive = np.nan_to_num(cpu_share) * strongest
+
+        for j in np.argsort(-drive)[:top]:
+            if drive[j] <= 0:
+                break
+            result["JOBS"].append(
+                {
+                    "JOB_NAME": names[j],
+                    "INTERVALS": int(count[j]),
+                    "CPU_MS_PER_SECOND": _value(mean_cpu[j], 2),
+                    "CONNECTIONS": _value(mean_connections[j], 1),
+                    "BYTES_PER_SECOND": _value(mean_traffic[j], 1),
+                    "R_CPU_CONNECTIONS": _value(r_connections[j], 3),
+                    "R_CPU_TRAFFIC": _value(r_traffic[j], 3),
+                    "TRAFFIC_LEAD_INTERVALS": int(best_lag[j]) if not np.isnan(r_lag[j]) else None,
+                    "R_AT_LEAD": _value(r_lag[j], 3),
+                    "DRIVE_SCORE": _value(drive[j], 4),
+                }
+            )
+        return result
@@ -0,0 +1,1286 @@
+"""Shared Db2 for i engine used by every framework integration.
+
+`Db2iEngine` owns everything that talks to the server: a pooled set of
+mapepire connections (and one async pool per event loop), block-wise and
+streaming fetch, the schema caches, server-side query validation and query
+instrumentation. `Db2iDatabase` is the framework-neutral facade the agno,
+LangChain and MCP adapters build their tools on, so an optimisation made here
+reaches all of them.
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import queue
+import time
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, is_dataclass
+from textwrap import dedent
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, Sequence, Tuple, Union
+
+from mapepire_python import Connection, DaemonServer, connect
+from mapepire_python.data_types import JobStatus
+from mapepire_python.pool.pool_client import Pool, PoolOptions
+from pep249 import InterfaceError, OperationalError, QueryParameters, ResultRow, ResultSet
+from websockets.exceptions import ConnectionClosed
+
+# Relative, so the copy vendored into the MCP server finds its own columnar module
+from .columnar import fetch_columns, to_arrow, to_pandas
+
+logger = logging.getLogger(__name__)
+
+
+def truncate_word(content: Any, *, length: int, suffix: str = "...") -> str:
+    """
+    Truncate a string to a certain number of words, based on the max string
+    length.
+    """
+
+    if not isinstance(content, str) or length <= 0:
+        return content
+
+    if len(content) <= length:
+        return content
+
+    return content[: length - len(suffix)].rsplit(" ", 1)[0] + suffix
+
+
+DEFAULT_FETCH_BLOCK_SIZE = 500
+DEFAULT_POOL_SIZE = 4
+
+# Idle connections older than this are probed with a round trip before reuse.
+PROBE_AFTER_SECONDS = 30.0
+
+# Errors after which a connection is not handed out again.
+_CONNECTION_ERRORS = (ConnectionClosed, InterfaceError, OperationalError, OSError)
+
+_LIMITABLE_STATEMENT = re.compile(r"^\s*\(?\s*(SELECT|WITH|VALUES)\b", re.IGNORECASE)
+_HAS_ROW_LIMIT = re.compile(
+    r"\b(FETCH\s+(FIRST|NEXT)|OPTIMIZE\s+FOR|FOR\s+(READ|FETCH|UPDATE))\b"
+    r"|\b(LIMIT|OFFSET)\s+(\d|\?|:)"
+    r"|\bWITH\s+(NC|UR|CS|RS|RR)\s*$",
+    re.IGNORECASE,
+)
+
+
+def limit_sql(sql: str, limit: int) -> str:
+    """Append a server-side row limit to a query when it is safe to do so.
+
+    Only plain SELECT/WITH/VALUES statements without an existing row limit or
+    trailing clause are rewritten; anything else is returned unchanged and
+    relies on the client-side limit alone.
+    """
+    stripped = sql.strip().rstrip(";").rstrip()
+    if not _LIMITABLE_STATEMENT.match(stripped) or _HAS_ROW_LIMIT.search(stripped):
+        return sql
+    return f"{stripped}\nFETCH FIRST {int(limit)} ROWS ONLY"
+
+
+TABLE_NAMES_SQL = dedent(
+    """
+    SELECT TABLE_NAME as name, TABLE_TYPE
+    FROM QSYS2.SYSTABLES
+    WHERE TABLE_SCHEMA = ? AND TABLE_TYPE = 'T'
+    ORDER BY TABLE_NAME
+    """
+)
+
+TABLE_DEFINITION_SQL = dedent(
+    """
+    CALL QSYS2.GENERATE_SQL(
+        DATABASE_OBJECT_NAME => ?,
+        DATABASE_OBJECT_LIBRARY_NAME => ?,
+        DATABASE_OBJECT_TYPE => 'TABLE',
+        CREATE_OR_REPLACE_OPTION => '1',
+        PRIVILEGES_OPTION => '0',
+        STATEMENT_FORMATTING_OPTION => '0',
+        SOURCE_STREAM_FILE_END_OF_LINE => 'LF',
+        SOURCE_STREAM_FILE_CCSID => 1208
+    )
+    """
+)
+
+
+CATALOG_STAMP_SQL = dedent(
+    """
+    SELECT COUNT(*) AS TABLES, MAX(LAST_ALTERED_TIMESTAMP) AS CHANGED
+    FROM QSYS2.SYSTABLES
+    WHERE TABLE_SCHEMA = ? AND TABLE_TYPE = 'T'
+    """
+)
+
+
+_QUOTED_OR_SPACE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace outside quoted literals and drop a trailing semicolon.
+
+    Used as the memo key for query validation, so reformatted copies of the
+    same statement share one verdict.
+    """
+
+    def replace(match: "re.Match") -> str:
+        return match.group(1) or " "
+
+    return _QUOTED_OR_SPACE.sub(replace, sql).strip().rstrip(";").strip()
+
+
+def _validation_verdict(response: Dict[str, Any]) -> Tuple[Optional[bool], str]:
+    """Turn a mapepire prepare_sql response into (valid, message).
+
+    `valid` is None when the server could not give a verdict, for example
+    because the request itself failed rather than the statement.
+    """
+    if response.get("success"):
+        return True, "The query is valid."
+    sql_state = response.get("sql_state")
+    error = response.get("error") or "unknown error"
+    if sql_state:
+        return False, f"{error} (SQLSTATE {sql_state}, SQLCODE {response.get('sql_rc')})"
+    return None, error
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompt budgeting (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _words(text: str) -> set:
+    return {w for w in re.split(r"[^a-z0-9]+", text.lower()) if len(w) > 2}
+
+
+# Question words that say nothing about which table is meant.
+_STOP_WORDS = {
+    "all", "and", "are", "each", "for", "from", "has", "have", "how", "list",
+    "many", "per", "show", "that", "the", "their", "this", "was", "were",
+    "what", "which", "who", "with",
+}
+
+
+def match_tables(question: str, table_names: Sequence[str], max_tables: int = 5) -> List[str]:
+    """Return the tables whose names best match the words of a question.
+
+    A question word matches a word of the table name when one is a prefix of
+    the other, so "employees" finds EMPLOYEE and EMP and "departments" finds
+    DEPARTMENT. Tables with no matching word are left out.
+    """
+    wanted = _words(question) - _STOP_WORDS
+    if not wanted or max_tables <= 0:
+        return []
+
+    def score(table: str) -> int:
+        name_words = _words(table)
+        return sum(
+            any(w.startswith(n) or n.startswith(w) for n in name_words) for w in wanted
+        )
+
+    scored = [(score(table), table) for table in table_names]
+    ranked = sorted((item for item in scored if item[0] > 0), key=lambda item: -item[0])
+    return [table for _, table in ranked[:max_tables]]
+
+
+def _config_key(server_config: Union[DaemonServer, Dict[str, str]]) -> Tuple:
+    """Return a hashable key identifying a server configuration."""
+    items = asdict(server_config) if is_dataclass(server_config) else dict(server_config)
+    return tuple(sorted((key, str(value)) for key, value in items.items()))
+
+
+QueryHook = Callable[[Dict[str, Any]], None]
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Return whether an error, or one it was raised from, broke the connection.
+
+    mapepire re-raises socket failures as `RuntimeError`, so the cause chain
+    is followed.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, _CONNECTION_ERRORS):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class Db2iEngine:
+    """Connection pool and schema cache for one server config and schema.
+
+    Engines are shared process-wide: every `Db2iDatabase` built for the same
+    server config and schema gets the same engine via `Db2iEngine.shared()`,
+    whichever framework adapter created it, so a team of agents reuses one set
+    of connections and scans the catalog at most once.
+
+    Connections are opened with the schema as their default library, so
+    unqualified table names resolve against it.
+    """
+
+    _engines: Dict[Tuple, "Db2iEngine"] = {}
+    _engines_lock = threading.Lock()
+
+    def __init__(
+        self,
+        schema: str,
+        server_config: Union[DaemonServer, Dict[str, str]],
+        pool_size: int = DEFAULT_POOL_SIZE,
+        validation_cache_size: int = 256,
+        jdbc_options: Optional[Dict[str, Any]] = None,
+    ):
+        if pool_size <= 0:
+            raise ValueError("pool_size must be greater than 0")
+
+        self.schema = schema
+        self.server_config = server_config
+        self.pool_size = pool_size
+        self.jdbc_options = dict(jdbc_options or {})
+        self._idle: "queue.LifoQueue[Tuple[Connection, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._table_names: Optional[List[str]] = None
+        self._table_definitions: Dict[str, str] = {}
+        # Keyed weakly so a finished event loop does not stay alive through the
+        # engine; `_async_shutdown` ends each pool before `asyncio.run` closes
+        # its loop.
+        self._async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Pool]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._async_ready: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._async_shutdown: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._catalog_stamp: Optional[Tuple[Any, ...]] = None
+        self._validation_cache: "OrderedDict[str, Tuple[bool, str]]" = OrderedDict()
+        self._validation_cache_size = validation_cache_size
+        self._hooks: List[QueryHook] = []
+        self._stats = {"queries": 0, "errors": 0, "rows": 0, "seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def connection_options(self) -> Dict[str, Any]:
+        """JDBC options used for every connection this engine opens."""
+        options = {"libraries": [self.schema]} if self.schema else {}
+        options.update(self.jdbc_options)
+        return options
+
+    @classmethod
+    def shared(
+        cls,
+        schema: str,
+        server_config: Union[DaemonServer, Dict[str, str]],
+        pool_size: Optional[int] = None,
+        jdbc_options: Optional[Dict[str, Any]] = None,
+    ) -> "Db2iEngine":
+        """Return the process-wide engine for this server config and schema.
+
+        Args:
+            pool_size: Size of the pool when the engine is created, defaulting
+                to `DEFAULT_POOL_SIZE`. None accepts whatever size the shared
+                engine already has.
+
+        Raises:
+            ValueError: The engine already exists with a different pool size.
+        """
+        key = (schema, _config_key(server_config), _config_key(jdbc_options or {}))
+        with cls._engines_lock:
+            engine = cls._engines.get(key)
+            if engine is None:
+                engine = cls._engines[key] = cls(
+                    schema, server_config, pool_size or DEFAULT_POOL_SIZE, jdbc_options=jdbc_options
+                )
+            elif pool_size is not None and pool_size != engine.pool_size:
+                raise ValueError(
+                    f"Shared engine for schema {schema!r} already has pool_size={engine.pool_size}, "
+                    f"not {pool_size}; pass the same size or none"
+                )
+        return engine
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Close every shared engine, including its async pools, and forget them."""
+        with cls._engines_lock:
+            engines = list(cls._engines.values())
+            cls._engines.clear()
+        for engine in engines:
+            engine.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Borrow a pooled connection, opening one if none is idle.
+
+        At most `pool_size` connections are lent out at a time; further
+        callers block until one is returned. A connection is dropped instead
+        of returned when the borrower fails with a connection error, and an
+        idle connection is probed before reuse once it has been idle for
+        `PROBE_AFTER_SECONDS`.
+        """
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except BaseException as e:
+                if is_connection_error(e):
+                    logger.debug(f"Dropping broken Db2i connection from pool: {e}")
+                    self._discard(conn)
+                else:
+                    self._idle.put((conn, time.monotonic()))
+                raise
+            else:
+                self._idle.put((conn, time.monotonic()))
+
+    def _checkout(self) -> Connection:
+        while True:
+            try:
+                conn, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                return connect(self.server_config, self.connection_options)
+            if self._alive(conn, time.monotonic() - returned_at):
+                return conn
+            self._discard(conn)
+
+    @staticmethod
+    def _alive(conn: Connection, idle_seconds: float) -> bool:
+        if conn.job.get_status() != JobStatus.Ready:
+            return False
+        if idle_seconds < PROBE_AFTER_SECONDS:
+            return True
+        try:
+            with conn.job.query("VALUES 1") as probe:
+                return bool(probe.run(rows_to_fetch=1).get("success"))
+        except Exception as e:
+            logger.debug(f"Idle Db2i connection failed its probe: {e}")
+            return False
+
+    @staticmethod
+    def _discard(conn: Connection) -> None:
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing Db2i connection: {e}")
+
+    def close(self) -> None:
+        """Close all idle connections and end the async pools."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+        self._end_async_pools()
+
+    def add_hook(self, hook: QueryHook) -> None:
+        """Register a callback that receives one event per statement.
+
+        Events are dicts with `sql`, `mode` ("sync", "async", "arrow" or
+        "validate"), `rows`, `seconds` and `error` (None on success).
+        Registering the same hook again has no effect.
+        """
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook: QueryHook) -> None:
+        """Unregister a callback added with `add_hook`, if present."""
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return totals of statements, errors, rows and time since start."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    @contextmanager
+    def instrument(self, sql: str, mode: str) -> Iterator[Dict[str, Any]]:
+        """Count one statement in `stats` and report it to the query hooks.
+
+        Yields the event dict; the caller sets `rows`. Time and any error are
+        filled in when the block exits, so code running statements outside
+        the engine's own methods shows up in the same hooks.
+        """
+        event: Dict[str, Any] = {"sql": sql, "mode": mode, "rows": 0, "error": None}
+        start = time.perf_counter()
+        try:
+            yield event
+        except Exception as e:
+            event["error"] = str(e)
+            raise
+        finally:
+            event["seconds"] = time.perf_counter() - start
+            with self._stats_lock:
+                self._stats["queries"] += 1
+                self._stats["errors"] += event["error"] is not None
+                self._stats["rows"] += event["rows"]
+                self._stats["seconds"] += event["seconds"]
+            for hook in tuple(self._hooks):
+                try:
+                    hook(event)
+                except Exception as e:
+                    logger.debug(f"Query hook failed: {e}")
+
+    def execute(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        fetch: Union[Literal["all", "one"], int] = "all",
+        block_size: int = DEFAULT_FETCH_BLOCK_SIZE,
+    ) -> ResultRow | ResultSet | list:
+        """Execute SQL on a pooled connection and return the result rows.
+
+        An integer `fetch` is pushed down as a FETCH FIRST clause where
+        possible and read back in `fetchmany` blocks of up to `block_size`
+        rows, so n rows cost roughly n / block_size round trips.
+        """
+        if isinstance(fetch, int) and not isinstance(fetch, bool):
+            return list(self.iter_rows(sql, options=options, limit=fetch, block_size=block_size))
+
+        if fetch not in ("all", "one"):
+            raise ValueError(f"Invalid fetch value: {fetch}")
+
+        with self.instrument(sql, "sync") as event, self.connection() as conn:
+            with conn.execute(sql, options) as cursor:
+                if cursor.has_results:
+                    if fetch == "all":
+                        result = cursor.fetchall()
+                    else:
+                        result = cursor.fetchone()
+
+                    event["rows"] = len(result["data"])
+                    return result["data"]
+
+        return []
+
+    def iter_rows(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+        block_size: int = DEFAULT_FETCH_BLOCK_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream result rows one block at a time without materializing them.
+
+        The pooled connection is held until the generator is exhausted or
+        closed.
+
+        Args:
+            sql: The statement to run.
+            options: Optional statement parameters.
+            limit: Stop after this many rows. Also applied server-side.
+            block_size: Rows requested per round trip.
+        """
+        if block_size <= 0:
+            raise ValueError("block_size must be greater than 0")
+        if limit is not None:
+            if limit <= 0:
+                return
+            sql = limit_sql(sql, limit)
+
+        with self.instrument(sql, "sync") as event, self.connection() as conn:
+            with conn.execute(sql, options) as cursor:
+                if not cursor.has_results:
+                    return
+                remaining = limit
+                while remaining is None or remaining > 0:
+                    size = block_size if remaining is None else min(block_size, remaining)
+                    block = cursor.fetchmany(size)
+                    rows = block["data"] if block else []
+                    event["rows"] += len(rows)
+                    yield from rows
+                    if remaining is not None:
+                        remaining -= len(rows)
+                    if not block or block["is_done"] or len(rows) < size:
+                        break
+
+    def get_table_names(self) -> List[str]:
+        """Return the base tables in the schema, scanning the catalog once."""
+        with self._lock:
+            if self._table_names is None:
+                result = self.execute(TABLE_NAMES_SQL, options=[self.schema], fetch="all")
+                self._table_names = [row["NAME"] for row in result]
+            return list(self._table_names)
+
+    def get_table_definition(self, table: str) -> str:
+        """Return the generated DDL for a table, cached per engine."""
+        cached = self._table_definitions.get(table)
+        if cached is not None:
+            return cached
+
+        result = self.execute(TABLE_DEFINITION_SQL, options=[table, self.schema])
+        definition = "\n".join(res["SRCDTA"] for res in result)
+        self._table_definitions[table] = definition
+        return definition
+
+    def fetch_arrow(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+        block_size: int = DEFAULT_FETCH_BLOCK_SIZE,
+    ):
+        """Run a query and return its result as a typed `pyarrow.Table`."""
+        if limit is not None:
+            sql = limit_sql(sql, limit)
+        with self.instrument(sql, "arrow") as event, self.connection() as conn:
+            metadata, columns = fetch_columns(
+                conn.job, sql, options=options, limit=limit, block_size=block_size
+            )
+            event["rows"] = len(columns[0]) if columns else 0
+        return to_arrow(metadata, columns)
+
+    async def async_pool(self) -> Pool:
+        """Return the mapepire async pool for the running event loop.
+
+        Async pools are bound to the loop that created them, so one is kept
+        per loop. Each grows on demand up to `pool_size` connections and is
+        ended when `asyncio.run` shuts its loop down, or by `aclose`.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._async_pools.get(loop)
+        if pool is None:
+            self._drop_closed_loops()
+            pool = Pool(
+                PoolOptions(
+                    creds=self.server_config,
+                    max_size=self.pool_size,
+                    starting_size=1,
+                    opts=self.connection_options,
+                )
+            )
+            self._async_pools[loop] = pool
+            self._async_ready[loop] = loop.create_task(pool.init())
+            self._async_shutdown[loop] = loop.create_task(self._end_on_shutdown(pool))
+        try:
+            await asyncio.shield(self._async_ready[loop])
+        except Exception:
+            if self._async_pools.get(loop) is pool:
+                self._forget_async_pool(loop)
+            raise
+        return pool
+
+    async def _end_on_shutdown(self, pool: Pool) -> None:
+        # `asyncio.run` cancels the tasks left on its loop before closing it,
+        # the last point at which the pool's connections can still be ended.
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.create_future()
+        except asyncio.CancelledError:
+            if self._async_pools.get(loop) is pool:
+                self._forget_async_pool(loop)
+                await pool.end()
+
+    def _forget_async_pool(self, loop: asyncio.AbstractEventLoop) -> Optional[Pool]:
+        self._async_ready.pop(loop, None)
+        shutdown = self._async_shutdown.pop(loop, None)
+        if shutdown is not None and shutdown is not asyncio.current_task(loop) and not loop.is_closed():
+            loop.call_soon_threadsafe(shutdown.cancel)
+        return self._async_pools.pop(loop, None)
+
+    def _drop_closed_loops(self) -> None:
+        # A loop closed without cancelling its tasks took the pool's sockets
+        # with it; there is nothing left to end.
+        for loop in [loop for loop in list(self._async_pools) if loop.is_closed()]:
+            logger.debug("Dropping async pool of a closed event loop")
+            self._forget_async_pool(loop)
+
+    def _end_async_pools(self) -> None:
+        """End the async pools of every event loop from outside those loops."""
+        self._drop_closed_loops()
+        for loop in list(self._async_pools):
+            pool = self._forget_async_pool(loop)
+            if pool is None:
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(pool.end(), loop)
+                continue
+            try:
+                loop.run_until_complete(pool.end())
+            except Exception as e:
+                logger.debug(f"Failed to end async pool: {e}")
+
+    async def aiter_rows(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+        block_size: int = DEFAULT_FETCH_BLOCK_SIZE,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of `iter_rows`, running on the async pool."""
+        if block_size <= 0:
+            raise ValueError("block_size must be greater than 0")
+        if limit is not None:
+            if limit <= 0:
+                return
+            sql = limit_sql(sql, limit)
+
+        with self.instrument(sql, "async") as event:
+            pool = await self.async_pool()
+            query = await pool.query(sql, {"parameters": list(options)} if options else None)
+            async with query:
+                remaining = limit
+                size = block_size if remaining is None else min(block_size, remaining)
+                block = await query.run(rows_to_fetch=size)
+                while True:
+                    rows = (block["data"] or [])[:remaining]
+                    event["rows"] += len(rows)
+                    for row in rows:
+                        yield row
+                    if remaining is not None:
+                        remaining -= len(rows)
+                    if block["is_done"] or not rows or (remaining is not None and remaining <= 0):
+                        break
+                    size = block_size if remaining is None else min(block_size, remaining)
+                    block = await query.fetch_more(rows_to_fetch=size)
+
+    async def aexecute(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        fetch: Union[Literal["all", "one"], int] = "all",
+        block_size: int = DEFAULT_FETCH_BLOCK_SIZE,
+    ) -> ResultSet | list:
+        """Async counterpart of `execute`, running on the async pool."""
+        if fetch == "all":
+            limit = None
+        elif fetch == "one":
+            limit = 1
+        elif isinstance(fetch, int) and not isinstance(fetch, bool):
+            limit = fetch
+        else:
+            raise ValueError(f"Invalid fetch value: {fetch}")
+        return [
+            row
+            async for row in self.aiter_rows(sql, options=options, limit=limit, block_size=block_size)
+        ]
+
+    async def aget_table_names(self) -> List[str]:
+        """Async counterpart of `get_table_names`, sharing its cache."""
+        if self._table_names is None:
+            result = await self.aexecute(TABLE_NAMES_SQL, options=[self.schema])
+            with self._lock:
+                if self._table_names is None:
+                    self._table_names = [row["NAME"] for row in result]
+        return list(self._table_names)
+
+    async def aget_table_definition(self, table: str) -> str:
+        """Async counterpart of `get_table_definition`, sharing its cache."""
+        cached = self._table_definitions.get(table)
+        if cached is not None:
+            return cached
+
+        result = await self.aexecute(TABLE_DEFINITION_SQL, options=[table, self.schema])
+        definition = "\n".join(res["SRCDTA"] for res in result)
+        self._table_definitions[table] = definition
+        return definition
+
+    async def aclose(self) -> None:
+        """End the async pool owned by the running event loop."""
+        pool = self._forget_async_pool(asyncio.get_running_loop())
+        if pool is not None:
+            await pool.end()
+
+    def validate_query(self, sql: str) -> Tuple[Optional[bool], str]:
+        """Prepare a statement on the server without executing it.
+
+        Syntax errors and unresolved tables, columns or functions come back
+        as the server's own SQLSTATE in a single round trip. Verdicts are
+        memoized by `normalize_sql`.
+
+        Returns:
+            Tuple[Optional[bool], str]: Whether the statement is valid and a
+            message. `None` means the database could not decide.
+        """
+        key = normalize_sql(sql)
+        cached = self._cached_verdict(key)
+        if cached is not None:
+            return cached
+
+        try:
+            with self.instrument(sql, "validate"), self.connection() as conn:
+                response = self._send(conn.job, self._prepare_request(conn.job, sql))
+                if response.get("success"):
+                    self._send(conn.job, self._close_request(conn.job, response))
+        except Exception as e:
+            return None, str(e)
+
+        return self._remember_verdict(key, _validation_verdict(response))
+
+    async def avalidate_query(self, sql: str) -> Tuple[Optional[bool], str]:
+        """Async counterpart of `validate_query`, running on the async pool."""
+        key = normalize_sql(sql)
+        cached = self._cached_verdict(key)
+        if cached is not None:
+            return cached
+
+        try:
+            with self.instrument(sql, "validate"):
+                pool = await self.async_pool()
+                job = await pool.get_job()
+                response = await job.send(json.dumps(self._prepare_request(job, sql)))
+                if response.get("success"):
+                    await job.send(json.dumps(self._close_request(job, response)))
+        except Exception as e:
+            return None, str(e)
+
+        return self._remember_verdict(key, _validation_verdict(response))
+
+    @staticmethod
+    def _prepare_request(job: Any, sql: str) -> Dict[str, Any]:
+        # `prepare_sql` compiles the statement and resolves its objects but
+        # does not run it; mapepire-python has no public wrapper for it.
+        statement = sql.strip().rstrip(";")
+        return {"id": job._get_unique_id("prepare"), "type": "prepare_sql", "sql": statement}
+
+    @staticmethod
+    def _close_request(job: Any, response: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": job._get_unique_id("sqlclose"), "type": "sqlclose", "cont_id": response["id"]}
+
+    @staticmethod
+    def _send(job: Any, request: Dict[str, Any]) -> Dict[str, Any]:
+        job.send(json.dumps(request))
+        return json.loads(job._socket.recv())
+
+    def _cached_verdict(self, key: str) -> Optional[Tuple[bool, str]]:
+        with self._lock:
+            verdict = self._validation_cache.get(key)
+            if verdict is not None:
+                self._validation_cache.move_to_end(key)
+            return verdict
+
+    def _remember_verdict(
+        self, key: str, verdict: Tuple[Optional[bool], str]
+    ) -> Tuple[Optional[bool], str]:
+        if verdict[0] is None:
+            return verdict
+        with self._lock:
+            self._validation_cache[key] = verdict
+            while len(self._validation_cache) > self._validation_cache_size:
+                self._validation_cache.popitem(last=False)
+        return verdict
+
+    def catalog_stamp(self) -> Tuple[Any, ...]:
+        """Return a cheap fingerprint of the schema's table catalog.
+
+        The fingerprint is the table count and latest LAST_ALTERED_TIMESTAMP
+        in QSYS2.SYSTABLES. When it differs from the previous call the cached
+        table names and definitions are dropped, so callers can key their own
+        caches on it and trust that the engine caches are fresh.
+        """
+        result = self.execute(CATALOG_STAMP_SQL, options=[self.schema], fetch="all")
+        row = result[0] if result else {}
+        stamp = (row.get("TABLES"), str(row.get("CHANGED")))
+        with self._lock:
+            if self._catalog_stamp is not None and stamp != self._catalog_stamp:
+                logger.debug(f"Catalog for {self.schema} changed, clearing schema cache")
+                self._table_names = None
+                self._table_definitions.clear()
+            self._catalog_stamp = stamp
+        return stamp
+
+    def clear_cache(self) -> None:
+        """Forget cached table names and definitions."""
+        with self._lock:
+            self._table_names = None
+            self._table_definitions.clear()
+            self._catalog_stamp = None
+            self._validation_cache.clear()
+
+
+atexit.register(Db2iEngine.close_all)
+
+
+class Db2iDatabase:
+    """Framework-neutral access to one schema, backed by a shared `Db2iEngine`.
+
+    Framework adapters wrap this class in their own tool types; it renders
+    results and table descriptions as the prompt-ready strings those tools
+    return.
+    """
+
+    def __init__(
+        self,
+        schema: str,
+        server_config: Union[DaemonServer, Dict[str, str]],
+        ignore_tables: Optional[List[str]] = None,
+        include_tables: Optional[List[str]] = None,
+        custom_table_info: Optional[Dict[Any, Any]] = None,
+        sampler_rows_in_table_info: int = 3,
+        max_string_length: int = 300,
+        pool_size: Optional[int] = None,
+        fetch_block_size: int = DEFAULT_FETCH_BLOCK_SIZE,
+    ):
+        self._schema = schema
+        self._server_config = server_config
+        if include_tables and ignore_tables:
+            raise ValueError("Cannot specify both include_tables and ignore_tables")
+
+        # Table discovery is deferred until the tables are first needed, so
+        # building a Db2iDatabase never blocks on the IBM i.
+        self._engine = Db2iEngine.shared(schema, server_config, pool_size=pool_size)
+        self._include_tables = set(include_tables) if include_tables else set()
+        self._ignore_tables = set(ignore_tables) if ignore_tables else set()
+        self._tables_validated = False
+
+        self._sample_rows_in_table_info = sampler_rows_in_table_info
+        self._customed_table_info = custom_table_info
+        self._max_string_length = max_string_length
+        self._fetch_block_size = fetch_block_size
+        self._context_cache: Dict[Tuple, Dict[str, Any]] = {}
+
+    @property
+    def dialect(self) -> str:
+        """Return string representation of dialect to use."""
+        return "Db2i"
+
+    @property
+    def engine(self) -> Db2iEngine:
+        """Return the shared engine backing this database."""
+        return self._engine
+
+    @property
+    def _all_tables(self) -> set:
+        return self._validated(self._engine.get_table_names())
+
+    def _validated(self, table_names: List[str]) -> set:
+        all_tables = set(table_names)
+        if not self._tables_validated:
+            for tables in (self._include_tables, self._ignore_tables):
+                missing_tables = tables - all_tables
+                if missing_tables:
+                    raise ValueError(
+                        f"Tables {missing_tables} are not present in the schema {self._schema}"
+                    )
+            self._tables_validated = True
+        return all_tables
+
+    @property
+    def usable_tables(self) -> List[str]:
+        return self.get_usable_table_names()
+
+    def _get_all_table_names(self, schema: str) -> List[str]:
+        if schema == self._schema:
+            return self._engine.get_table_names()
+        return Db2iEngine.shared(schema, self._server_config).get_table_names()
+
+    def _execute(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        fetch: Union[Literal["all", "one"], int] = "all",
+    ) -> ResultRow | ResultSet | list:
+        """Execute SQL query and return data
+
+        Args:
+            sql (str): _description_
+            options (Optional[QueryParameters], optional): _description_. Defaults to None.
+            fetch (Union[Literal[&quot;all&quot;, &quot;one&quot;], int], optional): _description_. Defaults to "all".
+
+        Raises:
+            ValueError: _description_
+
+        Returns:
+            ResultRow | ResultSet | list: _description_
+        """
+
+        return self._engine.execute(
+            sql, options=options, fetch=fetch, block_size=self._fetch_block_size
+        )
+
+    def stream(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield result rows block by block instead of materializing them."""
+        return self._engine.iter_rows(
+            sql, options=options, limit=limit, block_size=self._fetch_block_size
+        )
+
+    def astream(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of `stream`, running on the engine's async pool."""
+        return self._engine.aiter_rows(
+            sql, options=options, limit=limit, block_size=self._fetch_block_size
+        )
+
+    def validate_query(self, sql: str) -> Tuple[Optional[bool], str]:
+        """Check a statement on the server without running it.
+
+        See `Db2iEngine.validate_query`.
+        """
+        return self._engine.validate_query(sql)
+
+    async def avalidate_query(self, sql: str) -> Tuple[Optional[bool], str]:
+        """Async counterpart of `validate_query`."""
+        return await self._engine.avalidate_query(sql)
+
+    def run_arrow(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+    ):
+        """Execute a query and return a `pyarrow.Table` with Db2 column types.
+
+        DECIMAL columns stay exact and DATE/TIME/TIMESTAMP columns become Arrow
+        temporal types. Requires `pyarrow`.
+        """
+        return self._engine.fetch_arrow(
+            sql, options=options, limit=limit, block_size=self._fetch_block_size
+        )
+
+    def run_dataframe(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+        exact_decimals: bool = False,
+    ):
+        """Execute a query and return a pandas DataFrame built from Arrow.
+
+        DECIMAL columns become float64 unless `exact_decimals` is set.
+        Requires `pyarrow` and `pandas`.
+        """
+        return to_pandas(self.run_arrow(sql, options=options, limit=limit), exact_decimals)
+
+    def run(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        include_columns: bool = False,
+        fetch: Union[Literal["all", "one"], int] = "all",
+    ) -> str | ResultRow | ResultSet | list:
+        """Execute a SQL command and return a string representing the results.
+
+        If the statement returns rows, a string of the results is returned.
+        If the statement returns no rows, an empty string is returned.
+        """
+        result = self._execute(sql, options=options, fetch=fetch)
+
+        if fetch == "cursor":
+            return result
+
+        return self._format_result(result, include_columns)
+
+    async def arun(
+        self,
+        sql: str,
+        options: Optional[QueryParameters] = None,
+        include_columns: bool = False,
+        fetch: Union[Literal["all", "one"], int] = "all",
+    ) -> str:
+        """Async counterpart of `run`, executed on the engine's async pool."""
+        result = await self._engine.aexecute(
+            sql, options=options, fetch=fetch, block_size=self._fetch_block_size
+        )
+        return self._format_result(result, include_columns)
+
+    def _format_result(self, result: list, include_columns: bool) -> str:
+        res = [
+            {
+                column: truncate_word(value, length=self._max_string_length)
+                for column, value in r.items()
+            }
+            for r in result
+        ]
+
+        if not include_columns:
+            res = [tuple(row.values()) for row in res]  # type: ignore[misc]
+
+        if not res:
+            return ""
+        else:
+            return str(res)
+
+    def get_table_info(self, table_names: Optional[List[str]] = None):
+
+        all_table_names = self._select_tables(self.get_usable_table_names(), table_names)
+        described = self._describe_tables(all_table_names)
+        return "\n\n".join(described[table] for table in all_table_names)
+
+    async def aget_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        """Async counterpart of `get_table_info`; tables are described concurrently."""
+        all_table_names = self._select_tables(
+            await self.aget_usable_table_names(), table_names
+        )
+
+        async def describe(table: str) -> List[str]:
+            parts = []
+            if self._customed_table_info and table in self._customed_table_info:
+                parts.append(self._customed_table_info[table])
+
+            table_definition = await self._engine.aget_table_definition(table)
+            table_info = f"{table_definition.rstrip()}"
+
+            if self._sample_rows_in_table_info:
+                table_info += f"\n{await self._aget_sample_rows(table)}"
+            parts.append(table_info)
+            return parts
+
+        described = await asyncio.gather(*(describe(table) for table in all_table_names))
+        return "\n\n".join(part for parts in described for part in parts)
+
+    @staticmethod
+    def _select_tables(usable: List[str], table_names: Optional[List[str]]) -> List[str]:
+        if table_names is None:
+            return usable
+        missing_tables = set(table_names).difference(usable)
+        if missing_tables:
+            raise ValueError(f"Tables {missing_tables} are not present in the schema")
+        return table_names
+
+    def _sample_rows_sql(self, table: str) -> str:
+        return f"SELECT * FROM {self._schema}.{table} FETCH FIRST {self._sample_rows_in_table_info} ROWS ONLY"
+
+    def _get_sample_rows(self, table: str):
+        try:
+            result = self._engine.execute(self._sample_rows_sql(table), fetch="all")
+        except Exception as e:
+            logger.warning(f"Error getting sample rows for {table}: {e}")
+            result = []
+        return self._format_sample_rows(table, result)
+
+    async def _aget_sample_rows(self, table: str):
+        try:
+            result = await self._engine.aexecute(self._sample_rows_sql(table), fetch="all")
+        except Exception as e:
+            logger.warning(f"Error getting sample rows for {table}: {e}")
+            result = []
+        return self._format_sample_rows(table, result)
+
+    def _format_sample_rows(self, table: str, result: list) -> str:
+        columns_str = ""
+        sample_rows_str = ""
+        if result:
+            # Get column names as a tab-separated string
+            columns_str = "\t".join(result[0].keys())
+
+            # Convert each row to a tab-separated string of values
+            rows = []
+            for row in result:
+                # Convert all values to strings and join with tabs
+                row_values = []
+                for val in row.values():
+                    if val is None:
+                        row_values.append("NULL")
+                    else:
+                        str_val = str(val)
+                        if len(str_val) > 100:
+                            str_val = str_val[:97] + "..."
+                        row_values.append(str_val)
+
+                rows.append("\t".join(row_values))
+
+            # Join all rows with newlines
+            sample_rows_str = "\n".join(rows)
+
+        return (
+            f"{self._sample_rows_in_table_info} sample rows from {table}:\n"
+            f"{columns_str}\n"
+            f"{sample_rows_str}"
+        )
+
+    def _get_table_definition(self, table: str) -> str:
+        return self._engine.get_table_definition(table)
+
+    def get_table_info_no_throw(self, table_names: Optional[List[str]] = None) -> str:
+        """Get information about specified tables.
+
+        Follows best practices as specified in: Rajkumar et al, 2022
+        (https://arxiv.org/abs/2204.00498)
+
+        If `sample_rows_in_table_info`, the specified number of sample rows will be
+        appended to each table description. This can increase performance as
+        demonstrated in the paper.
+        """
+        try:
+            return self.get_table_info(table_names)
+        except ValueError as e:
+            """Format the error message"""
+            return f"Error: {e}"
+
+    async def aget_table_info_no_throw(self, table_names: Optional[List[str]] = None) -> str:
+        """Async counterpart of `get_table_info_no_throw`."""
+        try:
+            return await self.aget_table_info(table_names)
+        except ValueError as e:
+            return f"Error: {e}"
+
+    def get_relevant_table_info(self, question: str, max_tables: int = 5) -> Tuple[List[str], str]:
+        """Describe the usable tables whose names match a question.
+
+        Matching runs over the cached catalog, so only the matched tables cost
+        a round trip and those are described in parallel.
+
+        Returns:
+            The matched table names and their table info. Both are empty when
+            nothing matches.
+        """
+        tables = match_tables(question, self.get_usable_table_names(), max_tables)
+        if not tables:
+            return [], ""
+        described = self._describe_tables(tables)
+        return tables, "\n\n".join(described[table] for table in tables)
+
+    async def aget_relevant_table_info(
+        self, question: str, max_tables: int = 5
+    ) -> Tuple[List[str], str]:
+        """Async counterpart of `get_relevant_table_info`."""
+        tables = match_tables(question, await self.aget_usable_table_names(), max_tables)
+        if not tables:
+            return [], ""
+        return tables, await self.aget_table_info(tables)
+
+    def get_table_names(self):
+        return self.get_usable_table_names()
+
+    def get_usable_table_names(self):
+        return self._usable(self._all_tables)
+
+    async def aget_usable_table_names(self) -> List[str]:
+        """Async counterpart of `get_usable_table_names`."""
+        return self._usable(self._validated(await self._engine.aget_table_names()))
+
+    def _usable(self, all_tables: set) -> List[str]:
+        if self._include_tables:
+            return sorted(self._include_tables)
+        return sorted(all_tables - self._ignore_tables)
+
+    def run_no_throw(
+        self,
+        sql: str,
+        include_columns: bool = False,
+        fetch: Union[Literal["all", "one"], int] = "all",
+        parameters: Optional[Dict[str, Any]] = None,
+    ) -> ResultRow | str | ResultSet | list:
+        """Execute a SQL command and return a string representing the results.
+
+        If the statement returns rows, a string of the results is returned.
+        If the statement returns no rows, an empty string is returned.
+
+        If the statement throws an error, the error message is returned.
+        """
+        try:
+            return self.run(
+                sql, options=parameters, fetch=fetch, include_columns=include_columns
+            )
+        except Exception as e:
+            """Format the error message"""
+            return f"Error: {e}"
+
+    async def arun_no_throw(
+        self,
+        sql: str,
+        include_columns: bool = False,
+        fetch: Union[Literal["all", "one"], int] = "all",
+        parameters: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Async counterpart of `run_no_throw`."""
+        try:
+            return await self.arun(
+                sql, options=parameters, fetch=fetch, include_columns=include_columns
+            )
+        except Exception as e:
+            return f"Error: {e}"
+
+    def get_context(
+        self,
+        max_tokens: Optional[int] = None,
+        question: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Return db context that you may want in agent prompt.
+
+        Table descriptions are fetched in parallel on the engine's pool and
+        the result is cached until the schema's catalog stamp changes, so
+        repeated calls cost a single catalog query.
+
+        Args:
+            max_tokens: Optional budget for `table_info`. Tables are ranked
+                and described until the budget is spent; the rest are only
+                listed by name.
+            question: Optional text used to rank tables by word overlap with
+                their names and definitions. Without it, catalog order is kept.
+        """
+        stamp = self._engine.catalog_stamp()
+        key = (stamp, max_tokens, question)
+        cached = self._context_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        table_names = list(self.get_usable_table_names())
+        try:
+            described = self._describe_tables(table_names)
+        except ValueError as e:
+            return {"table_info": f"Error: {e}", "table_names": ", ".join(table_names)}
+
+        ranked = self._rank_tables(described, question)
+        table_info, omitted = self._fit_to_budget(ranked, max_tokens)
+        context = {"table_info": table_info, "table_names": ", ".join(table_names)}
+        if omitted:
+            context["omitted_tables"] = ", ".join(omitted)
+
+        # Only the latest catalog stamp is worth keeping.
+        self._context_cache = {
+            k: v for k, v in self._context_cache.items() if k[0] == stamp
+        }
+        self._context_cache[key] = context
+        return dict(context)
+
+    def _describe_tables(self, table_names: List[str]) -> Dict[str, str]:
+        """Describe tables concurrently, bounded by the engine's pool size."""
+
+        def describe(table: str) -> str:
+            parts = []
+            if self._customed_table_info and table in self._customed_table_info:
+                parts.append(self._customed_table_info[table])
+            table_info = self._get_table_definition(table).rstrip()
+            if self._sample_rows_in_table_info:
+                table_info += f"\n{self._get_sample_rows(table)}"
+            parts.append(table_info)
+            return "\n\n".join(parts)
+
+        if not table_names:
+            return {}
+        workers = min(self._engine.pool_size, len(table_names))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(table_names, executor.map(describe, table_names)))
+
+    @staticmethod
+    def _rank_tables(described: Dict[str, str], question: Optional[str]) -> List[Tuple[str, str]]:
+        items = list(described.items())
+        if not question:
+            return items
+        wanted = _words(question)
+
+        def score(item: Tuple[str, str]) -> Tuple[int, int]:
+            name, info = item
+            return (len(wanted & _words(name)), len(wanted & _words(info)))
+
+        return sorted(items, key=score, reverse=True)
+
+    @staticmethod
+    def _fit_to_budget(
+        ranked: List[Tuple[str, str]], max_tokens: Optional[int]
+    ) -> Tuple[str, List[str]]:
+        if max_tokens is None:
+            return "\n\n".join(info for _, info in ranked), []
+
+        kept, omitted, used = [], [], 0
+        for name, info in ranked:
+            cost = estimate_tokens(info) + 1
+            if used + cost <= max_tokens:
+                kept.append(info)
+                used += cost
+            else:
+                omitted.append(name)
+        return "\n\n".join(kept), omitted
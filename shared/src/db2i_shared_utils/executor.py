@@ -0,0 +1,337 @@
+"""Pooled SQL execution for the agents' `run_sql_statement` helpers.
+
+The example agents used to open a new mapepire connection for every tool
+call. `SQLExecutor` borrows connections from the process-wide `Db2iEngine`
+pool for the given credentials instead, and:
+
+- runs each statement in a single request that returns the first block of
+  rows together with the column metadata, rather than separate execute and
+  fetch round trips
+- can turn on IBM i extended dynamic SQL packages (opt-in, via `package` or
+  `DB2I_SQL_PACKAGE`), so a statement prepared once is stored in a
+  server-side *SQLPKG and reused by later calls, from any pooled connection,
+  instead of being prepared again
+- returns typed `SQLResult` objects and reports every statement to the
+  engine's query hooks and stats
+
+`SQLExecutor.run_many` runs the independent queries behind a composite tool
+side by side, so the tool takes as long as its slowest query rather than the
+sum of all of them.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+from mapepire_python import DaemonServer
+from pep249 import QueryParameters
+
+from db2i_shared_utils.database import (
+    DEFAULT_FETCH_BLOCK_SIZE,
+    DEFAULT_POOL_SIZE,
+    Db2iEngine,
+    QueryHook,
+    _config_key,
+)
+
+NO_RESULTS_MESSAGE = "SQL executed successfully. No results returned."
+
+# Environment variables that turn on SQL packages when `SQLExecutor` is given
+# no package. Packages create *SQLPKG objects on the server, so they are off
+# unless asked for. The toolbox driver adds a suffix for the connection
+# attributes, so agents with different settings never share a package.
+PACKAGE_ENV = "DB2I_SQL_PACKAGE"
+PACKAGE_LIBRARY_ENV = "DB2I_SQL_PACKAGE_LIBRARY"
+
+# Seconds a component of `run_many` may take before it is reported as timed out.
+DEFAULT_COMPONENT_TIMEOUT = 15.0
+
+Statement = Union[str, Tuple[str, Optional[QueryParameters]]]
+
+
+def package_options(package: str, library: Optional[str] = None) -> Dict[str, str]:
+    """Return the JDBC properties that enable extended dynamic SQL packages.
+
+    `package criteria=select` also stores SELECT statements without
+    parameter markers, which most agent catalog queries are. If the package
+    cannot be created, the driver only warns and prepares statements as usual.
+    """
+    options = {
+        "extended dynamic": "true",
+        "package": package,
+        "package cache": "true",
+        "package criteria": "select",
+    }
+    if library:
+        options["package library"] = library
+    return options
+
+
+@dataclass
+class Column:
+    """A result column as described by the server."""
+
+    name: str
+    type: str
+    label: str
+
+
+@dataclass
+class SQLResult:
+    """Rows and metadata of one executed statement."""
+
+    sql: str
+    columns: List[Column] = field(default_factory=list)
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    update_count: Optional[int] = None
+    seconds: float = 0.0
+    job: Optional[str] = None
+
+    @property
+    def has_results(self) -> bool:
+        return bool(self.columns)
+
+    def __str__(self) -> str:
+        return str(self.rows)
+
+
+class SQLExecutor:
+    """Execute statements on a shared connection pool for one set of credentials.
+
+    Use `SQLExecutor.shared(creds)` so every agent, tool and thread in the
+    process that connects with the same credentials shares one pool.
+
+    Args:
+        creds: Mapepire server credentials.
+        pool_size: Maximum number of connections lent out at a time. None
+            uses the size of an existing shared pool, or `DEFAULT_POOL_SIZE`.
+        package: SQL package for prepared statement reuse. None reads
+            `DB2I_SQL_PACKAGE`; SQL packages stay off when that is unset, and
+            an empty string turns them off regardless.
+        package_library: Library of the SQL package. None reads
+            `DB2I_SQL_PACKAGE_LIBRARY`, and the driver defaults to QGPL.
+        block_size: Rows requested per round trip.
+        dedicated: Open a private pool instead of sharing the process-wide
+            one, for callers that need their statements to stay on the same
+            server jobs.
+    """
+
+    _executors: Dict[Tuple, "SQLExecutor"] = {}
+    _executors_lock = threading.Lock()
+
+    def __init__(
+        self,
+        creds: Union[DaemonServer, Dict[str, Any]],
+        pool_size: Optional[int] = None,
+        package: Optional[str] = None,
+        package_library: Optional[str] = None,
+        block_size: int = DEFAULT_FETCH_BLOCK_SIZE,
+        dedicated: bool = False,
+    ):
+        if block_size <= 0:
+            raise ValueError("block_size must be greater than 0")
+
+        if package is None:
+            package = os.getenv(PACKAGE_ENV)
+        if package_library is None:
+            package_library = os.getenv(PACKAGE_LIBRARY_ENV)
+        jdbc_options = package_options(package, package_library) if package else None
+        if dedicated:
+            self.engine = Db2iEngine(
+                "", creds, pool_size=pool_size or DEFAULT_POOL_SIZE, jdbc_options=jdbc_options
+            )
+        else:
+            self.engine = Db2iEngine.shared(
+                "", creds, pool_size=pool_size, jdbc_options=jdbc_options
+            )
+        self.block_size = block_size
+
+    @classmethod
+    def shared(cls, creds: Union[DaemonServer, Dict[str, Any]], **kwargs: Any) -> "SQLExecutor":
+        """Return the process-wide executor for these credentials and settings."""
+        key = (_config_key(creds), _config_key(kwargs))
+        with cls._executors_lock:
+            executor = cls._executors.get(key)
+            if executor is None:
+                executor = cls._executors[key] = cls(creds, **kwargs)
+        return executor
+
+    def add_hook(self, hook: QueryHook) -> None:
+        """Register a callback that receives one timing event per statement."""
+        self.engine.add_hook(hook)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return totals of statements, errors, rows and time for this pool."""
+        return self.engine.stats()
+
+    def execute(
+        self,
+        sql: str,
+        parameters: Optional[QueryParameters] = None,
+        limit: Optional[int] = None,
+    ) -> SQLResult:
+        """Execute a statement and return all of its rows, or `limit` rows.
+
+        Raises:
+            RuntimeError: The server rejected the statement.
+        """
+        # A parameter list, even an empty one, sends the statement down the
+        # prepare-and-execute path, which is what the SQL package stores.
+        opts = {"parameters": list(parameters or [])}
+
+        start = time.perf_counter()
+        with self.engine.instrument(sql, "sync") as event, self.engine.connection() as conn:
+            with conn.job.query(sql, opts=opts) as query:
+                size = self.block_size if limit is None else min(self.block_size, limit)
+                block = query.run(rows_to_fetch=size)
+                metadata = (block.get("metadata") or {}).get("columns") or []
+                rows = list(block.get("data") or [])
+                while (
+                    metadata
+                    and not block.get("is_done", True)
+                    and block.get("data")
+                    and (limit is None or len(rows) < limit)
+                ):
+                    size = self.block_size if limit is None else min(self.block_size, limit - len(rows))
+                    block = query.fetch_more(rows_to_fetch=size)
+                    rows.extend(block.get("data") or [])
+            if limit is not None:
+                rows = rows[:limit]
+            event["rows"] = len(rows)
+            job = getattr(conn.job, "id", None)
+
+        return SQLResult(
+            sql=sql,
+            columns=[
+                Column(name=c.get("name", ""), type=c.get("type", ""), label=c.get("label", ""))
+                for c in metadata
+            ],
+            rows=rows,
+            update_count=block.get("update_count"),
+            seconds=time.perf_counter() - start,
+            job=job,
+        )
+
+    def stream(
+        self,
+        sql: str,
+        parameters: Optional[QueryParameters] = None,
+        block_size: Optional[int] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Execute a query and yield its rows one block at a time.
+
+        Only one block is held in memory. The pooled connection stays
+        borrowed until the generator is exhausted or closed.
+
+        Args:
+            sql: The query to run.
+            parameters: Optional statement parameters.
+            block_size: Rows per block. Defaults to the executor's block size.
+
+        Raises:
+            RuntimeError: The server rejected the statement.
+        """
+        opts = {"parameters": list(parameters or [])}
+        size = block_size or self.block_size
+        with self.engine.instrument(sql, "sync") as event, self.engine.connection() as conn:
+            with conn.job.query(sql, opts=opts) as query:
+                block = query.run(rows_to_fetch=size)
+                while True:
+                    rows = block.get("data") or []
+                    event["rows"] += len(rows)
+                    if rows:
+                        yield rows
+                    if block.get("is_done", True) or not rows:
+                        break
+                    block = query.fetch_more(rows_to_fetch=size)
+
+    def run(
+        self,
+        sql: str,
+        parameters: Optional[QueryParameters] = None,
+        empty_message: str = NO_RESULTS_MESSAGE,
+    ) -> str:
+        """Execute a statement and format its rows for an agent.
+
+        Returns the string form of the rows, or `empty_message` when the
+        statement has no result set.
+        """
+        result = self.execute(sql, parameters)
+        return str(result) if result.has_results else empty_message
+
+    def run_many(
+        self,
+        statements: Mapping[str, Statement],
+        timeout: Union[float, Mapping[str, float]] = DEFAULT_COMPONENT_TIMEOUT,
+        empty_message: str = NO_RESULTS_MESSAGE,
+    ) -> Dict[str, str]:
+        """Run independent statements concurrently and collect what finishes in time.
+
+        Each statement runs on its own pooled connection, so all of them start
+        at once when the pool is large enough. A statement that fails or is
+        still running when its timeout expires does not hold up the others;
+        its entry holds an error or timeout message instead of rows. A
+        timed-out statement keeps its connection until the server finishes it.
+
+        Args:
+            statements: Component name to SQL, or to (SQL, parameters).
+            timeout: Seconds allowed for every component, or per component
+                name (missing names get `DEFAULT_COMPONENT_TIMEOUT`).
+            empty_message: Returned for components with no result set.
+
+        Returns:
+            Component name to formatted result, in the order given.
+        """
+        if not statements:
+            return {}
+
+        start = time.monotonic()
+        workers = ThreadPoolExecutor(
+            max_workers=len(statements), thread_name_prefix="db2i-run-many"
+        )
+        futures = {}
+        for name, statement in statements.items():
+            sql, parameters = (statement, None) if isinstance(statement, str) else statement
+            futures[name] = workers.submit(self.run, sql, parameters, empty_message)
+        # Let stragglers finish in the background instead of blocking the caller.
+        workers.shutdown(wait=False)
+
+        results = {}
+        for name, future in futures.items():
+            limit = (
+                timeout.get(name, DEFAULT_COMPONENT_TIMEOUT)
+                if isinstance(timeout, Mapping)
+                else timeout
+            )
+            try:
+                results[name] = future.result(timeout=max(0.0, start + limit - time.monotonic()))
+            except FutureTimeoutError:
+                results[name] = f"Timed out after {limit:g}s; no data collected."
+            except Exception as e:
+                results[name] = f"Error: {e}"
+        return results
+
+
+def run_sql_statement(
+    sql: str,
+    parameters: Optional[QueryParameters] = None,
+    *,
+    creds: Union[DaemonServer, Dict[str, Any]],
+    empty_message: str = NO_RESULTS_MESSAGE,
+) -> str:
+    """Execute SQL on the shared pool for `creds` and return formatted results.
+
+    Drop-in replacement for the per-agent helpers that opened a connection
+    per call.
+
+    Args:
+        sql: SQL statement to execute
+        parameters: Optional parameters for prepared statements
+        creds: Database connection credentials
+        empty_message: Returned when the statement has no result set
+    """
+    return SQLExecutor.shared(creds).run(sql, parameters, empty_message=empty_message)
@@ -0,0 +1,216 @@
+"""Prometheus exporter for sampled metrics.
+
+`MetricsExporter` serves the latest samples of a `MetricSampler` on a local
+HTTP `/metrics` endpoint in the Prometheus text exposition format, so the same
+background sampler feeds both the agents and a monitoring stack. A scrape only
+reads the sampler's buffers; it never queries the host.
+
+Every numeric column of a metric becomes a gauge named
+`<prefix>_<metric_id>_<column>`, lower-cased. The metric's key column (e.g.
+POOL_NAME or SERVER_FUNC, see `timeseries.series_key`) becomes a label named
+after it; rows of multi-row metrics without a key are labelled by position.
+Metrics with a `rates` definition also export their latest interval rates
+under `<prefix>_<metric_id>_rate_<column>`. Per-metric sample age, duration
+and error state are exported as well.
+"""
+
+import logging
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from db2i_shared_utils.sampler import MetricSampler
+from db2i_shared_utils.timeseries import series_key
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_PORT = 9464
+
+_INVALID = re.compile(r"[^a-zA-Z0-9_]")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def metric_name(*parts: str) -> str:
+    """Join parts into a valid, lower-case Prometheus metric or label name."""
+    name = _INVALID.sub("_", "_".join(p for p in parts if p)).lower()
+    return f"_{name}" if name[:1].isdigit() else name
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value == value else "NaN"
+
+
+class _Families:
+    """Gauge families in first-seen order, each with its HELP text and samples."""
+
+    def __init__(self) -> None:
+        self.families: Dict[str, Tuple[str, List[Tuple[Labels, float]]]] = {}
+
+    def add(self, name: str, help_text: str, labels: Labels, value: float) -> None:
+        family = self.families.setdefault(name, (help_text, []))
+        family[1].append((labels, value))
+
+    def lines(self) -> Iterable[str]:
+        for name, (help_text, samples) in self.families.items():
+            yield f"# HELP {name} {_escape(help_text)}"
+            yield f"# TYPE {name} gauge"
+            for labels, value in samples:
+                yield f"{name}{_format_labels(labels)} {_format_value(value)}"
+
+
+def _add_rows(
+    families: _Families,
+    name: str,
+    help_text: str,
+    rows: List[Dict[str, Any]],
+    key_column: Optional[str],
+) -> None:
+    for i, row in enumerate(rows):
+        if key_column:
+            labels: Labels = ((metric_name(key_column), str(row.get(key_column, ""))),)
+        elif len(rows) > 1:
+            labels = (("row", str(i)),)
+        else:
+            labels = ()
+        for column, value in row.items():
+            if column != key_column and _is_number(value):
+                families.add(metric_name(name, column), f"{help_text}: {column}", labels, value)
+
+
+def render(sampler: MetricSampler, prefix: str = "ibmi") -> str:
+    """Render the latest samples of every metric in the text exposition format."""
+    families = _Families()
+    for metric_id, metric in sampler.metrics.items():
+        labels: Labels = (("metric", metric_id),)
+        history = sampler.history(metric_id)
+        if history:
+            last = history[-1]
+            families.add(
+                metric_name(prefix, "sample_error"),
+                "1 if the most recent sample of a metric failed",
+                labels,
+                0 if last.error is None else 1,
+            )
+            families.add(
+                metric_name(prefix, "sample_duration_seconds"),
+                "Seconds the most recent sample of a metric took",
+                labels,
+                last.seconds,
+            )
+
+        sample = sampler.latest(metric_id)
+        if sample is None:
+            continue
+        families.add(
+            metric_name(prefix, "sample_age_seconds"),
+            "Seconds since the latest successful sample of a metric",
+            labels,
+            sample.age,
+        )
+        title = metric.get("name", metric_id)
+        key_column = series_key(metric)
+        _add_rows(families, metric_name(prefix, metric_id), title, sample.rows, key_column)
+        if metric.get("rates"):
+            _add_rows(
+                families,
+                metric_name(prefix, metric_id, "rate"),
+                f"{title} per interval",
+                sampler.rates(metric_id),
+                key_column,
+            )
+    return "\n".join(families.lines()) + "\n"
+
+
+class MetricsExporter:
+    """Serve `render(sampler)` on `http://<host>:<port>/metrics`.
+
+    Args:
+        sampler: Sampler whose cached samples are exported. It is started
+            with the exporter so the samples stay fresh.
+        host: Interface to listen on. Defaults to localhost only.
+        port: Port to listen on; 0 picks a free one.
+        prefix: Prefix of every exported metric name.
+    """
+
+    def __init__(
+        self,
+        sampler: MetricSampler,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        prefix: str = "ibmi",
+    ):
+        self.sampler = sampler
+        self.prefix = prefix
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def _handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = render(exporter.sampler, exporter.prefix).encode("utf-8")
+                except Exception as e:
+                    logger.exception("Rendering metrics failed")
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format, *args)
+
+        return Handler
+
+    def start(self) -> "MetricsExporter":
+        """Start the sampler and serve scrapes on a background thread."""
+        self.sampler.start()
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.server.serve_forever, name="metrics-exporter", daemon=True
+            )
+            self._thread.start()
+            logger.info(f"Serving metrics on port {self.port}")
+        return self
+
+    def serve_forever(self) -> None:
+        """Start the sampler and serve scrapes on the calling thread."""
+        self.sampler.start()
+        self.server.serve_forever()
+
+    def stop(self) -> None:
+        """Stop serving. The sampler keeps running."""
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server.server_close()
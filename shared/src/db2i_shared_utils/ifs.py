@@ -0,0 +1,625 @@
+"""Chunked, locally cached reads of IFS stream files.
+
+The IFS reader agent used to check that a file exists with one query and then
+pull the whole file through QSYS2.IFS_READ as a single result for every read,
+range and search. `IFSReader` instead:
+
+- gets existence, object type, size and last change time of a path in one
+  IFS_OBJECT_STATISTICS statement
+- streams the lines of a file from IFS_READ in fixed-size chunks, so only one
+  chunk is held in memory while a large file is read
+- caches the content locally, keyed by path and data change timestamp, as a
+  UTF-8 data file with a NumPy index of line offsets, and memory-maps it
+- keeps that cache private: a per-user directory by default, created 0o700,
+  with every file written 0o600, since stream files can hold credentials
+
+Reads, line ranges and searches of an unchanged file then cost one statistics
+query instead of a full read on the host. A changed file gets a new
+timestamp, so its next read fetches the new content and drops the old entry.
+
+`CachedFile.find` searches the cached content for many literal or regex
+patterns in a single pass over the mapping and maps the hits to lines through
+the offset index, and `CachedFile.context` turns them into merged context
+windows.
+
+Growing log files are better watched with `IFSReader.tail` and
+`IFSReader.follow`, which read only the lines after the last one seen and
+hand back a continuation token instead of caching the whole file again.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db2i_shared_utils.executor import SQLExecutor
+
+logger = logging.getLogger(__name__)
+
+STAT_SQL = """
+SELECT PATH_NAME, OBJECT_TYPE, DATA_SIZE,
+       VARCHAR(DATA_CHANGE_TIMESTAMP) AS DATA_CHANGE_TIMESTAMP
+  FROM TABLE(QSYS2.IFS_OBJECT_STATISTICS(
+         START_PATH_NAME => ?,
+         SUBTREE_DIRECTORIES => 'NO'))
+ WHERE PATH_NAME = ?
+"""
+
+READ_SQL = """
+SELECT LINE_NUMBER, LINE
+  FROM TABLE(QSYS2.IFS_READ(
+         PATH_NAME => ?,
+         END_OF_LINE => 'ANY',
+         MAXIMUM_LINE_LENGTH => DEFAULT,
+         IGNORE_ERRORS => 'NO'))
+"""
+
+# Lines from the last one a tail has seen; that line is read again to see
+# whether it was still being written.
+TAIL_SQL = READ_SQL + " WHERE LINE_NUMBER >= ?\n"
+
+# Lines fetched per round trip.
+DEFAULT_CHUNK_LINES = 1000
+
+# Lines returned by one tail.
+DEFAULT_TAIL_LINES = 200
+
+# Seconds a follow collects new lines for, and between its polls.
+DEFAULT_FOLLOW_WINDOW = 10.0
+DEFAULT_FOLLOW_POLL = 1.0
+
+# Bytes of cached content kept before the least recently used files are dropped.
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+_DATA = ".dat"
+_INDEX = ".idx.npy"
+_PARTIAL = ".part"
+
+Line = Tuple[int, str]
+
+# One UTF-8 encoded character, for LIKE's `_`.
+_UTF8_CHAR = r"(?:[\x00-\x7f]|[\xc0-\xff][\x80-\xbf]+)"
+
+
+@dataclass
+class IFSFileInfo:
+    """Existence, type, size and last data change of an IFS path."""
+
+    path: str
+    exists: bool
+    object_type: Optional[str] = None
+    size: Optional[int] = None
+    changed: Optional[str] = None
+
+
+def like_pattern(text: str) -> "re.Pattern[bytes]":
+    """Compile an SQL LIKE pattern into a case-insensitive, whole-line regex.
+
+    `%` matches any run of characters and `_` any single character, as in
+    `UPPER(LINE) LIKE UPPER(?)`. The regex runs on UTF-8 bytes, so case is
+    only ignored for ASCII letters.
+    """
+    parts = []
+    for char in text:
+        if char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(_UTF8_CHAR)
+        else:
+            parts.append(re.escape(char))
+    return re.compile(("^" + "".join(parts) + "$").encode("utf-8"), re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class TailState:
+    """Where a tail of a file stopped.
+
+    Holds the last line number seen, a digest of that line, and the file's
+    size and change time when it was read.
+    """
+
+    path: str = ""
+    line: int = 0
+    size: int = 0
+    changed: Optional[str] = None
+    last: str = ""
+
+    def token(self) -> str:
+        """Encode the state as an opaque continuation token."""
+        fields = [self.path, self.line, self.size, self.changed, self.last]
+        return base64.urlsafe_b64encode(json.dumps(fields).encode("utf-8")).decode("ascii")
+
+    @classmethod
+    def from_token(cls, path: str, token: str) -> "TailState":
+        try:
+            state = cls(*json.loads(base64.urlsafe_b64decode(token.encode("ascii"))))
+        except (ValueError, TypeError):
+            raise ValueError("Invalid continuation token") from None
+        if state.path != path:
+            raise ValueError(f"The continuation token is for {state.path}, not {path}")
+        return state
+
+
+@dataclass
+class TailResult:
+    """New lines of a file and the token to continue from."""
+
+    path: str
+    lines: List[Line]
+    token: str
+    reset: bool = False
+    more: bool = False
+
+
+@dataclass
+class SearchHit:
+    """A line that matched one or more search patterns."""
+
+    line_number: int
+    line: str
+    patterns: List[str] = field(default_factory=list)
+
+
+# Backreferences and named groups change meaning once patterns are combined.
+_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P[<=]")
+
+
+def compile_patterns(
+    patterns: Sequence[str], regex: bool = False, ignore_case: bool = True
+) -> List["re.Pattern[bytes]"]:
+    """Compile literal or regex patterns for searching UTF-8 file content.
+
+    Raises:
+        ValueError: No patterns were given, or a regex is invalid.
+    """
+    if not patterns:
+        raise ValueError("At least one pattern is required")
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    compiled = []
+    for pattern in patterns:
+        source = pattern if regex else re.escape(pattern)
+        try:
+            compiled.append(re.compile(source.encode("utf-8"), flags))
+        except re.error as e:
+            raise ValueError(f"Invalid pattern {pattern!r}: {e}") from None
+    return compiled
+
+
+def default_cache_dir() -> Path:
+    """Return the per-user IFS cache directory, under `XDG_CACHE_HOME` if set."""
+    return Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "db2i" / "ifs"
+
+
+def _write_private(path: Path):
+    """Open a new file for writing that only the current user can read."""
+    return os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb")
+
+
+@dataclass
+class _FillLock:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0
+
+
+def _digest(value: str, length: int) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()[:length]
+
+
+class CachedFile:
+    """Memory-mapped lines of a cached stream file.
+
+    Line numbers are 1-based, as in IFS_READ. Use as a context manager, or
+    call `close`, to release the mapping.
+    """
+
+    def __init__(self, info: IFSFileInfo, data_path: Path, index_path: Path):
+        self.info = info
+        self.offsets = np.load(index_path)
+        self._file = open(data_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __enter__(self) -> "CachedFile":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def line(self, number: int) -> str:
+        """Return one line without its line end."""
+        start, end = self.offsets[number - 1], self.offsets[number] - 1
+        return self.data[start:end].decode("utf-8", "replace")
+
+    def lines(self, start: int = 1, end: Optional[int] = None) -> List[Line]:
+        """Return the lines from `start` to `end`, both inclusive, with their numbers."""
+        start = max(start, 1)
+        end = self.line_count if end is None else min(end, self.line_count)
+        return [(number, self.line(number)) for number in range(start, end + 1)]
+
+    def line_numbers(self, positions: np.ndarray) -> np.ndarray:
+        """Map byte positions in the data to 1-based line numbers."""
+        return np.searchsorted(self.offsets, positions, side="right")
+
+    def search(self, pattern: str) -> List[Line]:
+        """Return the lines matching an SQL LIKE pattern, ignoring case."""
+        regex = like_pattern(pattern)
+        starts = np.fromiter((m.start() for m in regex.finditer(self.data)), dtype=np.int64)
+        numbers = np.unique(self.line_numbers(starts))
+        # A pattern that matches the empty string also matches after the last line end.
+        numbers = numbers[numbers <= self.line_count]
+        return [(int(number), self.line(int(number))) for number in numbers]
+
+    def find(
+        self,
+        patterns: Sequence[str],
+        regex: bool = False,
+        ignore_case: bool = True,
+        limit: Optional[int] = None,
+    ) -> List[SearchHit]:
+        """Return the lines matching any of several patterns, in one pass.
+
+        The patterns are combined into a single alternation that is searched
+        once over the mapped content; after a hit the search resumes at the
+        next line, so the cost depends on the file size and the number of
+        matching lines rather than on the number of patterns.
+
+        Args:
+            patterns: Literal strings, or regular expressions with `regex`.
+                `^` and `$` anchor at line boundaries.
+            regex: Treat the patterns as regular expressions.
+            ignore_case: Ignore the case of ASCII letters.
+            limit: Stop after this many matching lines.
+
+        Returns:
+            The matching lines in file order, each with the patterns that
+            match it.
+
+        Raises:
+            ValueError: No patterns were given, or a regex is invalid.
+        """
+        compiled = compile_patterns(patterns, regex, ignore_case)
+        if len(compiled) == 1 or not any(_GROUP_REFERENCE.search(p) for p in patterns if regex):
+            combined = re.compile(b"|".join(b"(?:" + c.pattern + b")" for c in compiled), compiled[0].flags)
+            numbers = self._scan(combined, limit)
+        else:
+            numbers = sorted(set().union(*(self._scan(c, limit) for c in compiled)))[:limit]
+
+        hits = []
+        for number in numbers:
+            start, end = int(self.offsets[number - 1]), int(self.offsets[number])
+            text = self.data[start : end - 1]
+            matched = [source for source, c in zip(patterns, compiled) if c.search(text)]
+            if not matched:
+                # A regex that spans lines only matches against the whole content.
+                matched = [
+                    source
+                    for source, c in zip(patterns, compiled)
+                    if (m := c.search(self.data, start)) is not None and m.start() < end
+                ]
+            hits.append(SearchHit(number, text.decode("utf-8", "replace"), matched))
+        return hits
+
+    def _scan(self, pattern: "re.Pattern[bytes]", limit: Optional[int]) -> List[int]:
+        """Return the numbers of the lines a pattern first matches in, once per line."""
+        numbers: List[int] = []
+        position, end = 0, int(self.offsets[-1])
+        while position < end and (limit is None or len(numbers) < limit):
+            match = pattern.search(self.data, position)
+            if match is None:
+                break
+            number = int(self.line_numbers(match.start()))
+            if number > self.line_count:
+                break
+            numbers.append(number)
+            position = int(self.offsets[number])
+        return numbers
+
+    def context(self, numbers: Sequence[int], before: int = 2, after: int = 2) -> List[Tuple[int, int]]:
+        """Return the first and last line of the context windows around some lines.
+
+        Windows that overlap or touch are merged.
+        """
+        if not len(numbers):
+            return []
+        numbers = np.unique(np.asarray(numbers, dtype=np.int64))
+        starts = np.maximum(numbers - before, 1)
+        ends = np.minimum(numbers + after, self.line_count)
+        # Sorted equal-width windows: a window opens a new block when it starts
+        # after the end of the previous one.
+        new_block = np.concatenate(([True], starts[1:] > ends[:-1] + 1))
+        block_ends = np.concatenate((np.flatnonzero(new_block)[1:] - 1, [len(numbers) - 1]))
+        return list(zip(starts[new_block].tolist(), ends[block_ends].tolist()))
+
+
+class IFSReader:
+    """Read IFS stream files in chunks through a local content cache.
+
+    Args:
+        executor: Executor the statistics and read queries run on.
+        cache_dir: Directory the cached content is written to, by default
+            `default_cache_dir()`. The reader owns it: it is made private to
+            the current user and cached files in it are evicted.
+        chunk_lines: Lines fetched per round trip.
+        max_cache_bytes: Cached bytes kept before the least recently used
+            files are evicted.
+    """
+
+    def __init__(
+        self,
+        executor: SQLExecutor,
+        cache_dir: Optional[str] = None,
+        chunk_lines: int = DEFAULT_CHUNK_LINES,
+        max_cache_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    ):
+        if chunk_lines <= 0:
+            raise ValueError("chunk_lines must be greater than 0")
+
+        self.executor = executor
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.chunk_lines = chunk_lines
+        self.max_cache_bytes = max_cache_bytes
+        self._lock = threading.Lock()
+        self._fill_locks: Dict[str, _FillLock] = {}
+        self._tails: Dict[str, TailState] = {}
+
+    def stat(self, path: str) -> IFSFileInfo:
+        """Return whether a path exists, its object type, size and last data change."""
+        rows = self.executor.execute(STAT_SQL, [path, path]).rows
+        if not rows:
+            return IFSFileInfo(path, exists=False)
+        row = rows[0]
+        return IFSFileInfo(
+            path,
+            exists=True,
+            object_type=row.get("OBJECT_TYPE"),
+            size=row.get("DATA_SIZE"),
+            changed=row.get("DATA_CHANGE_TIMESTAMP"),
+        )
+
+    def iter_chunks(self, path: str) -> Iterator[List[Line]]:
+        """Stream the lines of a file from the host, `chunk_lines` at a time."""
+        for rows in self.executor.stream(READ_SQL, [path], block_size=self.chunk_lines):
+            yield [(row.get("LINE_NUMBER"), row.get("LINE") or "") for row in rows]
+
+    def open(self, path: str) -> CachedFile:
+        """Return the cached content of a stream file, reading it from the host if needed.
+
+        Raises:
+            FileNotFoundError: The path does not exist.
+            ValueError: The path is not a stream file.
+        """
+        return self._open(self._stat_file(path))
+
+    def _stat_file(self, path: str) -> IFSFileInfo:
+        info = self.stat(path)
+        if not info.exists:
+            raise FileNotFoundError(f"File {path} does not exist.")
+        if info.object_type != "*STMF":
+            raise ValueError(f"{path} is a {info.object_type}, not a stream file.")
+        return info
+
+    @contextmanager
+    def _filling(self, name: str, blocking: bool = True) -> Iterator[bool]:
+        """Hold the fill lock of a cached version, yielding whether it was acquired.
+
+        Entries are dropped once no thread uses them, so the lock table does
+        not grow with every file version ever read.
+        """
+        with self._lock:
+            entry = self._fill_locks.setdefault(name, _FillLock())
+            entry.users += 1
+        acquired = entry.lock.acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                entry.lock.release()
+            with self._lock:
+                entry.users -= 1
+                if not entry.users:
+                    del self._fill_locks[name]
+
+    def _open(self, info: IFSFileInfo) -> CachedFile:
+        path = info.path
+        # DATA_CHANGE_TIMESTAMP can repeat within its resolution, so a file
+        # rewritten in place to a different size is a new version too.
+        name = f"{_digest(path, 16)}-{_digest(f'{info.changed}/{info.size}', 12)}"
+        data_path = self.cache_dir / (name + _DATA)
+        index_path = self.cache_dir / (name + _INDEX)
+        # Held until the file is mapped, so it cannot be evicted in between.
+        with self._filling(name):
+            if data_path.exists():
+                os.utime(data_path)
+            else:
+                self._fill(path, data_path, index_path)
+                self._drop_stale(path, name)
+                self._evict(keep=name)
+            return CachedFile(info, data_path, index_path)
+
+    def tail(
+        self,
+        path: str,
+        since: Optional[str] = None,
+        max_lines: int = DEFAULT_TAIL_LINES,
+    ) -> TailResult:
+        """Return the lines added to a file since a continuation token.
+
+        Without a token the reader continues from where the last `tail` of
+        the path stopped, or, the first time, returns the last `max_lines`
+        lines of the file. Only lines after the last one seen are read from
+        the host, and nothing is read while the file's size and change time
+        are unchanged.
+
+        The last line seen is read again to tell whether it was still being
+        written; if it has grown it is returned again. A file that shrank is
+        assumed to be truncated or replaced and is read from the start.
+
+        Args:
+            path: Full path of the stream file.
+            since: Token from a previous result.
+            max_lines: Most lines to return; `more` is set when lines remain.
+
+        Raises:
+            FileNotFoundError: The path does not exist.
+            ValueError: The path is not a stream file, or the token is invalid
+                or belongs to another path.
+        """
+        if max_lines <= 0:
+            raise ValueError("max_lines must be greater than 0")
+        if since is not None:
+            state = TailState.from_token(path, since)
+        else:
+            with self._lock:
+                state = self._tails.get(path)
+        info = self._stat_file(path)
+
+        reset = False
+        if state is None:
+            with self._open(info) as f:
+                lines = f.lines(max(f.line_count - max_lines + 1, 1))
+            state, more = TailState(), False
+        elif info.size is not None and info.size < state.size:
+            reset = True
+            state = TailState()
+            lines, more = self._read_after(path, state, max_lines)
+        elif info.size == state.size and info.changed == state.changed:
+            lines, more = [], False
+        else:
+            lines, more = self._read_after(path, state, max_lines)
+
+        if lines:
+            state = TailState(path, lines[-1][0], 0, None, _digest(lines[-1][1], 8))
+        state = TailState(path, state.line, info.size or 0, None if more else info.changed, state.last)
+        with self._lock:
+            self._tails[path] = state
+        return TailResult(path, lines, state.token(), reset, more)
+
+    def _read_after(self, path: str, state: TailState, max_lines: int) -> Tuple[List[Line], bool]:
+        """Read the lines after the last one seen, and that one again if it grew."""
+        lines: List[Line] = []
+        block_size = min(self.chunk_lines, max_lines + 1)
+        with closing(self.executor.stream(TAIL_SQL, [path, max(state.line, 1)], block_size=block_size)) as blocks:
+            for rows in blocks:
+                for row in rows:
+                    number, text = row.get("LINE_NUMBER"), row.get("LINE") or ""
+                    if number == state.line and _digest(text, 8) == state.last:
+                        continue
+                    if len(lines) == max_lines:
+                        return lines, True
+                    lines.append((number, text))
+        return lines, False
+
+    def follow(
+        self,
+        path: str,
+        since: Optional[str] = None,
+        window: float = DEFAULT_FOLLOW_WINDOW,
+        poll: float = DEFAULT_FOLLOW_POLL,
+        max_lines: int = DEFAULT_TAIL_LINES,
+    ) -> TailResult:
+        """Collect the lines added to a file over a short window.
+
+        Tails the file every `poll` seconds until `window` seconds have passed
+        or `max_lines` lines were collected, and returns them as one batch
+        with the token to continue from. Takes the arguments of `tail`.
+        """
+        deadline = time.monotonic() + window
+        result = self.tail(path, since, max_lines)
+        lines, reset = list(result.lines), result.reset
+        while not result.more and len(lines) < max_lines and time.monotonic() + poll <= deadline:
+            time.sleep(poll)
+            result = self.tail(path, result.token, max_lines - len(lines))
+            reset = reset or result.reset
+            for number, text in result.lines:
+                # A line that grew since the last poll replaces its earlier version.
+                if lines and lines[-1][0] == number:
+                    lines[-1] = (number, text)
+                else:
+                    lines.append((number, text))
+        return TailResult(path, lines, result.token, reset, result.more)
+
+    def _fill(self, path: str, data_path: Path, index_path: Path) -> None:
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # mkdir leaves an existing directory's mode alone
+        os.chmod(self.cache_dir, 0o700)
+        partial_data = data_path.with_name(data_path.name + _PARTIAL)
+        partial_index = index_path.with_name(index_path.name + _PARTIAL)
+        offsets = [np.zeros(1, dtype=np.int64)]
+        end = 0
+        with _write_private(partial_data) as f:
+            for chunk in self.iter_chunks(path):
+                encoded = [line.encode("utf-8") + b"\n" for _, line in chunk]
+                lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+                offsets.append(end + np.cumsum(lengths))
+                end += int(lengths.sum())
+                f.write(b"".join(encoded))
+        with _write_private(partial_index) as f:
+            np.save(f, np.concatenate(offsets))
+        # The data file appears last, so a reader that finds it also finds the index.
+        os.replace(partial_index, index_path)
+        os.replace(partial_data, data_path)
+
+    def _drop_stale(self, path: str, keep: str) -> None:
+        """Remove cached versions of a path that have since changed on the host."""
+        for stale in self.cache_dir.glob(f"{_digest(path, 16)}-*{_DATA}"):
+            if stale.name != keep + _DATA:
+                self._remove(stale.name[: -len(_DATA)])
+
+    def _remove(self, name: str) -> bool:
+        """Delete a cached version unless another thread is opening it right now."""
+        with self._filling(name, blocking=False) as acquired:
+            if not acquired:
+                return False
+            (self.cache_dir / (name + _DATA)).unlink(missing_ok=True)
+            (self.cache_dir / (name + _INDEX)).unlink(missing_ok=True)
+        return True
+
+    def clear(self) -> None:
+        """Delete every cached file that no thread is opening right now.
+
+        Files already mapped by an open `CachedFile` stay readable until it
+        is closed.
+        """
+        if not self.cache_dir.is_dir():
+            return
+        for data_path in self.cache_dir.glob(f"*{_DATA}"):
+            self._remove(data_path.name[: -len(_DATA)])
+
+    def _evict(self, keep: str) -> None:
+        """Drop the least recently read files until the cache fits its budget."""
+        entries = []
+        for data_path in self.cache_dir.glob(f"*{_DATA}"):
+            name = data_path.name[: -len(_DATA)]
+            try:
+                stat = data_path.stat()
+                size = stat.st_size + (self.cache_dir / (name + _INDEX)).stat().st_size
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, name, size))
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            if name != keep and self._remove(name):
+                logger.debug(f"Evicted cached IFS file {name}")
+                total -= size
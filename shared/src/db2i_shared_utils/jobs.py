@@ -0,0 +1,190 @@
+"""Throttled, shared snapshots of QSYS2.ACTIVE_JOB_INFO.
+
+ACTIVE_JOB_INFO visits every active job and is one of the most expensive
+services on a busy system. Several agents asking for the top CPU jobs within
+seconds of each other should not each pay for a scan. `JobSnapshotService`
+takes at most one snapshot per filter set and window:
+
+- the table function runs with DETAILED_INFO => 'NONE' and only the columns
+  the agents use, and subsystem, job name and user filters are applied by the
+  service on the server
+- callers that arrive while a snapshot is being fetched wait for that fetch
+  instead of starting another one
+- top-N and other views are computed locally from the cached rows
+
+A failed fetch is also kept for the window, so a struggling host is not
+retried by every caller.
+"""
+
+import heapq
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from db2i_shared_utils.executor import SQLExecutor
+
+# Seconds a snapshot is reused for.
+DEFAULT_SNAPSHOT_WINDOW = 30.0
+
+# Columns available at DETAILED_INFO => 'NONE' that the agents use.
+DEFAULT_COLUMNS = (
+    "JOB_NAME",
+    "SUBSYSTEM",
+    "AUTHORIZATION_NAME",
+    "JOB_TYPE",
+    "FUNCTION_TYPE",
+    "FUNCTION",
+    "JOB_STATUS",
+    "MEMORY_POOL",
+    "THREAD_COUNT",
+    "TEMPORARY_STORAGE",
+    "CPU_TIME",
+    "TOTAL_DISK_IO_COUNT",
+    "ELAPSED_CPU_PERCENTAGE",
+    "ELAPSED_CPU_TIME",
+    "ELAPSED_TOTAL_DISK_IO_COUNT",
+    "ELAPSED_PAGE_FAULT_COUNT",
+)
+
+Filters = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def _normalize(value: Optional[Any]) -> Optional[str]:
+    """Turn a filter given as a string or a sequence into the service's list syntax."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = ",".join(value)
+    return ",".join(part.strip().upper() for part in value.split(",") if part.strip()) or None
+
+
+@dataclass
+class JobSnapshot:
+    """The active jobs matching one set of filters at one point in time."""
+
+    filters: Filters
+    taken_at: float
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was taken."""
+        return time.time() - self.taken_at
+
+    def top(self, n: int = 10, by: str = "CPU_TIME") -> List[Dict[str, Any]]:
+        """Return the `n` jobs with the highest value of a numeric column."""
+        return heapq.nlargest(n, self.rows, key=lambda row: row.get(by) or 0)
+
+
+def snapshot_sql(
+    columns: Sequence[str],
+    filters: Filters,
+    detailed_info: str = "NONE",
+) -> Tuple[str, List[str]]:
+    """Build the ACTIVE_JOB_INFO query and parameters for a set of filters."""
+    arguments = [f"DETAILED_INFO => '{detailed_info}'"]
+    parameters = []
+    for name, value in zip(
+        ("SUBSYSTEM_LIST_FILTER", "JOB_NAME_FILTER", "CURRENT_USER_LIST_FILTER"), filters
+    ):
+        if value is not None:
+            arguments.append(f"{name} => ?")
+            parameters.append(value)
+    sql = (
+        f"SELECT {', '.join(columns)} "
+        f"FROM TABLE(QSYS2.ACTIVE_JOB_INFO({', '.join(arguments)})) A"
+    )
+    return sql, parameters
+
+
+class JobSnapshotService:
+    """Serve ACTIVE_JOB_INFO snapshots, at most one per filter set per window.
+
+    Use `JobSnapshotService.shared(executor)` so every agent and tool in the
+    process that uses the same executor shares the snapshots.
+
+    Args:
+        executor: Executor the snapshots are taken on.
+        window: Seconds a snapshot, or a failed attempt, is reused for.
+        columns: Columns to fetch.
+        detailed_info: DETAILED_INFO level of the table function.
+    """
+
+    _services: Dict[int, "JobSnapshotService"] = {}
+    _services_lock = threading.Lock()
+
+    def __init__(
+        self,
+        executor: SQLExecutor,
+        window: float = DEFAULT_SNAPSHOT_WINDOW,
+        columns: Sequence[str] = DEFAULT_COLUMNS,
+        detailed_info: str = "NONE",
+    ):
+        self.executor = executor
+        self.window = window
+        self.columns = tuple(columns)
+        self.detailed_info = detailed_info
+        self._lock = threading.Lock()
+        # Filters -> (time the fetch started, future of the snapshot)
+        self._snapshots: Dict[Filters, Tuple[float, "Future[JobSnapshot]"]] = {}
+
+    @classmethod
+    def shared(cls, executor: SQLExecutor, **kwargs: Any) -> "JobSnapshotService":
+        """Return the process-wide service for an executor.
+
+        The settings of the first call win.
+        """
+        with cls._services_lock:
+            service = cls._services.get(id(executor))
+            if service is None:
+                service = cls._services[id(executor)] = cls(executor, **kwargs)
+        return service
+
+    def snapshot(
+        self,
+        subsystems: Optional[Any] = None,
+        job_name: Optional[str] = None,
+        users: Optional[Any] = None,
+    ) -> JobSnapshot:
+        """Return a snapshot of the matching jobs no older than the window.
+
+        Args:
+            subsystems: Subsystem names, as a list or comma separated string.
+            job_name: Job name filter, e.g. `QZDASOINIT` or `*ALL`.
+            users: Current user profiles, as a list or comma separated string.
+
+        Raises:
+            Exception: The fetch failed, now or within the window.
+        """
+        filters: Filters = (_normalize(subsystems), _normalize(job_name), _normalize(users))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._snapshots.get(filters)
+            owner = entry is None or (entry[1].done() and now - entry[0] >= self.window)
+            if owner:
+                entry = (now, Future())
+                self._snapshots[filters] = entry
+        future = entry[1]
+        if owner:
+            self._fetch(filters, future)
+        return future.result()
+
+    def _fetch(self, filters: Filters, future: "Future[JobSnapshot]") -> None:
+        sql, parameters = snapshot_sql(self.columns, filters, self.detailed_info)
+        taken_at = time.time()
+        try:
+            result = self.executor.execute(sql, parameters)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(JobSnapshot(filters, taken_at, result.rows, result.seconds))
+
+    def top(self, n: int = 10, by: str = "CPU_TIME", **filters: Any) -> List[Dict[str, Any]]:
+        """Return the top `n` jobs by a numeric column from the cached snapshot.
+
+        Takes the filters of `snapshot`.
+        """
+        return self.snapshot(**filters).top(n, by)
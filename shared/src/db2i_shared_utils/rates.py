@@ -0,0 +1,143 @@
+"""Per-interval deltas and rates from metric samples taken without resetting.
+
+IBM i services such as `QSYS2.SYSTEM_STATUS` and `QSYS2.MEMORY_POOL` can reset
+their statistics on every call, but the reset applies to every later reader of
+the same job and makes concurrent pollers clobber each other. The samplers
+therefore query with `RESET_STATISTICS=>'NO'`: the ELAPSED_* columns then grow
+from the job's baseline, and the activity in an interval is the difference
+between two consecutive samples taken on the same job.
+
+A metric opts in with a `rates` entry in its catalog definition:
+
+    "rates": {
+        "key": "POOL_NAME",                     # row identity of multi-row metrics
+        "counters": ["ELAPSED_TOTAL_FAULTS"],   # counts -> <COLUMN>_PER_SECOND
+        "elapsed": "ELAPSED_TIME",              # seconds since the baseline
+        "averages": ["ELAPSED_CPU_USED"],       # averages over `elapsed` -> interval average
+    }
+
+Without `elapsed`, interval lengths come from the sample timestamps.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class RateSpec:
+    """Which columns of a metric are counters, averages and its clock."""
+
+    counters: Sequence[str] = ()
+    averages: Sequence[str] = ()
+    elapsed: Optional[str] = None
+    key: Optional[str] = None
+
+    @classmethod
+    def from_metric(cls, metric: Mapping[str, Any]) -> Optional["RateSpec"]:
+        """Build the spec of a catalog entry, or None if it has no `rates`."""
+        rates = metric.get("rates")
+        if not rates:
+            return None
+        return cls(
+            counters=tuple(rates.get("counters", ())),
+            averages=tuple(rates.get("averages", ())),
+            elapsed=rates.get("elapsed"),
+            key=rates.get("key"),
+        )
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _to_matrix(samples: Sequence[Any], columns: Sequence[str], key: Optional[str]):
+    """Arrange sample rows as a (samples, keys, columns) float array."""
+    keys: Dict[Any, int] = {}
+    for sample in samples:
+        for row in sample.rows:
+            keys.setdefault(row.get(key) if key else None, len(keys))
+
+    values = np.full((len(samples), max(len(keys), 1), len(columns)), np.nan)
+    for i, sample in enumerate(samples):
+        for row in sample.rows:
+            j = keys[row.get(key) if key else None]
+            values[i, j] = [_number(row.get(column)) for column in columns]
+    return list(keys) or [None], values
+
+
+def interval_rates(samples: Sequence[Any], spec: RateSpec) -> List[Dict[str, Any]]:
+    """Compute deltas and rates between consecutive samples.
+
+    Args:
+        samples: Successful samples of one metric, oldest first. Each needs
+            `rows`, `taken_at` and `job` attributes.
+        spec: The metric's counters, averages, clock and row key.
+
+    Returns:
+        One row per interval and key, oldest interval first, with
+        INTERVAL_END, INTERVAL_SECONDS, the key column, `<COUNTER>_DELTA` and
+        `<COUNTER>_PER_SECOND` for each counter and the interval value of each
+        average. Values that cannot be computed are None: intervals that span
+        a change of server job (a new baseline), counters that went backwards
+        and rows missing from either sample.
+    """
+    if len(samples) < 2:
+        return []
+
+    columns = list(spec.counters) + list(spec.averages)
+    if spec.elapsed:
+        columns.append(spec.elapsed)
+    keys, values = _to_matrix(samples, columns, spec.key)
+    n_counters, n_averages = len(spec.counters), len(spec.averages)
+
+    if spec.elapsed:
+        clock = values[:, :, -1]
+    else:
+        taken_at = np.array([sample.taken_at for sample in samples], dtype=float)
+        clock = np.broadcast_to(taken_at[:, None], values.shape[:2])
+    seconds = np.diff(clock, axis=0)
+
+    jobs = [sample.job for sample in samples]
+    same_job = np.array([a == b for a, b in zip(jobs[:-1], jobs[1:])])
+    valid = same_job[:, None] & (seconds > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        counters = values[:, :, :n_counters]
+        deltas = np.diff(counters, axis=0)
+        deltas[deltas < 0] = np.nan
+        deltas[~valid] = np.nan
+        per_second = deltas / seconds[:, :, None]
+
+        averages = values[:, :, n_counters : n_counters + n_averages]
+        if spec.elapsed and n_averages:
+            weighted = averages * clock[:, :, None]
+            interval_averages = np.diff(weighted, axis=0) / seconds[:, :, None]
+            interval_averages[~valid] = np.nan
+        else:
+            interval_averages = averages[1:]
+
+    seconds = np.where(valid, seconds, np.nan)
+    rows = []
+    for i, sample in enumerate(samples[1:]):
+        end = datetime.fromtimestamp(sample.taken_at, tz=timezone.utc).isoformat()
+        for j, key in enumerate(keys):
+            row: Dict[str, Any] = {"INTERVAL_END": end, "INTERVAL_SECONDS": _value(seconds[i, j])}
+            if spec.key:
+                row[spec.key] = key
+            for c, column in enumerate(spec.counters):
+                row[f"{column}_DELTA"] = _value(deltas[i, j, c])
+                row[f"{column}_PER_SECOND"] = _value(per_second[i, j, c])
+            for a, column in enumerate(spec.averages):
+                row[column] = _value(interval_averages[i, j, a])
+            rows.append(row)
+    return rows
+
+
+def _value(number: float) -> Optional[float]:
+    return None if np.isnan(number) else round(float(number), 4)
@@ -0,0 +1,216 @@
+"""Background sampling of performance metric queries.
+
+Metric catalogs such as `performance_metrics` in the performance agents give
+every metric an SQL statement and an `interval` in seconds. `MetricSampler`
+polls each metric at its interval on a background thread and keeps a bounded
+ring buffer of samples per metric, so tools can answer from the latest sample
+instead of querying the host on every call, and the load the agents put on the
+host depends on the intervals rather than on how chatty the model is.
+
+Metrics with a `rates` entry also get per-interval deltas and rates computed
+from consecutive samples; see `db2i_shared_utils.rates`.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from textwrap import dedent
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional
+
+from db2i_shared_utils.executor import SQLExecutor
+from db2i_shared_utils.rates import RateSpec, interval_rates
+
+logger = logging.getLogger(__name__)
+
+# A sample older than its interval times this factor is stale.
+STALE_FACTOR = 1.5
+
+# Metrics are never polled more often than this, whatever their interval says.
+MIN_INTERVAL = 5.0
+
+SampleHook = Callable[["Sample"], None]
+
+
+@dataclass
+class Sample:
+    """One execution of a metric query."""
+
+    metric_id: str
+    taken_at: float
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    seconds: float = 0.0
+    error: Optional[str] = None
+    job: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        """Seconds since the sample was taken."""
+        return time.time() - self.taken_at
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"Error: {self.error}"
+        return f"Sampled {self.age:.0f}s ago:\n{self.rows}"
+
+
+class MetricSampler:
+    """Poll metric queries at their declared intervals into ring buffers.
+
+    Args:
+        executor: Executor the metric queries run on.
+        metrics: Metric id to a definition with `sql` and `interval` keys.
+            Metrics without an interval, or that take `parameters`, are only
+            sampled on demand.
+        history: Samples kept per metric.
+        max_workers: Metric queries run at the same time.
+    """
+
+    def __init__(
+        self,
+        executor: SQLExecutor,
+        metrics: Mapping[str, Mapping[str, Any]],
+        history: int = 60,
+        max_workers: int = 2,
+    ):
+        if history <= 0:
+            raise ValueError("history must be greater than 0")
+
+        self.executor = executor
+        self.metrics = dict(metrics)
+        self._buffers: Dict[str, Deque[Sample]] = {
+            metric_id: deque(maxlen=history) for metric_id in self.metrics
+        }
+        self._lock = threading.Lock()
+        self._in_flight: set = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._workers: Optional[ThreadPoolExecutor] = None
+        self._max_workers = max_workers
+        self._hooks: List[SampleHook] = []
+
+    def add_hook(self, hook: SampleHook) -> None:
+        """Register a callback that receives every sample as it is recorded."""
+        self._hooks.append(hook)
+
+    def interval(self, metric_id: str) -> Optional[float]:
+        """Return the polling interval of a metric, or None if it is not polled."""
+        metric = self.metrics[metric_id]
+        if not metric.get("interval") or metric.get("parameters"):
+            return None
+        return max(float(metric["interval"]), MIN_INTERVAL)
+
+    def start(self) -> None:
+        """Start the background thread. Calling it again is a no-op."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._workers = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="metric-sampler"
+            )
+            self._thread = threading.Thread(
+                target=self._run, name="metric-sampler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop polling. Samples already collected are kept."""
+        self._stop.set()
+        thread, workers = self._thread, self._workers
+        if thread is not None and wait:
+            thread.join()
+        if workers is not None:
+            workers.shutdown(wait=wait)
+
+    def _run(self) -> None:
+        now = time.monotonic()
+        due = [
+            (now, metric_id)
+            for metric_id in self.metrics
+            if self.interval(metric_id) is not None
+        ]
+        heapq.heapify(due)
+        while due and not self._stop.is_set():
+            next_at, metric_id = due[0]
+            if self._stop.wait(max(0.0, next_at - time.monotonic())):
+                break
+            heapq.heapreplace(due, (next_at + self.interval(metric_id), metric_id))
+            with self._lock:
+                if metric_id in self._in_flight:
+                    # The previous poll is still running; skip this one.
+                    continue
+                self._in_flight.add(metric_id)
+            self._workers.submit(self._poll, metric_id)
+
+    def _poll(self, metric_id: str) -> None:
+        try:
+            self.sample(metric_id)
+        finally:
+            with self._lock:
+                self._in_flight.discard(metric_id)
+
+    def sample(self, metric_id: str) -> Sample:
+        """Query a metric now and record the sample."""
+        taken_at = time.time()
+        try:
+            result = self.executor.execute(dedent(self.metrics[metric_id]["sql"]))
+            sample = Sample(metric_id, taken_at, result.rows, result.seconds, job=result.job)
+        except Exception as e:
+            logger.warning(f"Sampling {metric_id} failed: {e}")
+            sample = Sample(metric_id, taken_at, seconds=time.time() - taken_at, error=str(e))
+        with self._lock:
+            self._buffers[metric_id].append(sample)
+        for hook in self._hooks:
+            try:
+                hook(sample)
+            except Exception as e:
+                logger.warning(f"Sample hook failed for {metric_id}: {e}")
+        return sample
+
+    def latest(self, metric_id: str) -> Optional[Sample]:
+        """Return the most recent successful sample of a metric, if any."""
+        with self._lock:
+            for sample in reversed(self._buffers[metric_id]):
+                if sample.error is None:
+                    return sample
+        return None
+
+    def history(self, metric_id: str) -> List[Sample]:
+        """Return the buffered samples of a metric, oldest first."""
+        with self._lock:
+            return list(self._buffers[metric_id])
+
+    def is_stale(self, sample: Sample) -> bool:
+        """Whether a sample is too old to answer from."""
+        interval = self.interval(sample.metric_id)
+        return interval is None or sample.age > interval * STALE_FACTOR
+
+    def get(self, metric_id: str) -> Sample:
+        """Return the latest sample, querying live when it is missing or stale."""
+        sample = self.latest(metric_id)
+        if sample is None or self.is_stale(sample):
+            sample = self.sample(metric_id)
+        return sample
+
+    def rates(self, metric_id: str, intervals: int = 1) -> List[Dict[str, Any]]:
+        """Return deltas and rates over the last `intervals` sampling intervals.
+
+        The metric needs a `rates` entry in its definition. Fewer rows are
+        returned while the sampler is still collecting its first samples.
+
+        Raises:
+            ValueError: The metric has no `rates` entry.
+        """
+        spec = RateSpec.from_metric(self.metrics[metric_id])
+        if spec is None:
+            raise ValueError(f"Metric {metric_id} has no rate definition")
+        with self._lock:
+            samples = [s for s in self._buffers[metric_id] if s.error is None]
+        samples = samples[-(intervals + 1):]
+        rows = interval_rates(samples, spec)
+        per_interval = max(len(rows) // max(len(samples) - 1, 1), 1)
+        return rows[-intervals * per_interval:]
@@ -0,0 +1,254 @@
+"""Named metric snapshots and row-level diffs between them.
+
+Answering "what changed since this morning?" by handing the model two full
+metric dumps is slow and wastes tokens. `SnapshotStore` keeps named snapshots
+of any set of metrics as JSON files, and `diff_snapshots` compares two of
+them row by row so only the differences reach the model:
+
+- rows are matched on the metric's key column (see `timeseries.series_key`),
+  or by position for multi-row metrics without one
+- rows present in only one snapshot are reported as added or removed
+- changed numeric columns report before, after, delta and relative change,
+  and changes smaller than the threshold are dropped
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from db2i_shared_utils.timeseries import series_key
+
+# Relative change below which a numeric column counts as unchanged.
+DEFAULT_THRESHOLD = 0.05
+
+_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+@dataclass
+class MetricSnapshot:
+    """The rows of a set of metrics saved under a name."""
+
+    name: str
+    taken_at: float
+    metrics: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _keyed(rows: List[Dict[str, Any]], key_column: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    if key_column:
+        return {str(row.get(key_column, "")): row for row in rows}
+    if len(rows) == 1:
+        return {"": rows[0]}
+    return {str(i): row for i, row in enumerate(rows)}
+
+
+def _column_change(before: Any, after: Any, threshold: float) -> Optional[Dict[str, Any]]:
+    if before == after:
+        return None
+    if _is_number(before) and _is_number(after):
+        delta = after - before
+        relative = delta / abs(before) if before else None
+        if relative is not None and abs(relative) < threshold:
+            return None
+        change = {"BEFORE": before, "AFTER": after, "DELTA": round(delta, 6)}
+        if relative is not None:
+            change["PCT"] = round(relative * 100, 1)
+        return change
+    return {"BEFORE": before, "AFTER": after}
+
+
+def diff_rows(
+    before: List[Dict[str, Any]],
+    after: List[Dict[str, Any]],
+    key_column: Optional[str] = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    ignore: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """Compare two row lists of one metric.
+
+    Args:
+        before: Rows of the older snapshot.
+        after: Rows of the newer snapshot.
+        key_column: Column that identifies a row; rows are matched by
+            position without one.
+        threshold: Smallest relative change of a numeric column to report,
+            e.g. 0.05 for 5%. Changes from zero are always reported.
+        ignore: Columns to leave out of the comparison.
+
+    Returns:
+        ADDED and REMOVED rows, CHANGED rows with the key and the changed
+        columns, and the number of UNCHANGED rows. Empty lists are omitted.
+    """
+    ignored = set(ignore)
+    old, new = _keyed(before, key_column), _keyed(after, key_column)
+    changed = []
+    for key in old.keys() & new.keys():
+        columns = {}
+        for column in old[key].keys() | new[key].keys():
+            if column == key_column or column in ignored:
+                continue
+            change = _column_change(old[key].get(column), new[key].get(column), threshold)
+            if change is not None:
+                columns[column] = change
+        if columns:
+            changed.append({"KEY": key, "CHANGES": dict(sorted(columns.items()))})
+
+    result: Dict[str, Any] = {
+        "ADDED": [new[key] for key in new.keys() - old.keys()],
+        "REMOVED": [old[key] for key in old.keys() - new.keys()],
+        "CHANGED": sorted(changed, key=lambda row: row["KEY"]),
+    }
+    result = {name: rows for name, rows in result.items() if rows}
+    result["UNCHANGED"] = len(old.keys() & new.keys()) - len(changed)
+    return result
+
+
+def diff_snapshots(
+    a: MetricSnapshot,
+    b: MetricSnapshot,
+    metrics: Mapping[str, Mapping[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+    ignore: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """Compare every metric two snapshots have in common.
+
+    Only metrics with differences are included. Metrics saved in only one
+    of the snapshots are listed under ONLY_IN_FROM and ONLY_IN_TO.
+    """
+    ignore = tuple(ignore)
+    differences = {}
+    for metric_id in sorted(a.metrics.keys() & b.metrics.keys()):
+        diff = diff_rows(
+            a.metrics[metric_id],
+            b.metrics[metric_id],
+            series_key(metrics.get(metric_id, {})),
+            threshold,
+            ignore,
+        )
+        if len(diff) > 1:
+            differences[metric_id] = diff
+
+    result: Dict[str, Any] = {
+        "FROM": a.name,
+        "TO": b.name,
+        "SECONDS": round(b.taken_at - a.taken_at, 1),
+        "METRICS": differences,
+    }
+    only_a, only_b = sorted(a.metrics.keys() - b.metrics.keys()), sorted(b.metrics.keys() - a.metrics.keys())
+    if only_a:
+        result["ONLY_IN_FROM"] = only_a
+    if only_b:
+        result["ONLY_IN_TO"] = only_b
+    return result
+
+
+class SnapshotStore:
+    """Save, load and compare named metric snapshots under a directory.
+
+    Args:
+        root: Directory the snapshots are written to, one JSON file each.
+        metrics: Metric catalog, used for the key column of each metric.
+    """
+
+    def __init__(self, root: str, metrics: Mapping[str, Mapping[str, Any]]):
+        self.root = Path(root)
+        self.metrics = dict(metrics)
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> Path:
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid snapshot name: {name!r}")
+        return self.root / f"{name}.json"
+
+    def save(self, snapshot: MetricSnapshot) -> MetricSnapshot:
+        """Write a snapshot, replacing any snapshot with the same name."""
+        path = self._path(snapshot.name)
+        self.root.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        with self._lock:
+            with open(partial, "w", encoding="utf-8") as f:
+                json.dump(asdict(snapshot), f, default=str)
+            os.replace(partial, path)
+        return snapshot
+
+    def current(
+        self, name: str, sampler: Any, metric_ids: Optional[Sequence[str]] = None
+    ) -> MetricSnapshot:
+        """Build a snapshot of the current samples of some metrics without saving it.
+
+        Args:
+            name: Snapshot name; letters, digits, `_`, `.` and `-`.
+            sampler: `MetricSampler` the rows come from. Samples that are
+                fresh enough are reused.
+            metric_ids: Metrics to include. Defaults to every metric that
+                takes no parameters.
+        """
+        self._path(name)
+        if metric_ids is None:
+            metric_ids = [m for m, metric in self.metrics.items() if not metric.get("parameters")]
+        snapshot = MetricSnapshot(name, time.time())
+        for metric_id in metric_ids:
+            if metric_id not in self.metrics:
+                raise ValueError(f"Unknown metric: {metric_id}")
+            sample = sampler.get(metric_id)
+            if sample.error is not None:
+                snapshot.errors[metric_id] = sample.error
+            else:
+                snapshot.metrics[metric_id] = sample.rows
+        return snapshot
+
+    def take(self, name: str, sampler: Any, metric_ids: Optional[Sequence[str]] = None) -> MetricSnapshot:
+        """Save the current samples of some metrics under a name; see `current`."""
+        return self.save(self.current(name, sampler, metric_ids))
+
+    def load(self, name: str) -> MetricSnapshot:
+        """Read a snapshot.
+
+        Raises:
+            ValueError: No snapshot has that name.
+        """
+        path = self._path(name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return MetricSnapshot(**json.load(f))
+        except FileNotFoundError:
+            raise ValueError(f"Unknown snapshot: {name}") from None
+
+    def names(self) -> List[Dict[str, Any]]:
+        """Return the saved snapshots with when they were taken, oldest first."""
+        if not self.root.is_dir():
+            return []
+        snapshots = sorted((self.load(path.stem) for path in self.root.glob("*.json")), key=lambda s: s.taken_at)
+        return [
+            {
+                "NAME": snapshot.name,
+                "TAKEN_AT": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot.taken_at)),
+                "METRICS": sorted(snapshot.metrics),
+            }
+            for snapshot in snapshots
+        ]
+
+    def delete(self, name: str) -> None:
+        """Remove a snapshot if it exists."""
+        self._path(name).unlink(missing_ok=True)
+
+    def diff(
+        self,
+        a: Union[str, MetricSnapshot],
+        b: Union[str, MetricSnapshot],
+        threshold: float = DEFAULT_THRESHOLD,
+        ignore: Iterable[str] = (),
+    ) -> Dict[str, Any]:
+        """Compare two snapshots, given as names or snapshots; see `diff_snapshots`."""
+        a = self.load(a) if isinstance(a, str) else a
+        b = self.load(b) if isinstance(b, str) else b
+        return diff_snapshots(a, b, self.metrics, threshold, ignore)
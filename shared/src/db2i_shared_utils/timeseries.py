@@ -0,0 +1,509 @@
+"""Embedded time-series store for sampled performance metrics.
+
+`MetricStore` keeps the samples a `MetricSampler` collects on local disk so
+trend questions can be answered without a history table on the IBM i.
+
+Every numeric column of a sample row becomes a series, identified by the
+metric, the row key (e.g. the POOL_NAME of a memory pool row) and the column.
+Points are buffered in memory and flushed as append-only columnar segments:
+one compressed NumPy `.npz` file per metric and flush, holding one array per
+column. Each flush is also downsampled into 1-minute, 15-minute and 1-hour
+rollup segments that store count, sum, min, max and last value per bucket, so
+long windows are read from a handful of small files. At flush time the
+segments of each tier are compacted into one file per ended period (an hour of
+raw points, a day of rollups), and segments older than the retention of their
+tier are deleted.
+
+Metrics with a `rates` definition are cumulative on the host; `attach` also
+records their per-interval rates as a derived metric named
+`<metric_id>.rates`, which is what trends and anomalies should be read from.
+
+Layout::
+
+    <root>/<metric_id>/raw/<start>-<end>-<seq>.npz
+    <root>/<metric_id>/1m/<start>-<end>-<seq>.npz
+    ...
+"""
+
+import atexit
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rollup tiers and their bucket width in seconds, finest first.
+TIERS = {"1m": 60, "15m": 900, "1h": 3600}
+
+# Seconds each tier is kept for.
+DEFAULT_RETENTION = {
+    "raw": 24 * 3600,
+    "1m": 7 * 24 * 3600,
+    "15m": 90 * 24 * 3600,
+    "1h": 400 * 24 * 3600,
+}
+
+AGGREGATES = ("avg", "min", "max", "sum", "count", "last")
+
+# Seconds of data compacted into one segment per tier once the period has ended.
+COMPACTION = {"raw": 3600, "1m": 86400, "15m": 86400, "1h": 86400}
+
+# Times a read starts over when a segment is compacted or expired under it.
+READ_ATTEMPTS = 5
+
+# Automatic resolution picks the finest tier with at most this many buckets.
+MAX_BUCKETS = 240
+
+# Suffix of the derived metrics that hold per-interval rates.
+RATES_SUFFIX = ".rates"
+
+_TIME = "__time__"
+_KEY = "__key__"
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+Series = Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]
+
+
+def parse_duration(value: Union[str, float, int]) -> float:
+    """Parse a window such as `90s`, `15m`, `6h`, `7d` or a number of seconds."""
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = _DURATION.match(value)
+        if not match:
+            raise ValueError(f"Invalid duration: {value!r}")
+        seconds = float(match.group(1)) * _UNITS[match.group(2).lower()]
+    if seconds <= 0:
+        raise ValueError("Duration must be greater than 0")
+    return seconds
+
+
+def series_key(metric: Mapping[str, Any]) -> Optional[str]:
+    """Return the column that identifies the rows of a multi-row metric."""
+    return metric.get("key") or (metric.get("rates") or {}).get("key")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _group(times: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort points by (key, time) and return the order and group boundaries.
+
+    The sort is stable, so points of one group stay in arrival order.
+    """
+    codes = np.unique(keys, return_inverse=True)[1].reshape(-1)
+    order = np.lexsort((times, codes))
+    times, codes = times[order], codes[order]
+    change = (times[1:] != times[:-1]) | (codes[1:] != codes[:-1])
+    starts = np.concatenate(([0], np.nonzero(change)[0] + 1))
+    ends = np.concatenate((starts[1:], [len(order)])) - 1
+    return order, starts, ends
+
+
+def _reduce(times: np.ndarray, keys: np.ndarray, stats: Dict[str, np.ndarray]) -> Series:
+    """Combine rows that share a bucket time and key.
+
+    `stats` maps `<column>__<stat>` to one value per row.
+    """
+    if len(times) == 0:
+        return times, keys, stats
+    order, starts, ends = _group(times, keys)
+    reduced = {}
+    for name, values in stats.items():
+        values = values[order]
+        stat = name.rsplit("__", 1)[1]
+        if stat in ("count", "sum"):
+            reduced[name] = np.add.reduceat(values, starts)
+        elif stat == "min":
+            reduced[name] = np.fmin.reduceat(values, starts)
+        elif stat == "max":
+            reduced[name] = np.fmax.reduceat(values, starts)
+        else:
+            reduced[name] = values[ends]
+    return times[order][starts], keys[order][starts], reduced
+
+
+def rollup(times: np.ndarray, keys: np.ndarray, columns: Dict[str, np.ndarray], width: float) -> Series:
+    """Downsample raw points into buckets of `width` seconds."""
+    stats = {}
+    for column, values in columns.items():
+        present = ~np.isnan(values)
+        stats[f"{column}__count"] = present.astype(float)
+        stats[f"{column}__sum"] = np.where(present, values, 0.0)
+        stats[f"{column}__min"] = values
+        stats[f"{column}__max"] = values
+        stats[f"{column}__last"] = values
+    return _reduce(np.floor(times / width) * width, keys, stats)
+
+
+class MetricStore:
+    """Append-only local store of metric samples with automatic rollups.
+
+    Args:
+        root: Directory the segments are written under.
+        metrics: The metric catalog; a metric's `key` (or `rates.key`)
+            column identifies its rows. Rows of other multi-row metrics are
+            identified by their position.
+        retention: Seconds to keep per tier (`raw`, `1m`, `15m`, `1h`).
+        flush_rows: Buffered points per metric that trigger a flush.
+        flush_seconds: Age of the oldest buffered point that triggers a flush.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, os.PathLike],
+        metrics: Optional[Mapping[str, Mapping[str, Any]]] = None,
+        retention: Optional[Mapping[str, float]] = None,
+        flush_rows: int = 1000,
+        flush_seconds: float = 300.0,
+    ):
+        self.root = Path(root)
+        self.metrics = dict(metrics or {})
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._buffers: Dict[str, List[Tuple[float, str, Dict[str, float]]]] = {}
+        # Points taken from the buffer whose segments are not published yet.
+        self._pending: Dict[str, List[Tuple[float, str, Dict[str, float]]]] = {}
+        # Guards the buffers and segment renames, so readers see every point once.
+        self._lock = threading.Lock()
+        # Serializes flushes; readers never take it.
+        self._flush_lock = threading.Lock()
+        self._seq = itertools.count()
+        atexit.register(self.flush)
+
+    def key_column(self, metric_id: str) -> Optional[str]:
+        """Return the key column of a stored metric, derived metrics included."""
+        if metric_id.endswith(RATES_SUFFIX):
+            metric_id = metric_id[: -len(RATES_SUFFIX)]
+        return series_key(self.metrics.get(metric_id, {}))
+
+    def metric_ids(self) -> List[str]:
+        """Return the metrics with recorded history, derived metrics included."""
+        with self._lock:
+            buffered = {m for m, points in self._buffers.items() if points}
+        stored = {p.name for p in self.root.iterdir() if p.is_dir()} if self.root.is_dir() else set()
+        return sorted(buffered | stored)
+
+    def attach(self, sampler: Any) -> None:
+        """Record every sample of `sampler`, plus the latest rates of metrics that have them."""
+
+        def record(sample: Any) -> None:
+            self.record(sample)
+            if sample.error is None and "rates" in sampler.metrics[sample.metric_id]:
+                rows = sampler.rates(sample.metric_id)
+                self.append(sample.metric_id + RATES_SUFFIX, sample.taken_at, rows)
+
+        sampler.add_hook(record)
+
+    def record(self, sample: Any) -> None:
+        """Buffer a sample; usable as a `MetricSampler` hook.
+
+        Failed samples and non-numeric columns are skipped.
+        """
+        if getattr(sample, "error", None) is not None:
+            return
+        self.append(sample.metric_id, sample.taken_at, sample.rows)
+
+    def append(self, metric_id: str, taken_at: float, rows: List[Dict[str, Any]]) -> None:
+        """Buffer the numeric columns of a metric's rows taken at one time."""
+        key_column = self.key_column(metric_id)
+        points = []
+        for i, row in enumerate(rows):
+            key = str(row.get(key_column, "")) if key_column else (str(i) if len(rows) > 1 else "")
+            values = {c: float(v) for c, v in row.items() if c != key_column and _is_number(v)}
+            if values:
+                points.append((taken_at, key, values))
+
+        with self._lock:
+            buffer = self._buffers.setdefault(metric_id, [])
+            buffer.extend(points)
+            due = buffer and (
+                len(buffer) >= self.flush_rows or time.time() - buffer[0][0] >= self.flush_seconds
+            )
+        if due:
+            self.flush(metric_id)
+
+    def flush(self, metric_id: Optional[str] = None) -> None:
+        """Write buffered points as new raw and rollup segments.
+
+        Also compacts ended periods and deletes expired segments.
+        """
+        with self._flush_lock:
+            with self._lock:
+                metric_ids = [metric_id] if metric_id else list(self._buffers)
+                batches = {m: self._buffers.pop(m, []) for m in metric_ids}
+                self._pending.update((m, points) for m, points in batches.items() if points)
+
+            for metric, points in batches.items():
+                if not points:
+                    continue
+                try:
+                    times, keys, columns = self._to_columns(points)
+                    partials = [self._write(metric, "raw", times, keys, columns)]
+                    for tier, width in TIERS.items():
+                        partials.append(self._write(metric, tier, *rollup(times, keys, columns, width)))
+                except Exception:
+                    with self._lock:
+                        self._pending.pop(metric, None)
+                    raise
+                self._publish(partials, flushed=metric)
+                self._compact(metric)
+                self._expire(metric)
+
+    @staticmethod
+    def _to_columns(points: List[Tuple[float, str, Dict[str, float]]]):
+        names = sorted({c for _, _, values in points for c in values})
+        times = np.array([p[0] for p in points], dtype=float)
+        keys = np.array([p[1] for p in points], dtype=str)
+        columns = {
+            name: np.array([values.get(name, np.nan) for _, _, values in points], dtype=float)
+            for name in names
+        }
+        return times, keys, columns
+
+    def _write(self, metric_id: str, tier: str, times, keys, columns) -> Path:
+        """Write a segment under a temporary name and return that path.
+
+        Readers never see the segment, partial or complete, until `_publish`.
+        """
+        directory = self.root / metric_id / tier
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{times.min():.0f}-{times.max():.0f}-{os.getpid()}.{next(self._seq)}.npz"
+        partial = directory / f"{name}.part"
+        with open(partial, "wb") as f:
+            np.savez_compressed(f, **{_TIME: times, _KEY: keys}, **columns)
+        return partial
+
+    def _publish(
+        self, partials: List[Path], replaces: Sequence[Path] = (), flushed: Optional[str] = None
+    ) -> None:
+        """Make written segments visible in one step for readers.
+
+        Args:
+            partials: Segments returned by `_write`.
+            replaces: Segments whose data the new ones hold, or expired ones.
+            flushed: Metric whose pending points the new segments hold.
+        """
+        with self._lock:
+            for partial in partials:
+                os.replace(partial, partial.with_suffix(""))
+            for path in replaces:
+                path.unlink(missing_ok=True)
+            if flushed is not None:
+                self._pending.pop(flushed, None)
+
+    def _compact(self, metric_id: str) -> None:
+        """Merge the segments of each ended period into one.
+
+        Only segments this process wrote are merged, so processes sharing a
+        root never merge the same files twice. Rollup buckets split across
+        flushes are combined; raw points keep their order.
+        """
+        now = time.time()
+        own = f"-{os.getpid()}."
+        for tier, period in COMPACTION.items():
+            periods: Dict[float, List[Path]] = {}
+            for path in self._segments(metric_id, tier):
+                start = np.floor(_segment_start(path) / period) * period
+                if own in path.name and start + period <= now:
+                    periods.setdefault(start, []).append(path)
+            for paths in periods.values():
+                if len(paths) < 2:
+                    continue
+                times, keys, columns = _concat([_read(path) for path in paths])
+                if tier in TIERS:
+                    times, keys, columns = _reduce(times, keys, columns)
+                self._publish([self._write(metric_id, tier, times, keys, columns)], replaces=paths)
+
+    def _expire(self, metric_id: str) -> None:
+        now = time.time()
+        expired = []
+        for tier, keep in self.retention.items():
+            width = TIERS.get(tier, 0)
+            expired.extend(p for p in self._segments(metric_id, tier) if _segment_end(p) + width < now - keep)
+        if expired:
+            self._publish([], replaces=expired)
+
+    def _segments(self, metric_id: str, tier: str, since: float = 0.0) -> List[Path]:
+        directory = self.root / metric_id / tier
+        if not directory.is_dir():
+            return []
+        paths = [p for p in directory.glob("*.npz") if _segment_end(p) + TIERS.get(tier, 0) >= since]
+        return sorted(paths, key=_segment_order)
+
+    def _load(self, metric_id: str, tier: str, since: float) -> Series:
+        """Concatenate the segments of a tier that overlap `since` onwards.
+
+        The segment list and unflushed points are taken together under the
+        lock; the files are read outside it, and the read starts over if a
+        flush compacted or expired one of them in the meantime.
+        """
+        for attempt in range(READ_ATTEMPTS):
+            with self._lock:
+                paths = self._segments(metric_id, tier, since)
+                buffered = self._pending.get(metric_id, []) + self._buffers.get(metric_id, [])
+            try:
+                parts = [_read(path) for path in paths]
+                break
+            except FileNotFoundError:
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+        if buffered:
+            times, keys, columns = self._to_columns(buffered)
+            if tier in TIERS:
+                times, keys, columns = rollup(times, keys, columns, TIERS[tier])
+            parts.append({_TIME: times, _KEY: keys, **columns})
+        return _concat(parts)
+
+    def resolution(self, window: float) -> str:
+        """Pick the finest tier that covers `window` in at most `MAX_BUCKETS` buckets."""
+        for tier, width in TIERS.items():
+            if window / width <= MAX_BUCKETS and self.retention.get(tier, 0) >= window:
+                return tier
+        return list(TIERS)[-1]
+
+    def columns(self, metric_id: str) -> List[str]:
+        """Return the numeric columns stored for a metric."""
+        names = self._load(metric_id, "raw", time.time() - self.retention["raw"])[2]
+        return sorted(names)
+
+    def series(
+        self,
+        metric_id: str,
+        window: Union[str, float] = "1h",
+        agg: str = "avg",
+        column: Optional[str] = None,
+        key: Optional[str] = None,
+        resolution: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> Series:
+        """Aggregate a metric's history over the last `window` into arrays.
+
+        Takes the same arguments as `query`.
+
+        Returns:
+            Bucket times, row keys and column name to values, one entry per
+            bucket and key, ordered by time and then key.
+        """
+        if agg not in AGGREGATES:
+            raise ValueError(f"agg must be one of {AGGREGATES}")
+        window = parse_duration(window)
+        tier = resolution or self.resolution(window)
+        if tier != "raw" and tier not in TIERS:
+            raise ValueError(f"resolution must be 'raw' or one of {list(TIERS)}")
+        now = now or time.time()
+        since = now - window
+
+        times, keys, columns = self._load(metric_id, tier, since)
+        if tier == "raw":
+            selected = (times >= since) & (times <= now)
+            values = {name: columns[name] for name in columns}
+        else:
+            times, keys, columns = _reduce(times, keys, columns)
+            selected = (times >= np.floor(since / TIERS[tier]) * TIERS[tier]) & (times <= now)
+            names = sorted({name.rsplit("__", 1)[0] for name in columns})
+            values = {name: self._aggregate(columns, name, agg) for name in names}
+
+        if key is not None:
+            selected &= keys == key
+        if column is not None:
+            if column not in values:
+                raise ValueError(f"{metric_id} has no numeric column {column}")
+            values = {column: values[column]}
+
+        order = np.lexsort((keys, times))
+        order = order[selected[order]]
+        return times[order], keys[order], {name: series[order] for name, series in values.items()}
+
+    def query(
+        self,
+        metric_id: str,
+        window: Union[str, float] = "1h",
+        agg: str = "avg",
+        column: Optional[str] = None,
+        key: Optional[str] = None,
+        resolution: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Aggregate a metric's history over the last `window`.
+
+        Args:
+            metric_id: Metric to read.
+            window: How far back to look, e.g. `15m`, `6h`, `7d`.
+            agg: One of `AGGREGATES`, applied within each bucket.
+            column: Only return this column.
+            key: Only return rows with this key, e.g. a pool name.
+            resolution: A tier name, or `raw` for the stored points without
+                aggregation. Defaults to `resolution(window)`.
+            now: End of the window; defaults to the current time.
+
+        Returns:
+            One row per bucket and key, oldest first, with TIME, the metric's
+            key column when it has one, and one value per column.
+        """
+        times, keys, values = self.series(metric_id, window, agg, column, key, resolution, now)
+        key_column = self.key_column(metric_id) or "KEY"
+        rows = []
+        for i in range(len(times)):
+            row: Dict[str, Any] = {
+                "TIME": datetime.fromtimestamp(times[i], tz=timezone.utc).isoformat()
+            }
+            if keys[i]:
+                row[key_column] = str(keys[i])
+            for name, series in values.items():
+                row[name] = None if np.isnan(series[i]) else round(float(series[i]), 4)
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _aggregate(columns: Dict[str, np.ndarray], name: str, agg: str) -> np.ndarray:
+        if agg == "avg":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return columns[f"{name}__sum"] / columns[f"{name}__count"]
+        return columns[f"{name}__{agg}"]
+
+
+def _read(path: Path) -> Dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as segment:
+        return {name: segment[name] for name in segment.files}
+
+
+def _concat(parts: List[Dict[str, np.ndarray]]) -> Series:
+    """Concatenate segments; columns a segment lacks count as no points."""
+    if not parts:
+        return np.array([]), np.array([], dtype=str), {}
+    names = sorted({n for part in parts for n in part} - {_TIME, _KEY})
+    times = np.concatenate([part[_TIME] for part in parts])
+    keys = np.concatenate([part[_KEY] for part in parts])
+    columns = {}
+    for name in names:
+        fill = 0.0 if name.endswith(("__count", "__sum")) else np.nan
+        columns[name] = np.concatenate(
+            [part.get(name, np.full(len(part[_TIME]), fill)) for part in parts]
+        )
+    return times, keys, columns
+
+
+def _segment_order(path: Path) -> Tuple[float, int, int]:
+    """Sort segments by start time, then in the order they were written."""
+    pid, seq = path.name.split("-", 2)[2].split(".")[:2]
+    return _segment_start(path), int(pid), int(seq)
+
+
+def _segment_start(path: Path) -> float:
+    return float(path.name.split("-", 1)[0])
+
+
+def _segment_end(path: Path) -> float:
+    return float(path.name.split("-", 2)[1])
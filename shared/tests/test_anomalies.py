@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.anomalies import AnomalyDetector, ewma_scores, seasonal_scores, to_matrix
+from db2i_shared_utils.timeseries import MetricStore
+
+START = 1_700_000_000.0 - 1_700_000_000.0 % 86400
+METRICS = {
+    "memory_pools": {"sql": "SELECT", "key": "POOL_NAME", "rates": {"key": "POOL_NAME", "counters": ["FAULTS"]}},
+}
+
+
+class TestScores(unittest.TestCase):
+
+    def test_to_matrix(self):
+        grid, labels, matrix = to_matrix(
+            np.array([0.0, 0.0, 60.0]), np.array(["A", "B", "A"]), {"V": np.array([1.0, 2.0, 3.0])}
+        )
+        self.assertEqual(list(grid), [0.0, 60.0])
+        self.assertEqual(labels, [("A", "V"), ("B", "V")])
+        np.testing.assert_array_equal(matrix, [[1.0, 3.0], [2.0, np.nan]])
+
+    def test_to_matrix_regular_grid(self):
+        grid, labels, matrix = to_matrix(
+            np.array([0.0, 180.0]), np.array(["", ""]), {"V": np.array([1.0, 3.0])}, start=30.0, end=200.0, width=60
+        )
+        self.assertEqual(list(grid), [0.0, 60.0, 120.0, 180.0])
+        np.testing.assert_array_equal(matrix, [[1.0, np.nan, np.nan, 3.0]])
+
+    def test_ewma_flags_spike_after_warmup(self):
+        rng = np.random.default_rng(0)
+        series = 50 + rng.normal(0, 1, 60)
+        series[5] = series[55] = 90
+        scores, expected = ewma_scores(series[None, :])
+        self.assertTrue(np.isnan(scores[0, 5]))
+        self.assertGreater(scores[0, 55], 6)
+        self.assertAlmostEqual(expected[0, 55], 50, delta=3)
+
+    def test_seasonal_baseline(self):
+        day = np.tile(np.r_[np.full(12, 10.0), np.full(12, 80.0)], 4)
+        day[-1] = 10.0
+        scores, expected = seasonal_scores(day[None, :], 24)
+        self.assertEqual(expected[0, -1], 80.0)
+        self.assertLess(scores[0, -1], -6)
+        self.assertEqual(np.nanmax(np.abs(scores[0, :-1])), 0.0)
+
+
+class TestAnomalyDetector(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = MetricStore(directory.name, METRICS, retention={"raw": 1e10, "1m": 1e10, "15m": 1e10, "1h": 1e10}, flush_seconds=1e10)
+        rng = np.random.default_rng(1)
+        for i in range(180):
+            cpu = 20 + rng.normal(0, 2)
+            if i >= 175:
+                cpu = 95.0
+            self.store.append("system_status", START + i * 60, [{"CPU": cpu, "JOBS": 500.0}])
+            self.store.append("memory_pools", START + i * 60, [{"POOL_NAME": "*BASE", "FAULTS": float(i)}])
+            self.store.append(
+                "memory_pools.rates", START + i * 60, [{"POOL_NAME": "*BASE", "FAULTS_PER_SECOND": 1.0}]
+            )
+        self.now = START + 180 * 60
+
+    def test_reports_only_deviating_series(self):
+        findings = AnomalyDetector(self.store, baseline="2h").detect("10m", now=self.now)
+        self.assertEqual([(a.metric_id, a.column) for a in findings], [("system_status", "CPU")])
+        (cpu,) = findings
+        self.assertEqual(cpu.value, 95.0)
+        self.assertEqual(cpu.severity, "critical")
+        self.assertEqual(cpu.to_dict()["direction"], "above")
+        self.assertNotIn("key", cpu.to_dict())
+
+    def test_seasonal_baseline_across_gaps(self):
+        store = MetricStore(self.store.root / "hourly", METRICS, flush_seconds=1e10)
+        # Even hours are quiet, odd hours busy; one hour of yesterday is missing
+        for hour in range(5 * 24 - 1):
+            if hour != 3 * 24 + 5:
+                store.append("system_status", START + hour * 3600, [{"CPU": 10.0 if hour % 2 == 0 else 80.0}])
+        store.append("system_status", START + 5 * 24 * 3600 - 3600, [{"CPU": 10.0}])
+        findings = AnomalyDetector(store, baseline="1h").detect("1h", now=START + 5 * 24 * 3600 - 1800)
+        self.assertEqual([(a.method, a.value, a.expected) for a in findings], [("seasonal", 10.0, 80.0)])
+        # The last hour of the day, not the hour the gap would shift it to
+        self.assertEqual(findings[0].time, datetime.fromtimestamp(START + (5 * 24 - 1) * 3600, timezone.utc).isoformat())
+
+    def test_checks_non_cumulative_columns_of_rate_metrics(self):
+        for i in range(180):
+            threads = 400.0 if i >= 175 else 100.0 + i % 3
+            self.store.append("memory_pools", START + i * 60, [{"POOL_NAME": "*MACHINE", "FAULTS": i * 50.0, "THREADS": threads}])
+        findings = AnomalyDetector(self.store, baseline="2h").detect("10m", now=self.now)
+        self.assertEqual(
+            sorted((a.metric_id, a.key, a.column) for a in findings),
+            [("memory_pools", "*MACHINE", "THREADS"), ("system_status", "", "CPU")],
+        )
+
+    def test_quiet_window(self):
+        self.assertEqual(AnomalyDetector(self.store, baseline="1h").detect("10m", now=self.now - 30 * 60), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import time
+import unittest
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.bundle import MetricBundle, compile_bundle
+from db2i_shared_utils.executor import Column, SQLResult
+
+STATEMENTS = {
+    "system": "SELECT CPU_PCT FROM TABLE(QSYS2.SYSTEM_STATUS()) X;",
+    "memory": """
+        SELECT POOL_NAME, "Size" FROM TABLE(QSYS2.MEMORY_POOL()) ORDER BY POOL_NAME
+    """,
+}
+DOCUMENTS = {
+    "system": [{"CPU_PCT": 12.5}],
+    "memory": [{"POOL_NAME": "*BASE", "Size": 10}, {"POOL_NAME": "*MACHINE", "Size": 5}],
+}
+
+
+class FakeExecutor:
+    def __init__(self, fail=False, slow=None):
+        self.fail = fail
+        self.slow = slow
+        self.statements = []
+
+    def execute(self, sql, parameters=None, limit=None):
+        self.statements.append(sql)
+        if self.slow and self.slow in sql:
+            time.sleep(0.3)
+        if sql.endswith("FETCH FIRST 1 ROWS ONLY"):
+            names = ["CPU_PCT"] if "SYSTEM_STATUS" in sql else ["POOL_NAME", "Size"]
+            return SQLResult(sql=sql, columns=[Column(n, "INTEGER", n) for n in names])
+        if self.fail:
+            raise RuntimeError("SQL0551")
+        rows = [{"METRIC": name, "DOCUMENT": json.dumps(doc)} for name, doc in DOCUMENTS.items()]
+        return SQLResult(sql=sql, columns=[Column("METRIC", "VARCHAR", "METRIC")], rows=rows)
+
+    def run_many(self, statements, timeout):
+        return {name: "separately" for name in statements}
+
+
+class TestMetricBundle(unittest.TestCase):
+
+    def test_compile(self):
+        sql = compile_bundle({"it's": "SELECT A FROM T"}, {"it's": ['A"B']})
+        self.assertEqual(
+            sql,
+            "SELECT 'it''s' AS METRIC, (SELECT JSON_ARRAYAGG(JSON_OBJECT(KEY 'A\"B' VALUE B.\"A\"\"B\") "
+            "ORDER BY B.BUNDLE_ROW) FROM (SELECT T.*, ROW_NUMBER() OVER () AS BUNDLE_ROW "
+            "FROM (SELECT A FROM T) T) B) AS DOCUMENT FROM SYSIBM.SYSDUMMY1",
+        )
+
+    def test_one_statement_after_describe(self):
+        executor = FakeExecutor()
+        bundle = MetricBundle(executor, STATEMENTS)
+        self.assertEqual(bundle.execute(), DOCUMENTS)
+        self.assertEqual(len(executor.statements), 3)
+        self.assertEqual(bundle.execute(), DOCUMENTS)
+        self.assertEqual(len(executor.statements), 4)
+        self.assertEqual(bundle.sql.count("UNION ALL"), 1)
+        self.assertIn("ORDER BY POOL_NAME) T) B", bundle.sql)
+        self.assertNotIn(";", bundle.sql)
+
+    def test_run_formats_and_falls_back(self):
+        self.assertEqual(MetricBundle(FakeExecutor(), STATEMENTS).run()["system"], str(DOCUMENTS["system"]))
+        self.assertEqual(
+            MetricBundle(FakeExecutor(fail=True), STATEMENTS).run(),
+            {"system": "separately", "memory": "separately"},
+        )
+
+    def test_timeout_falls_back_to_separate_statements(self):
+        # Describing the statements counts against the timeout too
+        for slow in ("MEMORY_POOL", "UNION ALL"):
+            executor = FakeExecutor(slow=slow)
+            bundle = MetricBundle(executor, STATEMENTS)
+            self.assertEqual(bundle.run(timeout=0.1), {"system": "separately", "memory": "separately"})
+            self.assertTrue(bundle.separate)
+            time.sleep(0.3)
+            count = len(executor.statements)
+            self.assertEqual(bundle.run(timeout=0.1)["memory"], "separately")
+            self.assertEqual(len(executor.statements), count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+from datetime import date, datetime, time
+from decimal import Decimal
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.columnar import to_arrow
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def column(name, db_type, **extra):
+    return {"name": name, "label": name, "type": db_type, **extra}
+
+
+@unittest.skipUnless(pa, "pyarrow not installed")
+class TestToArrow(unittest.TestCase):
+
+    def test_time(self):
+        table = to_arrow([column("T", "TIME")], [["10.15.30", "23:59:59", None]])
+        self.assertEqual(table.schema.field("T").type, pa.time64("us"))
+        self.assertEqual(table.column("T").to_pylist(), [time(10, 15, 30), time(23, 59, 59), None])
+
+    def test_timestamp_forms(self):
+        values = ["2025-01-31-10.15.30.123456", "2025-01-31 10:15:30", "2025-01-31T10:15:30.5", None]
+        table = to_arrow([column("TS", "TIMESTAMP")], [values])
+        self.assertEqual(table.schema.field("TS").type, pa.timestamp("us"))
+        self.assertEqual(
+            table.column("TS").to_pylist(),
+            [
+                datetime(2025, 1, 31, 10, 15, 30, 123456),
+                datetime(2025, 1, 31, 10, 15, 30),
+                datetime(2025, 1, 31, 10, 15, 30, 500000),
+                None,
+            ],
+        )
+
+    def test_timestamp_nanoseconds(self):
+        # TIMESTAMP(12) from the data, TIMESTAMP(9) from the metadata
+        table = to_arrow(
+            [column("TS12", "TIMESTAMP"), column("TS9", "TIMESTAMP", scale=9)],
+            [["2025-01-31-10.15.30.123456789012"], ["2025-01-31 10:15:30"]],
+        )
+        self.assertEqual(table.schema.field("TS12").type, pa.timestamp("ns"))
+        self.assertEqual(table.schema.field("TS9").type, pa.timestamp("ns"))
+        self.assertEqual(table.column("TS12").cast(pa.int64())[0].as_py() % 1_000_000_000, 123456789)
+
+        # Outside the nanosecond range
+        table = to_arrow([column("TS", "TIMESTAMP")], [["2999-12-31-00.00.00.000000001"]])
+        self.assertEqual(table.schema.field("TS").type, pa.timestamp("us"))
+
+    def test_unparseable_stays_string(self):
+        table = to_arrow(
+            [column("T", "TIME"), column("TS", "TIMESTAMP"), column("D", "DATE")],
+            [["24.00.00"], ["not a timestamp"], ["2025-01-31"]],
+        )
+        self.assertEqual(table.column("T").to_pylist(), ["24.00.00"])
+        self.assertEqual(table.column("TS").to_pylist(), ["not a timestamp"])
+        self.assertEqual(table.column("D").to_pylist(), [date(2025, 1, 31)])
+
+    def test_decimal_stays_exact(self):
+        table = to_arrow([column("AMOUNT", "DECIMAL", precision=11, scale=2)], [["12.34", None]])
+        self.assertEqual(table.schema.field("AMOUNT").type, pa.decimal128(11, 2))
+        self.assertEqual(table.column("AMOUNT").to_pylist(), [Decimal("12.34"), None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.correlation import JobNetworkCorrelator, JobSample, lagged_correlation, pearson
+from db2i_shared_utils.executor import SQLResult
+from db2i_shared_utils.jobs import JobSnapshotService
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, sql, parameters=None):
+        self.calls.append(sql)
+        if "ACTIVE_JOB_INFO" in sql:
+            rows = [
+                {"JOB_NAME": "1/QUSER/QZDASOINIT", "CPU_TIME": 100},
+                {"JOB_NAME": "2/QTMHHTTP/ADMIN", "CPU_TIME": 40},
+                {"JOB_NAME": "3/QSYS/QSYSARB", "CPU_TIME": 900},
+            ]
+        else:
+            rows = [
+                {"JOB_NAME": "1/QUSER/QZDASOINIT", "CONNECTIONS": 2, "BYTES_SENT": 10, "BYTES_RECEIVED": 5},
+                {"JOB_NAME": "2/QTMHHTTP/ADMIN", "CONNECTIONS": 1, "BYTES_SENT": None, "BYTES_RECEIVED": None},
+            ]
+        return SQLResult(sql=sql, rows=rows)
+
+
+def correlator_with(samples):
+    executor = FakeExecutor()
+    correlator = JobNetworkCorrelator(executor, JobSnapshotService(executor))
+    correlator._samples.extend(samples)
+    return correlator
+
+
+class TestCorrelation(unittest.TestCase):
+
+    def test_pearson(self):
+        x = np.array([[1, 1], [2, 2], [3, 3], [4, 4], [5, np.nan], [6, 6]], dtype=float)
+        y = np.array([[2, 6], [4, 5], [6, 4], [8, 3], [10, 2], [12, 1]], dtype=float)
+        r, count = pearson(x, y)
+        np.testing.assert_allclose(r, [1.0, -1.0])
+        self.assertEqual(count.tolist(), [6, 5])
+        self.assertTrue(np.isnan(pearson(x[:4], y[:4])[0]).all())
+
+    def test_lagged_correlation(self):
+        rng = np.random.default_rng(7)
+        y = rng.normal(size=(40, 1))
+        x = np.vstack([rng.normal(size=(2, 1)), y[:-2]])
+        lag, r = lagged_correlation(x, y, 3)
+        self.assertEqual(lag.tolist(), [2])
+        self.assertAlmostEqual(r[0], 1.0)
+
+    def test_sample_joins_jobs_with_connections(self):
+        correlator = correlator_with([])
+        sample = correlator.sample()
+        self.assertEqual(sorted(sample.jobs), ["1/QUSER/QZDASOINIT", "2/QTMHHTTP/ADMIN"])
+        self.assertEqual(sample.jobs["1/QUSER/QZDASOINIT"], (100.0, 2.0, 10.0, 5.0))
+        self.assertTrue(np.isnan(sample.jobs["2/QTMHHTTP/ADMIN"][2]))
+        self.assertEqual(len(correlator.executor.calls), 2)
+        self.assertLessEqual(sample.cpu_taken_at, sample.taken_at)
+
+    def test_samples_share_filtered_snapshots(self):
+        executor = FakeExecutor()
+        jobs = JobSnapshotService(executor)
+        correlator = JobNetworkCorrelator(executor, jobs, subsystems=["QUSRWRK", "QSYSWRK"])
+        jobs.top(5, subsystems="QUSRWRK,QSYSWRK")
+        sample = correlator.sample()
+        active = [sql for sql in executor.calls if "ACTIVE_JOB_INFO" in sql]
+        self.assertEqual(len(active), 1)
+        self.assertEqual(sample.cpu_taken_at, jobs.snapshot(subsystems="QUSRWRK,QSYSWRK").taken_at)
+
+    def test_cpu_rates_use_snapshot_times(self):
+        rng = np.random.default_rng(5)
+        load = rng.uniform(1, 10, size=12)
+        samples = []
+        for t in range(12):
+            # Snapshots are 5s older than the sample, and sample 6 reused the one of sample 5
+            snapshot = 5 if t == 6 else t
+            cpu = 100.0 * load[: snapshot + 1].sum()
+            sent = 1000.0 * load[: t + 1].sum()
+            samples.append(JobSample(1005.0 + 10 * t, {"A": (cpu, 1.0, sent, 0.0)}, 1000.0 + 10 * snapshot))
+        (job,) = correlator_with(samples).correlate()["JOBS"]
+        # The interval without a fresh snapshot has no CPU rate instead of a zero one
+        self.assertEqual(job["INTERVALS"], 10)
+        self.assertGreater(job["R_CPU_TRAFFIC"], 0.9)
+
+    def test_correlate_ranks_jobs_whose_cpu_follows_traffic(self):
+        rng = np.random.default_rng(3)
+        traffic = rng.uniform(100, 1000, size=30)
+        chatty = idle = 0.0
+        sent = 0.0
+        samples = []
+        for t in range(30):
+            sent += traffic[t] * 10
+            chatty += traffic[t] * 2
+            idle += rng.uniform(0, 500)
+            samples.append(
+                JobSample(
+                    1000.0 + 10 * t,
+                    {
+                        "CHATTY": (chatty, 3.0, sent, 0.0),
+                        "BUSY": (idle, 1.0, 0.0, 0.0),
+                    },
+                )
+            )
+        # Missing from one sample: both intervals around it are skipped
+        del samples[15].jobs["CHATTY"]
+        result = correlator_with(samples).correlate()
+        self.assertEqual(result["INTERVALS"], 29)
+        self.assertEqual(result["JOBS"][0]["JOB_NAME"], "CHATTY")
+        self.assertAlmostEqual(result["JOBS"][0]["R_CPU_TRAFFIC"], 1.0)
+        self.assertEqual(result["JOBS"][0]["TRAFFIC_LEAD_INTERVALS"], 0)
+        self.assertEqual(result["JOBS"][0]["INTERVALS"], 27)
+        self.assertNotIn("BUSY", [job["JOB_NAME"] for job in result["JOBS"]])
+
+    def test_too_few_samples(self):
+        samples = [JobSample(float(t), {"A": (t, 1.0, t, t)}) for t in range(3)]
+        self.assertEqual(correlator_with(samples).correlate(), {"INTERVALS": 2, "JOBS": []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import asyncio
+import sys
+import unittest
+from unittest import mock
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils import database
+from db2i_shared_utils.database import Db2iEngine, limit_sql
+
+
+class FakePool:
+    def __init__(self, options):
+        self.options = options
+        self.ends = 0
+
+    async def init(self):
+        pass
+
+    async def end(self):
+        self.ends += 1
+
+
+class TestLimitSql(unittest.TestCase):
+
+    def test_appends_fetch_first(self):
+        self.assertEqual(
+            limit_sql("SELECT * FROM QSYS2.SYSTABLES;", 10),
+            "SELECT * FROM QSYS2.SYSTABLES\nFETCH FIRST 10 ROWS ONLY",
+        )
+
+    def test_keeps_literal_limits(self):
+        for sql in (
+            "SELECT * FROM T LIMIT 5",
+            "SELECT * FROM T LIMIT 5 OFFSET 10",
+            "SELECT * FROM T FETCH FIRST 5 ROWS ONLY",
+            "SELECT * FROM T WITH UR",
+        ):
+            self.assertEqual(limit_sql(sql, 10), sql)
+
+    def test_keeps_parameter_marker_limits(self):
+        for sql in (
+            "SELECT JOB_NAME FROM T ORDER BY CPU_TIME DESC LIMIT ?",
+            "SELECT JOB_NAME FROM T ORDER BY CPU_TIME DESC LIMIT :rows",
+            "SELECT JOB_NAME FROM T ORDER BY CPU_TIME DESC OFFSET ? ROWS",
+            "SELECT JOB_NAME FROM T LIMIT 10 OFFSET :skip",
+        ):
+            self.assertEqual(limit_sql(sql, 10), sql)
+
+    def test_column_named_limit_still_limited(self):
+        self.assertEqual(
+            limit_sql("SELECT LIMIT FROM T", 10), "SELECT LIMIT FROM T\nFETCH FIRST 10 ROWS ONLY"
+        )
+
+    def test_other_statements_unchanged(self):
+        sql = "CALL QSYS2.GENERATE_SQL(?, ?)"
+        self.assertEqual(limit_sql(sql, 10), sql)
+
+
+class TestAsyncPools(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(database, "Pool", FakePool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = Db2iEngine("SAMPLE", {"host": "example", "user": "u", "password": "p"})
+
+    def test_pool_ended_when_asyncio_run_returns(self):
+        pools = [asyncio.run(self.engine.async_pool()) for _ in range(2)]
+        self.assertIsNot(pools[0], pools[1])
+        self.assertEqual([pool.ends for pool in pools], [1, 1])
+        self.assertEqual(len(self.engine._async_pools), 0)
+
+    def test_one_pool_per_loop(self):
+        async def twice():
+            return await self.engine.async_pool(), await self.engine.async_pool()
+
+        first, second = asyncio.run(twice())
+        self.assertIs(first, second)
+        self.assertEqual(first.ends, 1)
+
+    def test_aclose_ends_pool_once(self):
+        async def use_and_close():
+            pool = await self.engine.async_pool()
+            await self.engine.aclose()
+            return pool
+
+        self.assertEqual(asyncio.run(use_and_close()).ends, 1)
+
+    def test_close_ends_pools_of_open_loops(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        pool = loop.run_until_complete(self.engine.async_pool())
+        self.engine.close()
+        self.assertEqual(pool.ends, 1)
+        self.assertEqual(len(self.engine._async_pools), 0)
+
+    def test_closed_loops_dropped(self):
+        loop = asyncio.new_event_loop()
+        pool = loop.run_until_complete(self.engine.async_pool())
+        # Closing a loop with pending tasks is the caller's mistake; keep it quiet here
+        self.engine._async_shutdown[loop]._log_destroy_pending = False
+        loop.close()
+        asyncio.run(self.engine.async_pool())
+        self.assertEqual(pool.ends, 0)
+        self.assertNotIn(loop, self.engine._async_pools)
+
+
+if __name__ == '__main__':
+    unittest.main()
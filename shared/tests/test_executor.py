@@ -0,0 +1,198 @@
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+from mapepire_python.data_types import JobStatus
+from websockets.exceptions import ConnectionClosedError
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils import database
+from db2i_shared_utils.executor import NO_RESULTS_MESSAGE, SQLExecutor, run_sql_statement
+
+ROWS = [{"ID": i} for i in range(7)]
+
+
+class FakeQuery:
+    def __init__(self, sql, opts):
+        self.sql = sql
+        self.opts = opts
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def run(self, rows_to_fetch):
+        if "BROKEN" in self.sql:
+            raise RuntimeError("Failed to run query") from ConnectionClosedError(None, None)
+        if "MISSING" in self.sql:
+            raise RuntimeError("SQL0204 MISSING not found")
+        if "SLOW" in self.sql:
+            time.sleep(0.5)
+        if not self.sql.startswith("SELECT"):
+            return {"success": True, "has_results": False, "update_count": 2, "is_done": True}
+        block = self.fetch_more(rows_to_fetch)
+        block["metadata"] = {"columns": [{"name": "ID", "type": "INTEGER", "label": "ID"}]}
+        return block
+
+    def fetch_more(self, rows_to_fetch):
+        rows = ROWS[self.position : self.position + rows_to_fetch]
+        self.position += len(rows)
+        return {"success": True, "data": rows, "is_done": self.position >= len(ROWS)}
+
+
+class FakeJob:
+    def __init__(self):
+        self.queries = []
+        self.status = JobStatus.Ready
+
+    def get_status(self):
+        return self.status
+
+    def query(self, sql, opts=None):
+        query = FakeQuery(sql, opts)
+        self.queries.append(query)
+        return query
+
+
+class FakeConnection:
+    def __init__(self):
+        self.job = FakeJob()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestSQLExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+        self.options = []
+
+        def fake_connect(creds, options):
+            self.connections.append(FakeConnection())
+            self.options.append(options)
+            return self.connections[-1]
+
+        patcher = patch.object(database, "connect", fake_connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(database.Db2iEngine.close_all)
+        self.addCleanup(SQLExecutor._executors.clear)
+        self.creds = {"host": "example", "user": "user", "password": "secret", "port": 8076}
+
+    def test_reuses_one_connection_across_calls(self):
+        for _ in range(3):
+            run_sql_statement("SELECT ID FROM T", creds=self.creds)
+        self.assertEqual(len(self.connections), 1)
+        self.assertNotIn("extended dynamic", self.options[0])
+
+    def test_sql_packages_are_opt_in(self):
+        SQLExecutor.shared(self.creds, package="AGENTS").execute("SELECT ID FROM T")
+        self.assertEqual(self.options[-1]["package"], "AGENTS")
+        with patch.dict(os.environ, {"DB2I_SQL_PACKAGE": "FROMENV"}):
+            SQLExecutor(self.creds, dedicated=True).execute("SELECT ID FROM T")
+            self.assertEqual(self.options[-1]["package"], "FROMENV")
+            SQLExecutor(self.creds, package="", dedicated=True).execute("SELECT ID FROM T")
+            self.assertNotIn("package", self.options[-1])
+
+    def test_fetches_all_rows_in_blocks(self):
+        executor = SQLExecutor.shared(self.creds, block_size=3)
+        result = executor.execute("SELECT ID FROM T WHERE ID > ?", [0])
+        self.assertEqual(result.rows, ROWS)
+        self.assertEqual([c.name for c in result.columns], ["ID"])
+        self.assertEqual(self.connections[0].job.queries[0].opts, {"parameters": [0]})
+
+    def test_limit(self):
+        executor = SQLExecutor.shared(self.creds, block_size=3)
+        self.assertEqual(executor.execute("SELECT ID FROM T", limit=4).rows, ROWS[:4])
+
+    def test_stream(self):
+        executor = SQLExecutor.shared(self.creds)
+        events = []
+        executor.add_hook(events.append)
+        blocks = list(executor.stream("SELECT ID FROM T", block_size=3))
+        self.assertEqual(blocks, [ROWS[:3], ROWS[3:6], ROWS[6:]])
+        self.assertEqual(events[0]["rows"], len(ROWS))
+
+    def test_statement_without_results(self):
+        executor = SQLExecutor.shared(self.creds)
+        result = executor.execute("UPDATE T SET ID = 0")
+        self.assertFalse(result.has_results)
+        self.assertEqual(result.update_count, 2)
+        self.assertEqual(executor.run("UPDATE T SET ID = 0"), NO_RESULTS_MESSAGE)
+
+    def test_hooks_and_stats(self):
+        executor = SQLExecutor.shared(self.creds)
+        events = []
+        executor.add_hook(events.append)
+        executor.execute("SELECT ID FROM T")
+        self.assertEqual(events[0]["rows"], len(ROWS))
+        self.assertEqual(executor.stats()["queries"], 1)
+
+    def test_drops_broken_connections(self):
+        executor = SQLExecutor.shared(self.creds)
+        with self.assertRaises(RuntimeError):
+            executor.execute("SELECT ID FROM BROKEN")
+        self.assertTrue(self.connections[0].closed)
+        # An SQL error keeps its connection
+        with self.assertRaises(RuntimeError):
+            executor.execute("SELECT ID FROM MISSING")
+        executor.execute("SELECT ID FROM T")
+        self.assertEqual(len(self.connections), 2)
+        self.assertFalse(self.connections[1].closed)
+
+    def test_probes_idle_connections(self):
+        executor = SQLExecutor.shared(self.creds)
+        executor.execute("SELECT ID FROM T")
+        self.connections[0].job.status = JobStatus.Ended
+        executor.execute("SELECT ID FROM T")
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+
+        with patch.object(database, "PROBE_AFTER_SECONDS", 0):
+            executor.execute("SELECT ID FROM T")
+        self.assertEqual([q.sql for q in self.connections[1].job.queries][-2:], ["VALUES 1", "SELECT ID FROM T"])
+        self.assertEqual(len(self.connections), 2)
+
+    def test_shared_pool_size(self):
+        engine = database.Db2iEngine.shared("", self.creds, pool_size=2)
+        self.assertIs(database.Db2iEngine.shared("", self.creds), engine)
+        self.assertIs(database.Db2iEngine.shared("", self.creds, pool_size=2), engine)
+        with self.assertRaises(ValueError):
+            database.Db2iEngine.shared("", self.creds, pool_size=3)
+
+    def test_hooks_register_once(self):
+        executor = SQLExecutor.shared(self.creds)
+        events = []
+        executor.add_hook(events.append)
+        executor.add_hook(events.append)
+        executor.execute("SELECT ID FROM T")
+        self.assertEqual(len(events), 1)
+        executor.engine.remove_hook(events.append)
+        executor.execute("SELECT ID FROM T")
+        self.assertEqual(len(events), 1)
+
+    def test_run_many_returns_partial_results(self):
+        executor = SQLExecutor.shared(self.creds)
+        start = time.monotonic()
+        results = executor.run_many(
+            {"fast": "SELECT ID FROM T", "slow": "SELECT ID FROM SLOW", "update": "UPDATE T SET ID = 0"},
+            timeout=0.2,
+        )
+        self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual(list(results), ["fast", "slow", "update"])
+        self.assertEqual(results["fast"], str(ROWS))
+        self.assertIn("Timed out", results["slow"])
+        self.assertEqual(results["update"], NO_RESULTS_MESSAGE)
+
+
+if __name__ == '__main__':
+    unittest.main()
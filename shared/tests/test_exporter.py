@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.executor import SQLResult
+from db2i_shared_utils.exporter import MetricsExporter, metric_name, render
+from db2i_shared_utils.sampler import MetricSampler
+
+METRICS = {
+    "system_status": {"name": "System Statistics", "sql": "SELECT STATUS", "interval": 600},
+    "memory_pools": {
+        "name": "Memory Pools",
+        "sql": "SELECT POOLS",
+        "interval": 600,
+        "rates": {"key": "POOL_NAME", "counters": ["FAULTS"]},
+    },
+    "http_server": {"name": "HTTP", "sql": "SELECT FAIL", "interval": 600, "key": "SERVER_FUNC"},
+}
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.faults = 0
+
+    def execute(self, sql, parameters=None):
+        if "FAIL" in sql:
+            raise RuntimeError("not authorized")
+        if "POOLS" in sql:
+            self.faults += 60
+            rows = [
+                {"POOL_NAME": '*BASE"1', "FAULTS": self.faults, "CURRENT_SIZE": 1.5},
+                {"POOL_NAME": "*MACHINE", "FAULTS": 1, "CURRENT_SIZE": 2},
+            ]
+        else:
+            rows = [{"ELAPSED_CPU_USED": 12.5, "SYSTEM_NAME": "PROD", "RESTRICTED_STATE": False}]
+        return SQLResult(sql=sql, rows=rows, seconds=0.25, job="J1")
+
+
+class TestExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.sampler = MetricSampler(FakeExecutor(), METRICS)
+        for metric_id in METRICS:
+            self.sampler.sample(metric_id)
+        self.sampler.sample("memory_pools")
+
+    def test_render(self):
+        text = render(self.sampler)
+        lines = text.splitlines()
+        self.assertIn("# TYPE ibmi_system_status_elapsed_cpu_used gauge", lines)
+        self.assertIn("ibmi_system_status_elapsed_cpu_used 12.5", lines)
+        self.assertIn('ibmi_memory_pools_current_size{pool_name="*BASE\\"1"} 1.5', lines)
+        self.assertIn('ibmi_memory_pools_rate_faults_delta{pool_name="*MACHINE"} 0.0', lines)
+        self.assertIn('ibmi_sample_error{metric="http_server"} 1.0', lines)
+        self.assertIn('ibmi_sample_error{metric="system_status"} 0.0', lines)
+        self.assertNotIn("SYSTEM_NAME", text.upper().replace("IBMI_", ""))
+        self.assertNotIn("restricted_state", text)
+        self.assertNotIn("ibmi_http_server_", text)
+        self.assertEqual(text.count("# HELP ibmi_memory_pools_faults "), 1)
+
+    def test_metric_name(self):
+        self.assertEqual(metric_name("ibmi", "temp", "CURRENT-SIZE"), "ibmi_temp_current_size")
+        self.assertEqual(metric_name("1m"), "_1m")
+
+    def test_serves_metrics_endpoint(self):
+        exporter = MetricsExporter(self.sampler, port=0).start()
+        self.addCleanup(self.sampler.stop)
+        self.addCleanup(exporter.stop)
+        with urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+            self.assertIn(b"ibmi_system_status_elapsed_cpu_used 12.5", response.read())
+        with self.assertRaises(HTTPError):
+            urlopen(f"http://127.0.0.1:{exporter.port}/other")
+
+
+if __name__ == '__main__':
+    unittest.main()
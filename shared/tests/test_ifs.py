@@ -0,0 +1,215 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.executor import SQLResult
+from db2i_shared_utils.ifs import IFSReader, TailState, compile_patterns, like_pattern
+
+
+class FakeExecutor:
+    """Serves one stream file and one directory from memory."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.changed = "2025-01-01-10.00.00.000000"
+        self.reads = 0
+        self.block_sizes = []
+
+    def execute(self, sql, parameters=None):
+        path = parameters[0]
+        if path == "/tmp/app.log":
+            size = sum(len(line.encode()) + 1 for line in self.lines)
+            row = {"PATH_NAME": path, "OBJECT_TYPE": "*STMF", "DATA_SIZE": size, "DATA_CHANGE_TIMESTAMP": self.changed}
+        elif path == "/tmp":
+            row = {"PATH_NAME": path, "OBJECT_TYPE": "*DIR", "DATA_SIZE": 8192, "DATA_CHANGE_TIMESTAMP": self.changed}
+        else:
+            return SQLResult(sql=sql)
+        return SQLResult(sql=sql, rows=[row])
+
+    def stream(self, sql, parameters=None, block_size=None):
+        self.reads += 1
+        self.block_sizes.append(block_size)
+        rows = [{"LINE_NUMBER": i + 1, "LINE": line} for i, line in enumerate(self.lines)]
+        if "LINE_NUMBER >= ?" in sql:
+            rows = rows[parameters[1] - 1 :]
+        for start in range(0, len(rows), block_size):
+            yield rows[start : start + block_size]
+
+
+class TestIFSReader(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+        self.executor = FakeExecutor(["Starting", "", "ERROR: disk full", "Café open", "error again"])
+        self.reader = IFSReader(self.executor, self.cache_dir, chunk_lines=2)
+
+    def test_reads_once_while_unchanged(self):
+        with self.reader.open("/tmp/app.log") as f:
+            self.assertEqual(f.line_count, 5)
+            self.assertEqual(f.lines(3, 4), [(3, "ERROR: disk full"), (4, "Café open")])
+            self.assertEqual(f.lines(4, 99)[-1], (5, "error again"))
+            self.assertEqual(f.line(2), "")
+        with self.reader.open("/tmp/app.log") as f:
+            self.assertEqual(f.search("%error%"), [(3, "ERROR: disk full"), (5, "error again")])
+            self.assertEqual(f.search("caf_ open"), [(4, "Café open")])
+            self.assertEqual(f.search("%caf%"), [(4, "Café open")])
+            self.assertEqual(f.search(""), [(2, "")])
+        self.assertEqual(self.executor.reads, 1)
+        self.assertEqual(self.executor.block_sizes, [2])
+
+    def test_change_refetches_and_drops_old_version(self):
+        self.reader.open("/tmp/app.log").close()
+        self.executor.changed = "2025-01-01-11.00.00.000000"
+        self.executor.lines = ["rotated"]
+        with self.reader.open("/tmp/app.log") as f:
+            self.assertEqual(f.lines(), [(1, "rotated")])
+        self.assertEqual(self.executor.reads, 2)
+        self.assertEqual(len([n for n in os.listdir(self.cache_dir) if n.endswith(".dat")]), 1)
+
+    def test_size_change_with_same_timestamp_refetches(self):
+        self.reader.open("/tmp/app.log").close()
+        self.executor.lines = self.executor.lines + ["appended within the same tick"]
+        with self.reader.open("/tmp/app.log") as f:
+            self.assertEqual(f.line(6), "appended within the same tick")
+        self.assertEqual(self.executor.reads, 2)
+
+    def test_eviction_skips_files_being_opened(self):
+        self.reader.open("/tmp/app.log").close()
+        (name,) = [n[: -len(".dat")] for n in os.listdir(self.cache_dir) if n.endswith(".dat")]
+        reader = IFSReader(self.executor, self.cache_dir, max_cache_bytes=1)
+        with reader._filling(name):
+            reader._evict(keep="other")
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, name + ".dat")))
+        reader._evict(keep="other")
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, name + ".dat")))
+        self.assertEqual(reader._fill_locks, {})
+
+    def test_fill_locks_pruned(self):
+        for i in range(3):
+            self.executor.changed = f"2025-01-01-1{i}.00.00.000000"
+            self.reader.open("/tmp/app.log").close()
+        self.assertEqual(self.reader._fill_locks, {})
+
+    def test_cache_is_private(self):
+        cache_dir = os.path.join(self.cache_dir, "ifs")
+        os.mkdir(cache_dir, 0o755)
+        IFSReader(self.executor, cache_dir).open("/tmp/app.log").close()
+        self.assertEqual(os.stat(cache_dir).st_mode & 0o777, 0o700)
+        for name in os.listdir(cache_dir):
+            self.assertEqual(os.stat(os.path.join(cache_dir, name)).st_mode & 0o777, 0o600)
+
+    def test_default_cache_dir_is_per_user(self):
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.cache_dir}):
+            reader = IFSReader(self.executor)
+        self.assertEqual(str(reader.cache_dir), os.path.join(self.cache_dir, "db2i", "ifs"))
+
+    def test_clear(self):
+        self.reader.clear()
+        self.reader.open("/tmp/app.log").close()
+        self.reader.clear()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_missing_and_directory(self):
+        self.assertFalse(self.reader.stat("/nope").exists)
+        with self.assertRaises(FileNotFoundError):
+            self.reader.open("/nope")
+        with self.assertRaises(ValueError):
+            self.reader.open("/tmp")
+
+    def test_eviction(self):
+        reader = IFSReader(self.executor, self.cache_dir, max_cache_bytes=1)
+        reader.open("/tmp/app.log").close()
+        # The file just read is kept even when it alone exceeds the budget
+        self.assertEqual(len([n for n in os.listdir(self.cache_dir) if n.endswith(".dat")]), 1)
+
+    def test_find_many_patterns(self):
+        with self.reader.open("/tmp/app.log") as f:
+            hits = f.find(["error", "disk", "café"])
+            self.assertEqual([(h.line_number, h.patterns) for h in hits], [(3, ["error", "disk"]), (4, ["café"]), (5, ["error"])])
+            self.assertEqual([h.line_number for h in f.find(["error"], limit=1)], [3])
+            self.assertEqual([h.line_number for h in f.find(["ERROR"], ignore_case=False)], [3])
+            self.assertEqual([h.line_number for h in f.find([r"^e\w+", r"^$"], regex=True)], [2, 3, 5])
+            self.assertEqual([h.line_number for h in f.find([r"(r)\1", r"(t)\1"], regex=True)], [3, 5])
+            spanning = f.find([r"full\ncaf"], regex=True)
+            self.assertEqual([(h.line_number, h.patterns) for h in spanning], [(3, [r"full\ncaf"])])
+
+    def test_context(self):
+        self.executor.lines = [f"line {i}" for i in range(1, 31)]
+        with self.reader.open("/tmp/app.log") as f:
+            self.assertEqual(f.context([5, 7, 20, 30], before=2, after=1), [(3, 8), (18, 21), (28, 30)])
+            self.assertEqual(f.context([1], before=3, after=0), [(1, 1)])
+            self.assertEqual(f.context([]), [])
+
+    def test_invalid_patterns(self):
+        with self.assertRaises(ValueError):
+            compile_patterns([])
+        with self.assertRaises(ValueError):
+            compile_patterns(["("], regex=True)
+        self.assertTrue(compile_patterns(["("])[0].search(b"f(x)"))
+
+    def append(self, *lines):
+        self.executor.lines = self.executor.lines + list(lines)
+        self.executor.changed = f"2025-01-01-10.{len(self.executor.lines):02d}.00.000000"
+
+    def test_tail(self):
+        first = self.reader.tail("/tmp/app.log", max_lines=2)
+        self.assertEqual(first.lines, [(4, "Café open"), (5, "error again")])
+
+        # Unchanged: no read on the host
+        reads = self.executor.reads
+        self.assertEqual(self.reader.tail("/tmp/app.log", first.token).lines, [])
+        self.assertEqual(self.executor.reads, reads)
+
+        self.append("six", "seven", "eight")
+        second = self.reader.tail("/tmp/app.log", first.token, max_lines=2)
+        self.assertEqual(second.lines, [(6, "six"), (7, "seven")])
+        self.assertTrue(second.more)
+        # Without a token the reader continues from its own state
+        third = self.reader.tail("/tmp/app.log")
+        self.assertEqual(third.lines, [(8, "eight")])
+        self.assertFalse(third.more)
+
+        # The last line was still being written
+        self.executor.lines[-1] = "eight, finished"
+        self.append("nine")
+        self.assertEqual(self.reader.tail("/tmp/app.log").lines, [(8, "eight, finished"), (9, "nine")])
+
+        # Truncated: start over
+        self.executor.lines = ["new"]
+        self.executor.changed = "2025-01-02-00.00.00.000000"
+        reset = self.reader.tail("/tmp/app.log")
+        self.assertTrue(reset.reset)
+        self.assertEqual(reset.lines, [(1, "new")])
+
+    def test_tail_tokens(self):
+        token = self.reader.tail("/tmp/app.log").token
+        self.assertEqual(TailState.from_token("/tmp/app.log", token).line, 5)
+        with self.assertRaises(ValueError):
+            self.reader.tail("/tmp/other.log", token)
+        with self.assertRaises(ValueError):
+            self.reader.tail("/tmp/app.log", "not a token")
+
+    def test_follow(self):
+        token = self.reader.tail("/tmp/app.log").token
+        timer = threading.Timer(0.05, self.append, ["six"])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        result = self.reader.follow("/tmp/app.log", token, window=0.3, poll=0.1)
+        self.assertEqual(result.lines, [(6, "six")])
+        self.assertEqual(TailState.from_token("/tmp/app.log", result.token).line, 6)
+
+    def test_like_pattern(self):
+        self.assertTrue(like_pattern("a_c%").match(b"ABCdef"))
+        self.assertFalse(like_pattern("a.c").match(b"abc"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.executor import SQLResult
+from db2i_shared_utils.jobs import JobSnapshotService, snapshot_sql
+
+JOBS = [{"JOB_NAME": f"{i:06d}/QUSER/QZDASOINIT", "CPU_TIME": cpu} for i, cpu in enumerate([5, 50, None, 20])]
+
+
+class FakeExecutor:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def execute(self, sql, parameters=None):
+        self.calls.append((sql, parameters))
+        time.sleep(0.1)
+        if self.fail:
+            raise RuntimeError("SQL0666")
+        return SQLResult(sql=sql, rows=list(JOBS))
+
+
+class TestJobSnapshotService(unittest.TestCase):
+
+    def test_sql(self):
+        sql, parameters = snapshot_sql(["JOB_NAME", "CPU_TIME"], ("QUSRWRK,QSYSWRK", None, "BOB"))
+        self.assertEqual(
+            sql,
+            "SELECT JOB_NAME, CPU_TIME FROM TABLE(QSYS2.ACTIVE_JOB_INFO(DETAILED_INFO => 'NONE', "
+            "SUBSYSTEM_LIST_FILTER => ?, CURRENT_USER_LIST_FILTER => ?)) A",
+        )
+        self.assertEqual(parameters, ["QUSRWRK,QSYSWRK", "BOB"])
+
+    def test_concurrent_callers_share_one_fetch(self):
+        executor = FakeExecutor()
+        service = JobSnapshotService(executor)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.top(2, subsystems=["qusrwrk", "QSYSWRK"])))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(executor.calls), 1)
+        self.assertEqual(executor.calls[0][1], ["QUSRWRK,QSYSWRK"])
+        self.assertEqual([[row["CPU_TIME"] for row in r] for r in results], [[50, 20]] * 5)
+
+    def test_window_and_filters(self):
+        executor = FakeExecutor()
+        service = JobSnapshotService(executor, window=0.2)
+        first = service.snapshot()
+        self.assertIs(service.snapshot(), first)
+        service.snapshot(subsystems="QUSRWRK")
+        self.assertEqual(len(executor.calls), 2)
+        time.sleep(0.25)
+        self.assertIsNot(service.snapshot(), first)
+        self.assertEqual(len(executor.calls), 3)
+
+    def test_failures_are_throttled(self):
+        executor = FakeExecutor(fail=True)
+        service = JobSnapshotService(executor)
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                service.snapshot()
+        self.assertEqual(len(executor.calls), 1)
+
+    def test_shared(self):
+        executor = FakeExecutor()
+        self.addCleanup(JobSnapshotService._services.clear)
+        self.assertIs(JobSnapshotService.shared(executor), JobSnapshotService.shared(executor, window=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
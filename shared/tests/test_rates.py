@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.executor import SQLResult
+from db2i_shared_utils.rates import RateSpec, interval_rates
+from db2i_shared_utils.sampler import MetricSampler, Sample
+
+POOLS = RateSpec(key="POOL_NAME", counters=["FAULTS"])
+STATUS = RateSpec(elapsed="ELAPSED_TIME", averages=["CPU"])
+
+
+def pools(taken_at, faults, job="J1"):
+    rows = [{"POOL_NAME": name, "FAULTS": value} for name, value in faults.items()]
+    return Sample("memory_pools", taken_at, rows, job=job)
+
+
+class TestIntervalRates(unittest.TestCase):
+
+    def test_counter_deltas_and_rates_per_key(self):
+        rows = interval_rates(
+            [pools(0, {"*BASE": 100, "*MACHINE": 10}), pools(10, {"*BASE": 150, "*MACHINE": 10})],
+            POOLS,
+        )
+        self.assertEqual(len(rows), 2)
+        base, machine = rows
+        self.assertEqual(base["POOL_NAME"], "*BASE")
+        self.assertEqual(base["INTERVAL_SECONDS"], 10.0)
+        self.assertEqual(base["FAULTS_DELTA"], 50.0)
+        self.assertEqual(base["FAULTS_PER_SECOND"], 5.0)
+        self.assertEqual(machine["FAULTS_PER_SECOND"], 0.0)
+
+    def test_job_change_and_counter_reset_are_not_rates(self):
+        rows = interval_rates(
+            [pools(0, {"*BASE": 100}), pools(10, {"*BASE": 150}, job="J2"), pools(20, {"*BASE": 20}, job="J2")],
+            POOLS,
+        )
+        self.assertIsNone(rows[0]["FAULTS_PER_SECOND"])
+        self.assertIsNone(rows[0]["INTERVAL_SECONDS"])
+        self.assertIsNone(rows[1]["FAULTS_DELTA"])
+
+    def test_missing_rows_are_none(self):
+        rows = interval_rates([pools(0, {"*BASE": 1}), pools(10, {"*BASE": 2, "*SHRPOOL1": 5})], POOLS)
+        self.assertIsNone(rows[1]["FAULTS_DELTA"])
+
+    def test_averages_over_elapsed_time(self):
+        samples = [
+            Sample("system_status", 0, [{"ELAPSED_TIME": 60, "CPU": 10.0}], job="J1"),
+            Sample("system_status", 60, [{"ELAPSED_TIME": 120, "CPU": 20.0}], job="J1"),
+        ]
+        # 60s at 10% then 60s at 30% averages to 20% over 120s.
+        (row,) = interval_rates(samples, STATUS)
+        self.assertEqual(row["INTERVAL_SECONDS"], 60.0)
+        self.assertEqual(row["CPU"], 30.0)
+
+    def test_needs_two_samples(self):
+        self.assertEqual(interval_rates([pools(0, {"*BASE": 1})], POOLS), [])
+
+
+class FakeExecutor:
+    def __init__(self, values):
+        self.values = iter(values)
+
+    def execute(self, sql, parameters=None):
+        return SQLResult(sql=sql, rows=[{"POOL_NAME": "*BASE", "FAULTS": next(self.values)}], job="J1")
+
+
+class TestSamplerRates(unittest.TestCase):
+
+    def test_rates_from_buffered_samples(self):
+        metrics = {
+            "memory_pools": {"sql": "SELECT", "interval": 60, "rates": {"key": "POOL_NAME", "counters": ["FAULTS"]}},
+            "plain": {"sql": "SELECT", "interval": 60},
+        }
+        sampler = MetricSampler(FakeExecutor([0, 10, 30]), metrics)
+        sampler.sample("memory_pools")
+        self.assertEqual(sampler.rates("memory_pools"), [])
+
+        sampler.sample("memory_pools")
+        sampler.sample("memory_pools")
+        self.assertEqual(sampler.history("memory_pools")[-1].job, "J1")
+        self.assertEqual([r["FAULTS_DELTA"] for r in sampler.rates("memory_pools", intervals=2)], [10.0, 20.0])
+        self.assertEqual([r["FAULTS_DELTA"] for r in sampler.rates("memory_pools")], [20.0])
+        with self.assertRaises(ValueError):
+            sampler.rates("plain")
+
+
+if __name__ == '__main__':
+    unittest.main()
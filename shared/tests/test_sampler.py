@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import unittest
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils import sampler as sampler_module
+from db2i_shared_utils.executor import SQLResult
+from db2i_shared_utils.sampler import MetricSampler
+
+METRICS = {
+    "fast": {"sql": "SELECT 1 AS V FROM SYSIBM.SYSDUMMY1", "interval": 0.05},
+    "slow": {"sql": "SELECT 2 AS V FROM SYSIBM.SYSDUMMY1", "interval": 600},
+    "jobs": {"sql": "SELECT * FROM JOBS LIMIT ?", "interval": 60, "parameters": ["num_jobs"]},
+}
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, sql, parameters=None):
+        self.calls.append(sql)
+        if "FAIL" in sql:
+            raise RuntimeError("boom")
+        return SQLResult(sql=sql, rows=[{"V": len(self.calls)}])
+
+
+class TestMetricSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = FakeExecutor()
+        self.sampler = MetricSampler(self.executor, METRICS, history=3)
+        self.addCleanup(self.sampler.stop)
+
+    def test_answers_from_fresh_sample(self):
+        first = self.sampler.get("slow")
+        second = self.sampler.get("slow")
+        self.assertIs(first, second)
+        self.assertEqual(len(self.executor.calls), 1)
+        self.assertIn("Sampled 0s ago", str(second))
+
+    def test_queries_live_when_stale(self):
+        first = self.sampler.get("slow")
+        first.taken_at -= 1000
+        self.assertIsNot(self.sampler.get("slow"), first)
+        self.assertEqual(len(self.executor.calls), 2)
+
+    def test_ring_buffer_is_bounded(self):
+        for _ in range(5):
+            self.sampler.sample("slow")
+        history = self.sampler.history("slow")
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history[-1].rows, [{"V": 5}])
+
+    def test_parameterized_metrics_are_not_polled(self):
+        self.assertIsNone(self.sampler.interval("jobs"))
+
+    def test_background_polling(self):
+        original = sampler_module.MIN_INTERVAL
+        sampler_module.MIN_INTERVAL = 0.01
+        self.addCleanup(setattr, sampler_module, "MIN_INTERVAL", original)
+
+        self.sampler.start()
+        time.sleep(0.3)
+        self.sampler.stop()
+        self.assertGreater(len(self.sampler.history("fast")), 1)
+        self.assertEqual(len(self.sampler.history("slow")), 1)
+        self.assertEqual(self.sampler.history("jobs"), [])
+
+    def test_failed_sample_keeps_last_good_one(self):
+        sampler = MetricSampler(self.executor, {"m": {"sql": "SELECT FAIL", "interval": 60}})
+        sample = sampler.get("m")
+        self.assertEqual(str(sample), "Error: boom")
+        self.assertIsNone(sampler.latest("m"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.sampler import Sample
+from db2i_shared_utils.snapshots import SnapshotStore, diff_rows
+
+METRICS = {
+    "system_status": {"sql": "SELECT 1"},
+    "memory_pools": {"sql": "SELECT 1", "rates": {"key": "POOL_NAME", "counters": ["FAULTS"]}},
+    "top_jobs": {"sql": "SELECT 1", "parameters": ["num_jobs"]},
+}
+
+
+class FakeSampler:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get(self, metric_id):
+        rows = self.rows.get(metric_id)
+        if rows is None:
+            return Sample(metric_id, 0.0, error="SQL0443")
+        return Sample(metric_id, 0.0, rows)
+
+
+class TestDiffRows(unittest.TestCase):
+
+    def test_keyed(self):
+        before = [
+            {"POOL_NAME": "*BASE", "FAULTS": 100, "SIZE": 50.0, "STATUS": "OK"},
+            {"POOL_NAME": "*MACHINE", "FAULTS": 10, "SIZE": 5.0, "STATUS": "OK"},
+            {"POOL_NAME": "*SPOOL", "FAULTS": 0, "SIZE": 1.0, "STATUS": "OK"},
+        ]
+        after = [
+            {"POOL_NAME": "*MACHINE", "FAULTS": 10, "SIZE": 5.1, "STATUS": "OK"},
+            {"POOL_NAME": "*BASE", "FAULTS": 150, "SIZE": 50.0, "STATUS": "BUSY"},
+            {"POOL_NAME": "*INTERACT", "FAULTS": 3, "SIZE": 2.0, "STATUS": "OK"},
+        ]
+        diff = diff_rows(before, after, "POOL_NAME", threshold=0.05)
+        self.assertEqual(diff["ADDED"], [after[2]])
+        self.assertEqual(diff["REMOVED"], [before[2]])
+        self.assertEqual(
+            diff["CHANGED"],
+            [
+                {
+                    "KEY": "*BASE",
+                    "CHANGES": {
+                        "FAULTS": {"BEFORE": 100, "AFTER": 150, "DELTA": 50, "PCT": 50.0},
+                        "STATUS": {"BEFORE": "OK", "AFTER": "BUSY"},
+                    },
+                }
+            ],
+        )
+        # *MACHINE only moved 2%
+        self.assertEqual(diff["UNCHANGED"], 1)
+
+    def test_unkeyed_and_ignored(self):
+        diff = diff_rows([{"CPU": 0, "TS": "a"}], [{"CPU": 7, "TS": "b"}], ignore=["TS"])
+        self.assertEqual(diff, {"CHANGED": [{"KEY": "", "CHANGES": {"CPU": {"BEFORE": 0, "AFTER": 7, "DELTA": 7}}}], "UNCHANGED": 0})
+        self.assertEqual(diff_rows([{"CPU": 1}], [{"CPU": 1}]), {"UNCHANGED": 1})
+
+
+class TestSnapshotStore(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SnapshotStore(directory.name, METRICS)
+
+    def test_take_and_diff(self):
+        morning = self.store.take(
+            "morning",
+            FakeSampler({"system_status": [{"CPU": 10.0}], "memory_pools": [{"POOL_NAME": "*BASE", "FAULTS": 5}]}),
+        )
+        self.assertEqual(sorted(morning.metrics), ["memory_pools", "system_status"])
+        self.store.take("noon", FakeSampler({"system_status": [{"CPU": 60.0}]}))
+
+        self.assertEqual([s["NAME"] for s in self.store.names()], ["morning", "noon"])
+        self.assertEqual(self.store.load("noon").errors, {"memory_pools": "SQL0443"})
+
+        diff = self.store.diff("morning", "noon")
+        self.assertEqual(diff["ONLY_IN_FROM"], ["memory_pools"])
+        self.assertEqual(diff["METRICS"]["system_status"]["CHANGED"][0]["CHANGES"]["CPU"]["PCT"], 500.0)
+
+    def test_invalid_and_unknown(self):
+        with self.assertRaises(ValueError):
+            self.store.take("../etc", FakeSampler({}))
+        with self.assertRaises(ValueError):
+            self.store.load("missing")
+        with self.assertRaises(ValueError):
+            self.store.take("x", FakeSampler({}), ["nope"])
+        self.store.delete("missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
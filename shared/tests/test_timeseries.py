@@ -0,0 +1,164 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# Add the src directory to the Python path so the package imports resolve
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from db2i_shared_utils.executor import SQLResult
+from db2i_shared_utils.sampler import MetricSampler, Sample
+from db2i_shared_utils.timeseries import MetricStore, parse_duration
+
+METRICS = {"memory_pools": {"sql": "SELECT", "key": "POOL_NAME"}, "system_status": {"sql": "SELECT"}}
+START = 1_700_000_000.0 - 1_700_000_000.0 % 3600
+
+
+class TestMetricStore(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.store = MetricStore(self.root, METRICS, retention={"raw": 1e10, "1m": 1e10, "15m": 1e10, "1h": 1e10}, flush_seconds=1e10)
+        self.now = START + 3600
+
+    def fill(self):
+        # One sample every 20 seconds for an hour: CPU climbs by 1 per sample.
+        for i in range(180):
+            self.store.append("system_status", START + i * 20, [{"CPU": float(i), "NAME": "X"}])
+
+    def test_rollups_from_segments_and_buffer(self):
+        self.fill()
+        self.store.flush()
+        self.store.append("system_status", START + 3600, [{"CPU": 500.0}])
+        self.assertTrue(os.listdir(os.path.join(self.root, "system_status", "1m")))
+
+        rows = self.store.query("system_status", "1h", agg="avg", resolution="1m", now=self.now)
+        self.assertEqual(len(rows), 61)
+        self.assertEqual(rows[0]["CPU"], 1.0)
+        self.assertEqual(rows[-1]["CPU"], 500.0)
+        self.assertNotIn("NAME", rows[0])
+
+        (hour,) = self.store.query("system_status", "30m", agg="max", resolution="1h", now=self.now - 1)
+        self.assertEqual(hour["CPU"], 179.0)
+        self.assertEqual(self.store.query("system_status", "1h", agg="count", resolution="15m", now=self.now)[0]["CPU"], 45.0)
+
+    def test_buckets_split_across_flushes_are_merged(self):
+        self.store.append("system_status", START, [{"CPU": 10.0}])
+        self.store.flush()
+        self.store.append("system_status", START + 30, [{"CPU": 30.0}])
+        self.store.flush()
+        (row,) = self.store.query("system_status", "1h", agg="avg", resolution="1m", now=START + 60)
+        self.assertEqual(row["CPU"], 20.0)
+        (row,) = self.store.query("system_status", "1h", agg="last", resolution="1m", now=START + 60)
+        self.assertEqual(row["CPU"], 30.0)
+
+    def test_compacts_ended_periods(self):
+        self.fill()
+        for i in range(3):
+            self.store.flush()
+            self.store.append("system_status", START + 3600 + i, [{"CPU": 10.0 * i, "MEM": 1.0}])
+        self.store.flush()
+        for tier in ("raw", "1m", "15m", "1h"):
+            # The hour after START is ended as well, so it is one file too
+            self.assertEqual(len(os.listdir(os.path.join(self.root, "system_status", tier))), 2 if tier == "raw" else 1)
+
+        rows = self.store.query("system_status", "1h", agg="avg", resolution="1m", now=self.now + 59)
+        self.assertEqual(rows[0]["CPU"], 1.0)
+        self.assertEqual(rows[-1], {"TIME": rows[-1]["TIME"], "CPU": 10.0, "MEM": 1.0})
+        (hour,) = self.store.query("system_status", "1h", agg="count", resolution="1h", now=self.now - 1)
+        self.assertEqual(hour["CPU"], 180.0)
+        last = self.store.query("system_status", "1m", agg="last", resolution="1m", now=self.now + 59)[-1]
+        self.assertEqual(last["CPU"], 20.0)
+
+        # The current period is still being written to
+        now = time.time()
+        for i in range(2):
+            self.store.append("system_status", now + i, [{"CPU": 1.0}])
+            self.store.flush()
+        self.assertEqual(len(os.listdir(os.path.join(self.root, "system_status", "raw"))), 4)
+
+    def test_reads_do_not_wait_for_flush(self):
+        writing, release = threading.Event(), threading.Event()
+        write = self.store._write
+
+        def slow_write(*args):
+            writing.set()
+            release.wait(5)
+            return write(*args)
+
+        self.store._write = slow_write
+        self.store.append("system_status", START, [{"CPU": 1.0}])
+        flush = threading.Thread(target=self.store.flush)
+        flush.start()
+        self.addCleanup(flush.join)
+        self.addCleanup(release.set)
+        self.assertTrue(writing.wait(5))
+        # Points being written are read once, from memory
+        started = time.monotonic()
+        rows = self.store.query("system_status", "1h", resolution="raw", now=START + 1)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual([r["CPU"] for r in rows], [1.0])
+        release.set()
+        flush.join()
+        rows = self.store.query("system_status", "1h", resolution="raw", now=START + 1)
+        self.assertEqual([r["CPU"] for r in rows], [1.0])
+
+    def test_keyed_series(self):
+        for i in range(3):
+            self.store.append(
+                "memory_pools",
+                START + i * 60,
+                [{"POOL_NAME": "*BASE", "FAULTS": i * 10}, {"POOL_NAME": "*MACHINE", "FAULTS": 1}],
+            )
+        rows = self.store.query("memory_pools", "1h", key="*BASE", column="FAULTS", resolution="raw", now=START + 600)
+        self.assertEqual([r["FAULTS"] for r in rows], [0.0, 10.0, 20.0])
+        self.assertEqual(rows[0]["POOL_NAME"], "*BASE")
+        with self.assertRaises(ValueError):
+            self.store.query("memory_pools", "1h", column="MISSING", now=START + 600)
+
+    def test_retention(self):
+        store = MetricStore(self.root, METRICS, retention={"raw": 60})
+        store.append("system_status", time.time() - 3600, [{"CPU": 1.0}])
+        store.flush()
+        self.assertEqual(os.listdir(os.path.join(self.root, "system_status", "raw")), [])
+        self.assertTrue(os.listdir(os.path.join(self.root, "system_status", "1h")))
+
+    def test_records_sampler_samples(self):
+        self.store.record(Sample("system_status", START, [{"CPU": 5}]))
+        self.store.record(Sample("system_status", START, error="boom"))
+        self.assertEqual(len(self.store.query("system_status", "1h", resolution="raw", now=START + 1)), 1)
+
+    def test_attach_records_rates(self):
+        faults = iter([0, 30])
+
+        class Executor:
+            def execute(self, sql, parameters=None):
+                return SQLResult(sql=sql, rows=[{"POOL_NAME": "*BASE", "FAULTS": next(faults)}], job="J1")
+
+        metrics = {"memory_pools": {"sql": "SELECT", "interval": 60, "rates": {"key": "POOL_NAME", "counters": ["FAULTS"]}}}
+        store = MetricStore(self.root, metrics)
+        sampler = MetricSampler(Executor(), metrics)
+        store.attach(sampler)
+        sampler.sample("memory_pools")
+        sampler.sample("memory_pools")
+        self.assertEqual(store.metric_ids(), ["memory_pools", "memory_pools.rates"])
+        (row,) = store.query("memory_pools.rates", "1h", resolution="raw")
+        self.assertEqual(row["POOL_NAME"], "*BASE")
+        self.assertEqual(row["FAULTS_DELTA"], 30.0)
+
+    def test_resolution_and_durations(self):
+        self.assertEqual(parse_duration("15m"), 900)
+        self.assertEqual(parse_duration(30), 30)
+        self.assertEqual(self.store.resolution(3600), "1m")
+        self.assertEqual(self.store.resolution(86400), "15m")
+        self.assertEqual(self.store.resolution(30 * 86400), "1h")
+        with self.assertRaises(ValueError):
+            parse_duration("soon")
+
+
+if __name__ == '__main__':
+    unittest.main()